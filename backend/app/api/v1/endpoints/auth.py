@@ -46,7 +46,7 @@ async def signup(user_create: UserCreate) -> Any:
             error_message = response_data.get("error", {}).get(
                 "message", "不明なエラー"
             )
-            logger.error(f"Signup error: {error_message}")
+            logger.error("Signup error: %s", error_message)
 
             # EMAIL_EXISTSエラーの場合、Firestoreをチェック
             if (
@@ -68,7 +68,7 @@ async def signup(user_create: UserCreate) -> Any:
                             return await signup(user_create)
                         except Exception as delete_error:
                             logger.error(
-                                f"Error deleting existing user: {str(delete_error)}"
+                                "Error deleting existing user: %s", delete_error
                             )
                             raise HTTPException(
                                 status_code=400,
@@ -80,7 +80,7 @@ async def signup(user_create: UserCreate) -> Any:
                             detail="このメールアドレスは既に登録されています",
                         )
                 except Exception as e:
-                    logger.error(f"Error handling EMAIL_EXISTS: {str(e)}")
+                    logger.error("Error handling EMAIL_EXISTS: %s", e)
                     raise HTTPException(
                         status_code=400,
                         detail="ユーザー登録処理中にエラーが発生しました",
@@ -110,7 +110,7 @@ async def signup(user_create: UserCreate) -> Any:
         except Exception as claims_error:
             # カスタムクレームの設定に失敗しても、ユーザー作成は成功しているので
             # エラーをログに記録するだけで、ユーザーは返す
-            logger.error(f"Error setting custom claims: {str(claims_error)}")
+            logger.error("Error setting custom claims: %s", claims_error)
             # 開発環境ではカスタムクレームの設定はスキップされるため、
             # エラーを無視してユーザー情報を返す
             if settings.ENVIRONMENT == "development":
@@ -122,7 +122,7 @@ async def signup(user_create: UserCreate) -> Any:
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="サーバーエラーが発生しました")
 
 
@@ -154,7 +154,7 @@ async def login(login_data: LoginRequest) -> Any:
 
         if response.status_code != 200:
             error_message = response_data.get("error", {}).get("message", "")
-            logger.error(f"Login error: {error_message}")
+            logger.error("Login error: %s", error_message)
             raise HTTPException(
                 status_code=401,
                 detail="メールアドレスまたはパスワードが正しくありません",
@@ -169,7 +169,7 @@ async def login(login_data: LoginRequest) -> Any:
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Unexpected error during login: {str(e)}")
+        logger.error("Unexpected error during login: %s", e)
         raise HTTPException(
             status_code=500, detail="ログイン処理中にエラーが発生しました"
         )
@@ -235,7 +235,7 @@ async def create_admin_user():
             "password": admin_password,
         }
     except Exception as e:
-        logger.error(f"Error creating admin user: {str(e)}")
+        logger.error("Error creating admin user: %s", e)
         raise HTTPException(
             status_code=500, detail=f"管理者アカウントの作成に失敗しました: {str(e)}"
         )
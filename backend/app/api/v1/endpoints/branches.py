@@ -1,8 +1,10 @@
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from ....crud.crud_branch import crud_branch
+from ....crud.pagination import InvalidCursorError, NEXT_CURSOR_HEADER, next_cursor
 from ....models.branch import Branch, BranchCreate, BranchUpdate
 from ....core.security import SecurityService
+from ....core.http_cache import conditional_response, make_etag
 
 router = APIRouter()
 
@@ -38,17 +40,37 @@ async def get_branch(
 
 @router.get("/", response_model=List[Branch])
 async def list_branches(
+    request: Request,
+    response: Response,
     company_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(SecurityService.verify_firebase_token),
 ):
     """
     店舗一覧を取得
+
+    続きがある場合は次ページのカーソルをX-Next-Cursorヘッダーで返す。
+    ETagはコレクションの更新番号とクエリパラメータから生成するため、
+    If-None-Matchが一致する場合は一覧を読み取らずに304を返す。
     """
-    branches = await crud_branch.get_multi(
-        company_id=company_id, skip=skip, limit=limit
-    )
+    version = await crud_branch.get_version()
+    etag = make_etag("branches", version, company_id, skip, limit, cursor)
+    not_modified = conditional_response(request, response, etag, "branches")
+    if not_modified:
+        return not_modified
+
+    try:
+        branches = await crud_branch.get_multi(
+            company_id=company_id, skip=skip, limit=limit, cursor=cursor
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_page = next_cursor(branches, limit)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
     return branches
 
 
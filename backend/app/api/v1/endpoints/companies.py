@@ -1,8 +1,10 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from ....crud.crud_company import crud_company
+from ....crud.pagination import InvalidCursorError, NEXT_CURSOR_HEADER, next_cursor
 from ....models.company import Company, CompanyCreate, CompanyUpdate
 from ....core.security import SecurityService
+from ....core.http_cache import conditional_response, make_etag
 
 router = APIRouter()
 
@@ -35,14 +37,34 @@ async def get_company(
 
 @router.get("/", response_model=List[Company])
 async def list_companies(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(SecurityService.verify_firebase_token),
 ):
     """
     企業一覧を取得
+
+    続きがある場合は次ページのカーソルをX-Next-Cursorヘッダーで返す。
+    ETagはコレクションの更新番号とクエリパラメータから生成するため、
+    If-None-Matchが一致する場合は一覧を読み取らずに304を返す。
     """
-    companies = await crud_company.get_multi(skip=skip, limit=limit)
+    version = await crud_company.get_version()
+    etag = make_etag("companies", version, skip, limit, cursor)
+    not_modified = conditional_response(request, response, etag, "companies")
+    if not_modified:
+        return not_modified
+
+    try:
+        companies = await crud_company.get_multi(skip=skip, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_page = next_cursor(companies, limit)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
     return companies
 
 
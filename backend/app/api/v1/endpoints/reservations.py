@@ -1,22 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Any
 from datetime import datetime, date
+import asyncio
+import json
 from ....crud.crud_reservation import crud_reservation
+from ....crud.branch_day import SlotUnavailableError
+from ....crud.queue_broadcaster import queue_broadcaster
 from ....models.reservation import (
     Reservation,
     ReservationCreate,
     ReservationUpdate,
     ReservationInDB,
     ReservationSummary,
+    AvailabilityCalendar,
+    WaitTimeEstimate,
+    ReservationBulkCreate,
+    ReservationBulkResult,
+    ReservationTransitionRequest,
+    ReservationTransitionResult,
 )
 from ....core.security import SecurityService
+from ....core.config import settings
+from ....core.http_cache import conditional_response, make_etag
+from ....core.rate_limit import rate_limit
 from ....crud.crud_company import crud_company
 from ....crud.crud_branch import crud_branch
+from ....crud.pagination import InvalidCursorError, NEXT_CURSOR_HEADER, next_cursor
 
 router = APIRouter()
 
+# ルート種別ごとのレート制限（上限はsettings.RATE_LIMIT_*）
+CREATE_LIMIT = [Depends(rate_limit("reservation_create"))]
+UPDATE_LIMIT = [Depends(rate_limit("reservation_update"))]
+AVAILABILITY_LIMIT = [Depends(rate_limit("availability_check"))]
+OTHER_LIMIT = [Depends(rate_limit("other"))]
+QUEUE_DISPLAY_LIMIT = [Depends(rate_limit("queue_display"))]
 
-@router.post("/", response_model=Reservation)
+
+@router.post("/", response_model=Reservation, dependencies=CREATE_LIMIT)
 async def create_reservation(
     reservation: ReservationCreate,
     current_user: dict = Depends(SecurityService.verify_firebase_token),
@@ -30,14 +52,57 @@ async def create_reservation(
 
     Returns:
         Reservation: 作成された予約情報
+
+    Raises:
+        HTTPException: 指定された時間枠に空きがない場合（409）
     """
-    return await crud_reservation.create(
-        reservation=reservation, user_id=current_user["uid"]
-    )
+    try:
+        return await crud_reservation.create(
+            reservation=reservation, user_id=current_user["uid"]
+        )
+    except SlotUnavailableError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e)})
+
+
+@router.post("/bulk", response_model=ReservationBulkResult, dependencies=CREATE_LIMIT)
+async def create_reservations_bulk(
+    payload: ReservationBulkCreate,
+    current_user: dict = Depends(SecurityService.verify_firebase_token),
+):
+    """
+    予約を一括作成
+
+    受付番号は店舗・日ごとに連続して払い出す。満席の時間枠の予約は
+    rejected として結果に含め、他の予約の作成は続行する。
+
+    Args:
+        payload (ReservationBulkCreate): 予約情報の一覧
+        current_user (dict): 現在のユーザー情報（依存性注入）
+
+    Returns:
+        ReservationBulkResult: 件数と入力順の1件ごとの結果
+    """
+    if len(payload.reservations) > settings.BULK_RESERVATION_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に登録できる予約は{settings.BULK_RESERVATION_MAX_ITEMS}件までです",
+        )
+    try:
+        results = await crud_reservation.create_bulk(
+            payload.reservations, user_id=current_user["uid"]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    counts = {"created": 0, "rejected": 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return ReservationBulkResult(**counts, results=results)
 
 
-@router.get("/", response_model=List[Reservation])
+@router.get("/", response_model=List[Reservation], dependencies=OTHER_LIMIT)
 async def read_reservations(
+    response: Response,
     current_user: Optional[dict] = Depends(SecurityService.verify_firebase_token),
     company_id: Optional[str] = Query(None),
     branch_id: Optional[str] = Query(None),
@@ -45,6 +110,7 @@ async def read_reservations(
     limit: int = 10,
     target_date: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
 ):
     """
     ユーザーの予約一覧を取得
@@ -53,10 +119,11 @@ async def read_reservations(
         current_user (dict): 現在のユーザー情報（依存性注入）
         company_id: company_id
         branch_id: branch_id
-        skip (int): スキップする件数
+        skip (int): スキップする件数（cursor指定時は無視）
         limit (int): 取得する件数
         target_date (date, optional): 検索日
         status (str, optional): 予約ステータス
+        cursor (str, optional): 前のレスポンスのX-Next-Cursorヘッダーの値
 
     Returns:
         List[Reservation]: 予約一覧
@@ -66,25 +133,75 @@ async def read_reservations(
     else:
         target_date = datetime.now().date()
 
-    return await crud_reservation.get_multi_by_user(
-        user_id=current_user["uid"],
-        company_id=company_id,
-        branch_id=branch_id,
-        skip=skip,
-        limit=limit,
-        target_date=target_date,
-        status=status,
+    try:
+        reservations = await crud_reservation.get_multi_by_user(
+            user_id=current_user["uid"],
+            company_id=company_id,
+            branch_id=branch_id,
+            skip=skip,
+            limit=limit,
+            target_date=target_date,
+            status=status,
+            cursor=cursor,
+        )
+    except (InvalidCursorError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_page = next_cursor(reservations, limit, order_field="reservation_at")
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
+    return reservations
+
+
+@router.get(
+    "/availability",
+    response_model=AvailabilityCalendar,
+    dependencies=AVAILABILITY_LIMIT,
+)
+async def read_availability_calendar(
+    company_id: str = Query(...),
+    branch_id: str = Query(...),
+    start_date: date = Query(..., alias="from"),
+    end_date: date = Query(..., alias="to"),
+):
+    """
+    指定店舗の期間内の空き状況を取得（カレンダー表示用）
+
+    Args:
+        company_id (str): 企業ID
+        branch_id (str): 店舗ID
+        start_date (date): 期間の初日（クエリパラメータ from）
+        end_date (date): 期間の最終日（クエリパラメータ to、含む）
+
+    Returns:
+        AvailabilityCalendar: 日ごと・時間枠ごとの空き数
+    """
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=400, detail="期間の終了日は開始日以降を指定してください"
+        )
+    if (end_date - start_date).days + 1 > settings.AVAILABILITY_MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"期間は{settings.AVAILABILITY_MAX_RANGE_DAYS}日以内で指定してください",
+        )
+    return await crud_reservation.get_availability_calendar(
+        company_id, branch_id, start_date, end_date
     )
 
 
-@router.get("/{reservation_id}", response_model=Reservation)
+@router.get("/{reservation_id}", response_model=Reservation, dependencies=OTHER_LIMIT)
 async def read_reservation(
     reservation_id: str,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(SecurityService.verify_firebase_token),
 ):
     """
     特定の予約情報を取得
 
+    ETagはドキュメントの最終更新日時から生成し、If-None-Matchが一致すれば304を返す。
+
     Args:
         reservation_id (str): 予約ID
         current_user (dict): 現在のユーザー情報（依存性注入）
@@ -92,17 +209,50 @@ async def read_reservation(
     Returns:
         Reservation: 予約情報
     """
-    reservation = await crud_reservation.get(reservation_id)
+    reservation, update_time = await crud_reservation.get_versioned(reservation_id)
     if not reservation:
         raise HTTPException(status_code=404, detail="予約が見つかりません")
-    if reservation.user_id != current_user["uid"]:
+    if reservation["user_id"] != current_user["uid"]:
         raise HTTPException(
             status_code=403, detail="この予約にアクセスする権限がありません"
         )
+    etag = make_etag("reservation", reservation_id, update_time.isoformat())
+    not_modified = conditional_response(request, response, etag, "reservation")
+    if not_modified:
+        return not_modified
     return reservation
 
 
-@router.put("/{reservation_id}", response_model=Reservation)
+@router.get(
+    "/{reservation_id}/wait-time",
+    response_model=WaitTimeEstimate,
+    dependencies=OTHER_LIMIT,
+)
+async def read_wait_time(
+    reservation_id: str,
+    current_user: dict = Depends(SecurityService.verify_firebase_token),
+):
+    """
+    予約の待ち順と推定待ち時間を取得
+
+    Args:
+        reservation_id (str): 予約ID
+        current_user (dict): 現在のユーザー情報（依存性注入）
+
+    Returns:
+        WaitTimeEstimate: 待ち行列内の位置と推定待ち時間（分）
+    """
+    reservation = await crud_reservation.get(reservation_id)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="予約が見つかりません")
+    if reservation["user_id"] != current_user["uid"]:
+        raise HTTPException(
+            status_code=403, detail="この予約にアクセスする権限がありません"
+        )
+    return await crud_reservation.get_wait_time(reservation)
+
+
+@router.put("/{reservation_id}", response_model=Reservation, dependencies=UPDATE_LIMIT)
 async def update_reservation(
     reservation_id: str,
     reservation_update: ReservationUpdate,
@@ -124,19 +274,22 @@ async def update_reservation(
     reservation = await crud_reservation.get(reservation_id)
     if not reservation:
         raise HTTPException(status_code=404, detail="予約が見つかりません")
-    if reservation.user_id != current_user["uid"]:
+    if reservation["user_id"] != current_user["uid"]:
         raise HTTPException(
             status_code=403, detail="この予約を更新する権限がありません"
         )
     if status:
         reservation_update.status = status
 
-    return await crud_reservation.update(
-        reservation_id=reservation_id, reservation_update=reservation_update
-    )
+    try:
+        return await crud_reservation.update(
+            reservation_id=reservation_id, reservation_update=reservation_update
+        )
+    except SlotUnavailableError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e)})
 
 
-@router.delete("/{reservation_id}")
+@router.delete("/{reservation_id}", dependencies=UPDATE_LIMIT)
 async def delete_reservation(
     reservation_id: str,
     current_user: dict = Depends(SecurityService.verify_firebase_token),
@@ -154,7 +307,7 @@ async def delete_reservation(
     reservation = await crud_reservation.get(reservation_id)
     if not reservation:
         raise HTTPException(status_code=404, detail="予約が見つかりません")
-    if reservation.user_id != current_user["uid"]:
+    if reservation["user_id"] != current_user["uid"]:
         raise HTTPException(
             status_code=403, detail="この予約をキャンセルする権限がありません"
         )
@@ -163,21 +316,103 @@ async def delete_reservation(
     return {"message": "予約が正常にキャンセルされました"}
 
 
-@router.get("/availability/{date}", response_model=List[dict])
-async def check_availability(date: date):
+@router.get(
+    "/availability/{date}",
+    response_model=List[dict],
+    dependencies=AVAILABILITY_LIMIT,
+)
+async def check_availability(
+    date: date,
+    company_id: str = Query(...),
+    branch_id: str = Query(...),
+):
     """
-    指定日の予約可能な時間枠を取得
+    指定店舗・指定日の予約可能な時間枠を取得
 
     Args:
         date (date): 確認したい日付
+        company_id (str): 企業ID
+        branch_id (str): 店舗ID
+
+    Returns:
+        List[dict]: 時間枠ごとの空き状況
+    """
+    return await crud_reservation.get_available_slots(date, company_id, branch_id)
+
+
+# ステータスを一括変更できるロール
+STAFF_ROLES = ["system_admin", "company_admin", "store_admin"]
+
+
+@router.post(
+    "/{company_id}/{branch_id}/transitions",
+    response_model=ReservationTransitionResult,
+    dependencies=UPDATE_LIMIT,
+)
+async def transition_reservations(
+    company_id: str,
+    branch_id: str,
+    request: ReservationTransitionRequest,
+    current_user: dict = Depends(SecurityService.verify_firebase_token),
+):
+    """
+    店舗の予約のステータスを一括変更（スタッフ用）
+
+    「次の3件を呼び出す」「呼び出し中を全て完了にする」などを1リクエストで行う。
+    許可されていない遷移の予約は invalid_transition として結果に含め、変更しない。
+
+    Args:
+        company_id (str): 企業ID
+        branch_id (str): 店舗ID
+        request (ReservationTransitionRequest): 変更後のステータスと対象
+        current_user (dict): 現在のユーザー情報（依存性注入）
 
     Returns:
-        List[dict]: 利用可能な時間枠のリスト
+        ReservationTransitionResult: 変更件数と1件ごとの結果
     """
-    return await crud_reservation.get_available_slots(date)
+    if current_user.get("role") not in STAFF_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="この操作を実行する権限がありません",
+        )
+    if (
+        current_user.get("role") != "system_admin"
+        and current_user.get("company_id") != company_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="この企業のデータにアクセスする権限がありません",
+        )
+    if (
+        request.reservation_ids is not None
+        and len(request.reservation_ids) > settings.BATCH_TRANSITION_MAX_ITEMS
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に変更できる予約は{settings.BATCH_TRANSITION_MAX_ITEMS}件までです",
+        )
+
+    try:
+        results = await crud_reservation.transition_batch(
+            company_id,
+            branch_id,
+            request.status.value,
+            reservation_ids=request.reservation_ids,
+            from_status=request.from_status.value if request.from_status else None,
+            limit=request.limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    updated = sum(1 for result in results if result["result"] == "updated")
+    return ReservationTransitionResult(updated=updated, results=results)
 
 
-@router.get("/{company_id}/{branch_id}/summary", response_model=ReservationSummary)
+@router.get(
+    "/{company_id}/{branch_id}/summary",
+    response_model=ReservationSummary,
+    dependencies=QUEUE_DISPLAY_LIMIT,
+)
 async def get_reservation_summary(
     company_id: str,
     branch_id: str,
@@ -194,18 +429,81 @@ async def get_reservation_summary(
     Returns:
         ReservationSummary: 予約状況サマリー
     """
-    # 企業と店舗の存在確認
-    company = await crud_company.get(company_id)
+    # 企業と店舗の存在確認（1回の読み取りにまとめる）
+    company, branch = await asyncio.gather(
+        crud_company.get(company_id), crud_branch.get(branch_id)
+    )
     if not company:
         raise HTTPException(status_code=404, detail="企業が見つかりません")
-
-    branch = await crud_branch.get(branch_id)
     if not branch:
         raise HTTPException(status_code=404, detail="店舗が見つかりません")
 
     # 当日の予約状況サマリーを取得
     summary = await crud_reservation.get_daily_summary(
-        company_id=company_id, branch_id=branch_id, date=datetime.now().date()
+        company_id=company_id,
+        branch_id=branch_id,
+        date=datetime.now(settings.get_timezone()).date(),
     )
 
     return ReservationSummary(**summary)
+
+
+async def queue_event_stream(company_id: str, branch_id: str):
+    """
+    待ち状況のイベントをServer-Sent Events形式で送り続ける
+
+    日付が変わった場合は翌日の店舗・日別ドキュメントの購読に切り替える。
+    """
+    timezone = settings.get_timezone()
+    while True:
+        today = datetime.now(timezone).date()
+        async with queue_broadcaster.subscribe(
+            company_id, branch_id, today
+        ) as subscription:
+            while datetime.now(timezone).date() == today:
+                event = await subscription.get(
+                    timeout=settings.QUEUE_STREAM_KEEPALIVE_SECONDS
+                )
+                if event is None:
+                    # 接続維持のためのコメント行
+                    yield ": keepalive\n\n"
+                    continue
+                data = json.dumps(
+                    {"date": today.isoformat(), **event}, ensure_ascii=False
+                )
+                yield f"event: queue\ndata: {data}\n\n"
+
+
+@router.get("/{company_id}/{branch_id}/stream", dependencies=QUEUE_DISPLAY_LIMIT)
+async def stream_reservation_summary(
+    company_id: str,
+    branch_id: str,
+    current_user: dict = Depends(SecurityService.verify_firebase_token),
+):
+    """
+    指定企業・店舗の当日の待ち状況をServer-Sent Eventsで配信
+
+    受付・呼び出し・対応完了のたびに、最新のサマリーと変更内容
+    （changes）を「queue」イベントとして送る。
+
+    Args:
+        company_id (str): 企業ID
+        branch_id (str): 店舗ID
+        current_user (dict): 現在のユーザー情報（依存性注入）
+
+    Returns:
+        StreamingResponse: text/event-stream
+    """
+    company, branch = await asyncio.gather(
+        crud_company.get(company_id), crud_branch.get(branch_id)
+    )
+    if not company:
+        raise HTTPException(status_code=404, detail="企業が見つかりません")
+    if not branch:
+        raise HTTPException(status_code=404, detail="店舗が見つかりません")
+
+    return StreamingResponse(
+        queue_event_stream(company_id, branch_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -184,7 +184,7 @@ async def cleanup_auth(
             "deleted_users_count": deleted_count,
         }
     except Exception as e:
-        logger.error(f"Error during cleanup: {str(e)}")
+        logger.error("Error during cleanup: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"クリーンアップ処理中にエラーが発生しました: {str(e)}",
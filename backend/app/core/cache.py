@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUTTLCache:
+    """
+    有効期限付きのLRUキャッシュ
+
+    エントリごとに有効期限を持ち、件数が上限を超えた場合は最も長く
+    参照されていないエントリから追い出す。ヒット・ミス・追い出しの件数を
+    保持し、stats()で参照できる。
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_size (int): 最大エントリ数
+            ttl_seconds (float): エントリの最大保持秒数
+            clock (Callable): 現在時刻（秒）を返す関数（テスト用に差し替え可能）
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        キャッシュから値を取得する（期限切れの場合はdefaultを返す）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """
+        値を格納する
+
+        Args:
+            key: キー
+            value: 値
+            ttl_seconds (float, optional): 保持秒数（ttl_secondsより長い値は切り詰める）
+        """
+        ttl = (
+            self.ttl_seconds
+            if ttl_seconds is None
+            else min(ttl_seconds, self.ttl_seconds)
+        )
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """エントリを削除する（存在した場合True）"""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """全エントリを削除する"""
+        with self._lock:
+            self._entries.clear()
+
+    def values(self) -> list:
+        """期限内のエントリの値の一覧（ヒット・ミスの件数には数えない）"""
+        now = self._clock()
+        with self._lock:
+            return [
+                value
+                for value, expires_at in self._entries.values()
+                if expires_at > now
+            ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            dict: size, hits, misses, evictions, expirations, hit_ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
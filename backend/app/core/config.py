@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 import json
 import warnings
 from datetime import time
+from functools import cached_property
+from zoneinfo import ZoneInfo
 
 load_dotenv()
 
@@ -32,6 +34,24 @@ class Settings(BaseSettings):
     SECRET_KEY: str = Field(...)  # descriptionを削除
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # 検証済みIDトークンのキャッシュ（有効期限はトークンのexpとTTLの早い方）
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+
+    # 企業・店舗マスタのキャッシュ（存在しないIDは短いTTLでキャッシュ）
+    MASTER_CACHE_MAX_SIZE: int = 5000
+    MASTER_CACHE_TTL_SECONDS: int = 300
+    MASTER_CACHE_NEGATIVE_TTL_SECONDS: int = 30
+    MASTER_CACHE_LISTENER_ENABLED: bool = True
+
+    # ルートごとのCache-Control（ETagで再検証させる）
+    CACHE_CONTROL_POLICIES: dict[str, str] = Field(
+        default={
+            "companies": "private, max-age=60",
+            "branches": "private, max-age=60",
+            "reservation": "private, no-cache",
+        }
+    )
 
     # CORS設定
     BACKEND_CORS_ORIGINS: list[str] = Field(
@@ -64,11 +84,26 @@ class Settings(BaseSettings):
     FIREBASE_CREDENTIALS_PATH: str = os.path.join(
         os.getcwd(), "firebase/credentials/service-account.json"
     )
+    FIREBASE_PROJECT_ID: str = "demo-project"
+    # "firestore"（Firestore・エミュレータ）、"memory"（プロセス内、テスト・ベンチマーク用）
+    # または "sqlite"（SQLiteのファイル、単一サーバー構成用）
+    FIRESTORE_BACKEND: str = "firestore"
+    SQLITE_PATH: str = os.path.join(os.getcwd(), "data/reservations.db")
+
+    # IDトークン署名検証（Googleの公開鍵をメモリに保持し、バックグラウンドで更新）
+    GOOGLE_PUBLIC_KEYS_URL: str = (
+        "https://www.googleapis.com/robot/v1/metadata/x509/"
+        "securetoken@system.gserviceaccount.com"
+    )
+    PUBLIC_KEYS_MIN_REFRESH_SECONDS: int = 60
+    PUBLIC_KEYS_WAIT_TIMEOUT_SECONDS: float = 5.0
+    TOKEN_VERIFY_WORKERS: int = 2
+    TOKEN_CLOCK_SKEW_SECONDS: int = 5
 
-    @property
+    @cached_property
     def firebase_credentials(self) -> dict:
         """
-        Firebaseの認証情報を取得する
+        Firebaseの認証情報を取得する（ファイルは初回のみ読み込む）
 
         Returns:
             dict: サービスアカウントの認証情報
@@ -79,10 +114,28 @@ class Settings(BaseSettings):
     # ログ設定
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"
+    # 出力待ちのログの上限件数（超えた分は待たずに破棄する）
+    LOG_QUEUE_SIZE: int = 10000
+    # ロガー名（前方一致）ごとに残すINFO以下のログの割合（0〜1）。"" は全ロガーの既定値
+    LOG_SAMPLING_RATES: dict[str, float] = {}
+    # ロガー名（前方一致）ごとの1秒あたりの件数の上限（メッセージの書式ごとに数える）
+    # 既定では不正なトークンや混雑で拒否したリクエストごとに出るログを制限する
+    LOG_RATE_LIMITS: dict[str, float] = {
+        "app.core.rate_limit": 10,
+        "app.core.security": 10,
+        "app.middleware.admission": 10,
+    }
+    LOG_RATE_LIMIT_BURST: int = 50
 
     # 予約制限
     MAX_CONCURRENT_RESERVATIONS: int = 5
     RESERVATION_ADVANCE_DAYS: int = 1
+    # 一括登録（POST /reservations/bulk）で一度に受け付ける最大件数
+    BULK_RESERVATION_MAX_ITEMS: int = 1000
+    # ステータスの一括変更で一度に扱える最大件数（1トランザクションで書き込む）
+    BATCH_TRANSITION_MAX_ITEMS: int = 100
+    # 空き状況カレンダーで一度に取得できる最大日数
+    AVAILABILITY_MAX_RANGE_DAYS: int = 92
     CANCELLATION_HOURS_BEFORE: int = 24
 
     # 営業時間設定
@@ -91,6 +144,8 @@ class Settings(BaseSettings):
     TIME_SLOT_MINUTES: int = 30
     MAX_RESERVATION_HOURS: int = 3
     MIN_RESERVATION_MINUTES: int = 30
+    # 受付番号の採番・日別集計で「1日」を区切るタイムゾーン
+    TIMEZONE: str = "Asia/Tokyo"
 
     # キャンセルポリシー
     FREE_CANCELLATION_HOURS: int = 24
@@ -100,9 +155,19 @@ class Settings(BaseSettings):
     RESERVATION_NUMBER_FORMAT: str = "%04d"
     RESERVATION_NUMBER_PREFIX: Optional[str] = None
 
+    # 待ち状況のリアルタイム配信（SSE）
+    QUEUE_STREAM_BUFFER_SIZE: int = 16  # 購読者ごとの未送信イベント数の上限
+    QUEUE_STREAM_IDLE_SECONDS: int = 30  # 購読者がいなくなってからリスナーを止めるまで
+    QUEUE_STREAM_KEEPALIVE_SECONDS: int = 15
+
     # 待ち時間計算
     WAIT_TIME_UPDATE_INTERVAL: int = 5
-    DEFAULT_APPOINTMENT_DURATION: int = 30
+    DEFAULT_APPOINTMENT_DURATION: int = 30  # 対応時間の実績がない店舗で使う値（分）
+    # 対応時間（呼び出し→完了）の指数移動平均の重みと、外れ値とみなす上限・下限（分）
+    # 下限未満は対応の実績ではなく、呼び出しと完了をまとめて操作したものとみなす
+    WAIT_TIME_EWMA_ALPHA: float = 0.2
+    WAIT_TIME_MAX_SERVICE_MINUTES: int = 240
+    WAIT_TIME_MIN_SERVICE_MINUTES: float = 1
 
     # 表示制限
     MAX_NEXT_APPOINTMENTS_DISPLAY: int = 5
@@ -113,6 +178,37 @@ class Settings(BaseSettings):
     RATE_LIMIT_RESERVATION_UPDATE: int = 20
     RATE_LIMIT_AVAILABILITY_CHECK: int = 60
     RATE_LIMIT_OTHER_ENDPOINTS: int = 30
+    # 上記の回数を補充する期間（秒）。トークンバケットの容量は上記の回数
+    RATE_LIMIT_WINDOW_SECONDS: int = 3600
+    # 待ち状況の表示（summary・stream）。受付の表示画面がWAIT_TIME_UPDATE_INTERVAL秒
+    # ごとに再取得しても掛からないよう、1分あたりの回数で指定する
+    RATE_LIMIT_QUEUE_DISPLAY: int = 60
+    RATE_LIMIT_QUEUE_DISPLAY_WINDOW_SECONDS: int = 60
+    # 認証（signup・login）。接続元IPアドレス単位のため、同じネットワークの
+    # 複数の利用者を見込んで1分あたりの回数で指定する
+    RATE_LIMIT_AUTH: int = 20
+    RATE_LIMIT_AUTH_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_ENABLED: bool = True
+    # "memory"（プロセス内）または "redis"（複数プロセスで共有、redisパッケージが必要）
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    # プロセス内で保持するバケット数の上限（超えた場合は最も古いものから破棄）
+    RATE_LIMIT_MAX_KEYS: int = 100000
+
+    # 同時処理数の制御（ルート種別ごとの同時実行数の上限と待ち行列）
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_CONCURRENCY_LIMITS: dict[str, int] = Field(
+        default={"reservation_write": 32, "availability": 64, "other": 64}
+    )
+    # 待ち時間の目標（ミリ秒）。超えた場合は503を返す
+    ADMISSION_QUEUE_TARGET_MS: int = 500
+    ADMISSION_MAX_QUEUE: int = 256
+
+    # リクエストごとのFirestoreの読み取り・書き込み数（Server-Timingヘッダーとログ）
+    REQUEST_COST_ENABLED: bool = True
+    # 開発時の確認用。読み取り数の上限超過と、同じドキュメントの繰り返し読み取り（N+1）を警告する
+    REQUEST_COST_CHECKS_ENABLED: bool = False
+    REQUEST_READ_BUDGET: int = 100
 
     def get_business_hours_start(self) -> time:
         """営業開始時間をtime型で取得"""
@@ -124,6 +220,10 @@ class Settings(BaseSettings):
         hours, minutes = map(int, self.BUSINESS_HOURS_END.split(":"))
         return time(hour=hours, minute=minutes)
 
+    def get_timezone(self) -> ZoneInfo:
+        """業務日付の判定に使うタイムゾーンを取得"""
+        return ZoneInfo(self.TIMEZONE)
+
 
 # グローバル設定インスタンスの作成
 settings = Settings()
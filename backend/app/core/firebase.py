@@ -1,20 +1,67 @@
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import credentials, firestore, firestore_async, auth
 from .config import settings
+from .firestore_metrics import instrument_client
+import asyncio
 import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
 _firestore_client = None
+_async_firestore_client = None
 _is_initialized = False
+_init_lock = threading.Lock()
+# FIRESTORE_BACKEND="memory"/"sqlite" の場合のデータの保存先（同期・非同期のクライアントで共有）
+_local_store = None
+
+LOCAL_BACKENDS = ("memory", "sqlite")
+
+
+def get_local_store():
+    """
+    プロセス内・SQLiteのバックエンドのデータの保存先を取得
+
+    Firestoreを使う場合は読み込まないよう、モジュールはここで読み込む。
+    """
+    global _local_store
+    if _local_store is None:
+        if settings.FIRESTORE_BACKEND == "sqlite":
+            from .sqlite_firestore import SqliteStore
+
+            _local_store = SqliteStore(settings.SQLITE_PATH)
+        else:
+            from .memory_firestore import MemoryStore
+
+            _local_store = MemoryStore()
+    return _local_store
 
 
 def initialize_firebase():
-    """Firebase SDKの初期化"""
+    """
+    Firebase SDKの初期化
+
+    起動時ではなくクライアントの初回取得時（または準備処理）に呼ばれる。
+    準備処理のスレッドとリクエストから同時に呼ばれても初期化は1回だけ行う。
+    """
     global _firestore_client, _is_initialized
 
-    if not _is_initialized:
+    with _init_lock:
+        if _is_initialized:
+            return
+
+        if settings.FIRESTORE_BACKEND in LOCAL_BACKENDS:
+            from .memory_firestore import MemoryClient
+
+            # プロセス内・SQLiteのバックエンドでは認証情報・エミュレータは不要
+            _firestore_client = MemoryClient(get_local_store())
+            _is_initialized = True
+            logger.info(
+                "Local Firestore backend initialized: %s", settings.FIRESTORE_BACKEND
+            )
+            return
+
         try:
             # 開発環境の場合、エミュレータの設定
             if settings.ENVIRONMENT == "development":
@@ -27,30 +74,31 @@ def initialize_firebase():
 
             # Firebaseの初期化
             if not firebase_admin._apps:
-                firebase_admin.initialize_app(cred, {"projectId": "demo-project"})
+                firebase_admin.initialize_app(
+                    cred, {"projectId": settings.FIREBASE_PROJECT_ID}
+                )
                 logger.info("Firebase Admin SDK initialized")
 
             _firestore_client = firestore.client()
             _is_initialized = True
             logger.info("Firestore client initialized")
 
-            # エミュレータ接続の確認
-            if settings.ENVIRONMENT == "development":
-                try:
-                    # テストドキュメントの作成と削除
-                    test_ref = _firestore_client.collection("_test").document()
-                    test_ref.set({"test": True})
-                    test_ref.delete()
-                    logger.info("Successfully connected to Firestore Emulator")
-                except Exception as e:
-                    logger.error(f"Failed to connect to Firestore Emulator: {e}")
-                    raise
-
         except Exception as e:
-            logger.error(f"Failed to initialize Firebase: {e}")
+            logger.error("Failed to initialize Firebase: %s", e)
             raise
 
 
+async def warm_up_firestore() -> None:
+    """
+    Firestoreへの接続を確立する（準備処理から呼ぶ）
+
+    存在しないドキュメントを1件読み取り、チャネルの接続と認証トークンの取得を
+    最初のリクエストより前に済ませる。接続できない場合は例外を送出する。
+    """
+    await asyncio.to_thread(initialize_firebase)
+    await get_async_firestore().collection("_warmup").document("ping").get()
+
+
 def get_firestore():
     """初期化済みのFirestoreクライアントを取得"""
     global _firestore_client
@@ -59,6 +107,26 @@ def get_firestore():
     return _firestore_client
 
 
+def get_async_firestore():
+    """
+    初期化済みの非同期Firestoreクライアントを取得
+
+    CRUD層はこちらを使用する。RPCの完了をイベントループ上で待機するため、
+    1ワーカーで複数リクエストのFirestore呼び出しを並行して処理できる。
+    """
+    global _async_firestore_client
+    if not _is_initialized:
+        initialize_firebase()
+    if _async_firestore_client is None and settings.FIRESTORE_BACKEND in LOCAL_BACKENDS:
+        from .memory_firestore import AsyncMemoryClient
+
+        _async_firestore_client = AsyncMemoryClient(get_local_store())
+    if _async_firestore_client is None:
+        # RPCごとの件数・レイテンシを/metricsで参照できるようにする
+        _async_firestore_client = instrument_client(firestore_async.client())
+    return _async_firestore_client
+
+
 def get_auth():
     """初期化済みのAuth clientを取得"""
     if not _is_initialized:
@@ -0,0 +1,267 @@
+import functools
+import inspect
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from importlib import metadata
+from typing import Dict, Optional
+from .metrics import (
+    FIRESTORE_DOCUMENTS_READ,
+    FIRESTORE_DOCUMENTS_WRITTEN,
+    FIRESTORE_RPC_DURATION,
+    FIRESTORE_RPCS,
+    FIRESTORE_TRANSACTION_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# 実行中のCRUDメソッド名（例: "reservation.create"）。RPCの計測値をこの名前で集計する
+_current_method: ContextVar[str] = ContextVar("crud_method", default="other")
+
+
+class RequestCost:
+    """1リクエスト中のFirestoreのRPC数・読み取り/書き込み数・RPCの合計時間"""
+
+    __slots__ = ("rpcs", "reads", "writes", "rpc_seconds", "point_reads")
+
+    def __init__(self):
+        self.rpcs = 0
+        self.reads = 0
+        self.writes = 0
+        self.rpc_seconds = 0.0
+        # ドキュメントごとの個別読み取り回数（N+1の検出用）
+        self.point_reads: Counter = Counter()
+
+    def repeated_reads(self) -> Dict[str, int]:
+        """2回以上個別に読み取ったドキュメントとその回数"""
+        return {name: count for name, count in self.point_reads.items() if count > 1}
+
+    def to_dict(self) -> dict:
+        return {
+            "rpcs": self.rpcs,
+            "reads": self.reads,
+            "writes": self.writes,
+            "rpc_ms": round(self.rpc_seconds * 1000, 1),
+        }
+
+
+_request_cost: ContextVar[Optional[RequestCost]] = ContextVar(
+    "request_cost", default=None
+)
+
+
+def start_request_cost():
+    """現在のコンテキストで集計を開始し、(RequestCost, 復元用トークン) を返す"""
+    cost = RequestCost()
+    return cost, _request_cost.set(cost)
+
+
+def end_request_cost(token) -> None:
+    _request_cost.reset(token)
+
+
+def instrumented(prefix: str):
+    """
+    CRUDクラスの公開メソッドの実行中に、Firestore RPCの計測値を
+    "<prefix>.<メソッド名>" で集計するクラスデコレータ
+
+    Args:
+        prefix (str): 集計名の接頭辞（例: "reservation"）
+    """
+
+    def decorate(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.iscoroutinefunction(func):
+                continue
+            setattr(cls, name, _with_method(f"{prefix}.{name}", func))
+        return cls
+
+    return decorate
+
+
+def _with_method(method: str, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _current_method.set(method)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _current_method.reset(token)
+
+    return wrapper
+
+
+class _Timer:
+    """1回のRPCの計測（完了時に件数とレイテンシを記録）"""
+
+    __slots__ = ("method", "rpc", "started_at", "cost")
+
+    def __init__(self, rpc: str):
+        self.method = _current_method.get()
+        self.rpc = rpc
+        self.started_at = time.perf_counter()
+        self.cost = _request_cost.get()
+
+    def finish(self, outcome: str) -> None:
+        elapsed = time.perf_counter() - self.started_at
+        FIRESTORE_RPC_DURATION.labels(self.method, self.rpc).observe(elapsed)
+        FIRESTORE_RPCS.labels(self.method, self.rpc, outcome).inc()
+        if self.cost is not None:
+            self.cost.rpcs += 1
+            self.cost.rpc_seconds += elapsed
+
+    def read(self, documents: int) -> None:
+        FIRESTORE_DOCUMENTS_READ.labels(self.method).inc(documents)
+        if self.cost is not None:
+            self.cost.reads += documents
+
+    def written(self, documents: int) -> None:
+        FIRESTORE_DOCUMENTS_WRITTEN.labels(self.method).inc(documents)
+        if self.cost is not None:
+            self.cost.writes += documents
+
+
+class InstrumentedFirestoreApi:
+    """
+    Firestoreの低レベルAPI（GAPICクライアント）を包み、RPCごとの件数・
+    レイテンシ・読み取り/書き込みドキュメント数を記録する
+
+    ドキュメントの取得・クエリ・バッチ・トランザクションはすべてこのAPIを
+    経由するため、CRUD層のコードを変えずに計測できる。
+    """
+
+    def __init__(self, api):
+        self._api = api
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+    async def commit(self, request=None, **kwargs):
+        timer = _Timer("commit")
+        try:
+            response = await self._api.commit(request=request, **kwargs)
+        except Exception:
+            timer.finish("error")
+            raise
+        timer.finish("ok")
+        writes = request.get("writes") if isinstance(request, dict) else None
+        if writes:
+            timer.written(len(writes))
+        return response
+
+    async def begin_transaction(self, request=None, **kwargs):
+        timer = _Timer("begin_transaction")
+        options = request.get("options") if isinstance(request, dict) else None
+        read_write = getattr(options, "read_write", None)
+        if read_write is not None and getattr(read_write, "retry_transaction", None):
+            # 競合で失敗したトランザクションの再試行
+            FIRESTORE_TRANSACTION_RETRIES.labels(timer.method).inc()
+        try:
+            response = await self._api.begin_transaction(request=request, **kwargs)
+        except Exception:
+            timer.finish("error")
+            raise
+        timer.finish("ok")
+        return response
+
+    async def rollback(self, request=None, **kwargs):
+        timer = _Timer("rollback")
+        try:
+            response = await self._api.rollback(request=request, **kwargs)
+        except Exception:
+            timer.finish("error")
+            raise
+        timer.finish("ok")
+        return response
+
+    async def batch_get_documents(self, request=None, **kwargs):
+        cost = _request_cost.get()
+        if cost is not None and isinstance(request, dict):
+            cost.point_reads.update(request.get("documents") or ())
+        return await self._stream(
+            "batch_get_documents",
+            self._api.batch_get_documents(request=request, **kwargs),
+            "found",
+        )
+
+    async def run_query(self, request=None, **kwargs):
+        return await self._stream(
+            "run_query", self._api.run_query(request=request, **kwargs), "document"
+        )
+
+    async def run_aggregation_query(self, request=None, **kwargs):
+        return await self._stream(
+            "run_aggregation_query",
+            self._api.run_aggregation_query(request=request, **kwargs),
+            "result",
+        )
+
+    async def _stream(self, rpc: str, call, document_field: str):
+        timer = _Timer(rpc)
+        try:
+            responses = await call
+        except Exception:
+            timer.finish("error")
+            raise
+        return self._count_documents(timer, responses, document_field)
+
+    @staticmethod
+    async def _count_documents(timer: _Timer, responses, document_field: str):
+        # レイテンシは最後のレスポンスを受け取るまで（途中で打ち切られた場合はそこまで）
+        documents = 0
+        outcome = "error"
+        try:
+            async for response in responses:
+                if document_field in response:
+                    documents += 1
+                yield response
+            outcome = "ok"
+        except GeneratorExit:
+            # 呼び出し側が途中で読み取りをやめた場合
+            outcome = "ok"
+            raise
+        finally:
+            timer.finish(outcome)
+            if documents:
+                timer.read(documents)
+
+
+def _firestore_version() -> str:
+    try:
+        return metadata.version("google-cloud-firestore")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def instrument_client(client):
+    """
+    非同期Firestoreクライアントの低レベルAPIを計測付きのものに差し替える
+
+    google-cloud-firestore（requirements.txtで固定した2.20.1）の非公開属性
+    _firestore_api_internal を差し替える。属性がない・差し替えが反映されない
+    バージョンでは警告を出し、計測せずにそのまま返す。
+
+    Args:
+        client: firestore_async.client() で取得したクライアント
+
+    Returns:
+        同じクライアント
+    """
+    if not hasattr(client, "_firestore_api_internal"):
+        logger.warning(
+            "Firestore client has no _firestore_api_internal; RPC metrics are disabled (google-cloud-firestore %s)",
+            _firestore_version(),
+        )
+        return client
+    api = client._firestore_api
+    if isinstance(api, InstrumentedFirestoreApi):
+        return client
+    client._firestore_api_internal = InstrumentedFirestoreApi(api)
+    if not isinstance(client._firestore_api, InstrumentedFirestoreApi):
+        logger.warning(
+            "Firestore client ignores _firestore_api_internal; RPC metrics are disabled (google-cloud-firestore %s)",
+            _firestore_version(),
+        )
+        client._firestore_api_internal = api
+    return client
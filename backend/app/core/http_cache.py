@@ -0,0 +1,62 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from .config import settings
+
+
+def make_etag(*parts) -> str:
+    """
+    強いETagを生成
+
+    Args:
+        *parts: ETagの元になる値（更新日時・更新番号・クエリパラメータなど）
+
+    Returns:
+        str: 引用符で囲んだETag
+    """
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Matchヘッダーが現在のETagに一致するかを判定
+
+    If-None-Matchは弱い比較のため、W/ 付きのETagも一致とみなす。
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request, response: Response, etag: str, route: str
+) -> Optional[Response]:
+    """
+    ETagとCache-Controlを設定し、If-None-Matchが一致すれば304を返す
+
+    Args:
+        request (Request): リクエスト
+        response (Response): エンドポイントのレスポンス（ヘッダー設定用）
+        etag (str): 現在のETag
+        route (str): settings.CACHE_CONTROL_POLICIESのキー
+
+    Returns:
+        Optional[Response]: 一致した場合は304のレスポンス、それ以外はNone
+    """
+    headers = {"ETag": etag}
+    policy = settings.CACHE_CONTROL_POLICIES.get(route)
+    if policy:
+        headers["Cache-Control"] = policy
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,59 +1,228 @@
+"""
+ログ出力の設定
+
+ログはキュー（QueueHandler）に積むだけで呼び出し元に戻り、標準出力への書き込みは
+QueueListenerのスレッドで行う。キューが一杯の場合は待たずに破棄するため、
+ログ出力がイベントループ（リクエスト処理）を塞ぐことはない。
+
+大量に出るメッセージはロガーごとにサンプリング・件数制限できる。件数制限は
+%で値を埋める前のメッセージ書式ごとに数えるため、ログは
+logger.info("... %s", value) の形式で書く（f-stringでは値ごとに別の書式になる）。
+"""
+
+import atexit
+import copy
+import json
 import logging
-from logging.config import dictConfig
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, Optional
 from .config import settings
+from .metrics import LOG_RECORDS_DROPPED
+from .token_bucket import refill
 
-logging_config = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "json": {
-            "class": "pythonjsonlogger.jsonlogger.JsonFormatter",
-            "format": "%(asctime)s %(name)s %(levelname)s %(message)s",
-        }
-    },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "json",
-            "stream": "ext://sys.stdout",
-        }
-    },
-    "loggers": {
-        "app": {
-            "handlers": ["console"],
-            "level": settings.LOG_LEVEL,
-            "propagate": False,
-        }
-    },
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecordの標準の属性（これ以外はextraで渡された項目としてJSONに含める）
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
 }
 
-dictConfig(logging_config)
-logger = logging.getLogger("app")
 
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行のJSONにする（extraで渡した項目も含める）"""
 
-def setup_custom_logging():
-    # ルートロガーの設定
-    logger = logging.getLogger()
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        if record.stack_info:
+            payload["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
 
-    # 既存のハンドラをクリア
-    logger.handlers.clear()
 
-    # コンソールハンドラの設定
-    console_handler = logging.StreamHandler()
+class _PerLogger:
+    """ロガー名の前方一致（ドット区切り）で設定値を引く。"" は全ロガーの既定値"""
 
-    # フォーマッターの設定
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    console_handler.setFormatter(formatter)
+    def __init__(self, values: Dict[str, float], default: float):
+        self._values = dict(values)
+        self._default = self._values.pop("", default)
+        self._resolved: Dict[str, float] = {}
+
+    def get(self, name: str) -> float:
+        value = self._resolved.get(name)
+        if value is None:
+            value = self._default
+            prefix = name
+            while prefix:
+                if prefix in self._values:
+                    value = self._values[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = value
+        return value
+
+
+class SamplingFilter(logging.Filter):
+    """
+    ロガーごとに指定した割合のレコードだけを残す（WARNING以上は常に残す）
+
+    Args:
+        rates (Dict[str, float]): {ロガー名: 残す割合（0〜1）}
+    """
+
+    def __init__(
+        self, rates: Dict[str, float], random: Callable[[], float] = random.random
+    ):
+        super().__init__()
+        self._rates = _PerLogger(rates, 1.0)
+        self._random = random
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rates.get(record.name)
+        if rate >= 1.0 or self._random() < rate:
+            return True
+        LOG_RECORDS_DROPPED.labels("sampled").inc()
+        return False
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    ロガー・メッセージ書式ごとに1秒あたりの件数を制限する（トークンバケット）
+
+    超過分は破棄し、次に出力するレコードに破棄した件数を suppressed として付ける。
 
-    # ログレベルの設定
-    logger.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
-    console_handler.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
+    Args:
+        limits (Dict[str, float]): {ロガー名: 1秒あたりの件数}（0以下は制限なし）
+        burst (int): 連続して出力できる件数（バケットの容量）
+        max_keys (int): 保持する書式数の上限（超えた場合は全て破棄して数え直す）
+    """
 
-    # ハンドラの追加
-    logger.addHandler(console_handler)
+    def __init__(
+        self,
+        limits: Dict[str, float],
+        burst: int,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        self._limits = _PerLogger(limits, 0.0)
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        # {(ロガー名, 書式): [残りトークン, 更新時刻, 破棄した件数]}
+        self._buckets: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self._limits.get(record.name)
+        if rate <= 0:
+            return True
+        key = (record.name, str(record.msg))
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            result = refill(bucket[0], now - bucket[1], self.burst, rate, 1)
+            bucket[0], bucket[1] = result.remaining, now
+            if not result.allowed:
+                bucket[2] += 1
+                LOG_RECORDS_DROPPED.labels("rate_limited").inc()
+                return False
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """キューが一杯の場合は待たずにレコードを破棄するQueueHandler"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # メッセージは呼び出し元のスレッドで確定させる（引数が後で変更されても影響しない）
+        # 例外のトレースバックはメッセージに含めず、出力側のFormatterで扱えるよう残す
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+
+_listener: Optional[QueueListener] = None
+
+
+def create_formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def setup_logging() -> None:
+    """
+    ルートロガーにキュー経由のハンドラを設定し、出力スレッドを開始する
+
+    logging.basicConfigと同様に、ルートロガーに既にハンドラがある場合
+    （テスト実行時など）は何もしない。
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(create_formatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(settings.LOG_SAMPLING_RATES))
+    handler.addFilter(
+        RateLimitFilter(settings.LOG_RATE_LIMITS, settings.LOG_RATE_LIMIT_BURST)
+    )
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG if settings.DEBUG else settings.LOG_LEVEL)
 
     # Firestoreの警告を制御
     if not settings.DEBUG:
         logging.getLogger("google.cloud.firestore_v1").setLevel(logging.WARNING)
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    # 終了時にキューに残っているログを書き出す
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """出力スレッドを止める（キューに残っているログは書き出してから止まる）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
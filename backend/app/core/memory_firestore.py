@@ -0,0 +1,910 @@
+"""
+プロセス内で動作するFirestore互換のバックエンド
+
+CRUD層が使う範囲のFirestore API（コレクション・ドキュメントの読み書き、
+where/order_by/limit/offset/start_after/selectによるクエリ、バッチ、
+トランザクション、get_all、スナップショットリスナー）を実装する。
+エミュレータなしでテストやベンチマークを実行するために使う
+（settings.FIRESTORE_BACKEND = "memory"）。
+
+Firestoreと同様に、値の保存時にtzなしのdatetimeはUTCとみなしてtz付きに変換し、
+トランザクションでは書き込み後の読み取りを禁止し、読み取ったドキュメントが
+コミットまでに更新されていた場合はAbortedで失敗させる（async_transactionalが再試行する）。
+"""
+
+import contextlib
+import copy
+import functools
+import threading
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from google.api_core import exceptions
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1._helpers import ReadAfterWriteError
+from google.cloud.firestore_v1.base_collection import _auto_id
+from google.cloud.firestore_v1.base_document import DocumentSnapshot
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+import logging
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_ID = "__name__"
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+WriteResult = namedtuple("WriteResult", ["update_time"])
+
+
+class _StoredDocument:
+    __slots__ = ("data", "create_time", "update_time")
+
+    def __init__(self, data: dict, create_time: datetime, update_time: datetime):
+        self.data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+
+def _encode(value):
+    """保存時の値の変換（Firestoreに保存して読み戻した場合と同じ型にする）"""
+    if isinstance(value, Enum) and not isinstance(value, (str, int)):
+        raise TypeError(f"Cannot convert to a Firestore Value: {value!r}")
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, str):
+        return str.__str__(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+    if isinstance(value, date):
+        raise TypeError(f"Cannot convert to a Firestore Value: {value!r}")
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _encode(item) for key, item in value.items()}
+    return value
+
+
+# 型の異なる値を並べる場合のFirestoreの順序
+def _type_rank(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, _DocumentReference):
+        return 6
+    if isinstance(value, list):
+        return 8
+    if isinstance(value, dict):
+        return 9
+    return 7
+
+
+def _compare_values(left, right) -> int:
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if isinstance(left, _DocumentReference):
+        left, right = left.path, right.path
+    elif isinstance(left, (list, dict)):
+        left, right = repr(left), repr(right)
+    if left == right:
+        return 0
+    return -1 if left < right else 1
+
+
+_MISSING = object()
+
+
+def _get_field(document_id: str, data: dict, field_path: str):
+    if field_path == DOCUMENT_ID:
+        return document_id
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _matches(value, op: str, operand) -> bool:
+    if value is _MISSING:
+        return False
+    if op == "==":
+        return _type_rank(value) == _type_rank(operand) and value == operand
+    if op == "!=":
+        return value is not None and not (
+            _type_rank(value) == _type_rank(operand) and value == operand
+        )
+    if op == "in":
+        return any(_matches(value, "==", item) for item in operand)
+    if op == "not-in":
+        return value is not None and not _matches(value, "in", operand)
+    if op == "array_contains":
+        return isinstance(value, list) and any(
+            _matches(item, "==", operand) for item in value
+        )
+    if op == "array_contains_any":
+        return isinstance(value, list) and any(
+            _matches(item, "in", operand) for item in value
+        )
+    # 範囲の条件は同じ型の値だけが一致する
+    if _type_rank(value) != _type_rank(operand):
+        return False
+    comparison = _compare_values(value, operand)
+    if op == "<":
+        return comparison < 0
+    if op == "<=":
+        return comparison <= 0
+    if op == ">":
+        return comparison > 0
+    if op == ">=":
+        return comparison >= 0
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+def _apply_value(target: dict, key: str, value, existing, now: datetime) -> None:
+    """フィールドに値（DELETE_FIELDなどの変換を含む）を反映する"""
+    if value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    elif value is transforms.SERVER_TIMESTAMP:
+        target[key] = now
+    elif isinstance(value, transforms.Increment):
+        current = existing if isinstance(existing, (int, float)) else 0
+        if isinstance(current, bool):
+            current = 0
+        target[key] = current + value.value
+    elif isinstance(value, transforms.ArrayUnion):
+        current = list(existing) if isinstance(existing, list) else []
+        for item in _encode(list(value.values)):
+            if item not in current:
+                current.append(item)
+        target[key] = current
+    elif isinstance(value, transforms.ArrayRemove):
+        removed = _encode(list(value.values))
+        current = existing if isinstance(existing, list) else []
+        target[key] = [item for item in current if item not in removed]
+    elif isinstance(value, dict):
+        target[key] = _merge({}, value, now)
+    else:
+        target[key] = _encode(value)
+
+
+def _merge(target: dict, data: dict, now: datetime) -> dict:
+    """ネストしたマップ単位でdataをtargetにマージする（set(merge=True)の動作）"""
+    for key, value in data.items():
+        existing = target.get(key)
+        if isinstance(value, dict) and value and isinstance(existing, dict):
+            _merge(existing, value, now)
+        else:
+            _apply_value(target, key, value, existing, now)
+    return target
+
+
+def _update(target: dict, field_updates: dict, now: datetime) -> dict:
+    """ドット区切りのフィールドパスごとに値を反映する（update()の動作）"""
+    for field_path, value in field_updates.items():
+        parts = field_path.split(".")
+        container = target
+        for part in parts[:-1]:
+            child = container.get(part)
+            if not isinstance(child, dict):
+                child = container[part] = {}
+            container = child
+        _apply_value(container, parts[-1], value, container.get(parts[-1]), now)
+    return target
+
+
+class _Listener:
+    def __init__(self, store, path: str, is_collection: bool, callback: Callable):
+        self.store = store
+        self.path = path
+        self.is_collection = is_collection
+        self.callback = callback
+
+    def unsubscribe(self) -> None:
+        self.store._remove_listener(self)
+
+
+class MemoryStore:
+    """
+    ドキュメントの保存先（同期・非同期のクライアントで共有する）
+
+    書き込みはロックを取ってまとめて反映し、コミット後にリスナーへ通知する。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # {コレクションのパス: {ドキュメントID: _StoredDocument}}
+        self._collections: Dict[str, Dict[str, _StoredDocument]] = {}
+        self._listeners: List[_Listener] = []
+        self._last_time = datetime.fromtimestamp(0, timezone.utc)
+
+    def _now(self) -> datetime:
+        # 更新日時はETagなどに使われるため、同じ時刻にならないようにする
+        now = datetime.now(timezone.utc)
+        if now <= self._last_time:
+            now = self._last_time + timedelta(microseconds=1)
+        self._last_time = now
+        return now
+
+    @staticmethod
+    def _split(path: str) -> Tuple[str, str]:
+        collection_path, _, document_id = path.rpartition("/")
+        return collection_path, document_id
+
+    def get(self, path: str) -> Optional[_StoredDocument]:
+        collection_path, document_id = self._split(path)
+        with self._lock:
+            return self._collections.get(collection_path, {}).get(document_id)
+
+    def documents(
+        self, collection_path: str, filters: Iterable[Tuple[str, str, Any]] = ()
+    ) -> List[Tuple[str, _StoredDocument]]:
+        """
+        コレクションのドキュメントの一覧
+
+        Args:
+            collection_path (str): コレクションのパス
+            filters: クエリの条件（絞り込みに使えるストアのみ参照する。
+                結果は呼び出し側で改めて条件を判定する）
+        """
+        with self._lock:
+            return list(self._collections.get(collection_path, {}).items())
+
+    def collection_paths(self) -> List[str]:
+        with self._lock:
+            return [path for path, docs in self._collections.items() if docs]
+
+    def commit(
+        self, writes: List[tuple], read_versions: Optional[Dict[str, Any]] = None
+    ) -> List[WriteResult]:
+        """
+        書き込みをまとめて反映する
+
+        Args:
+            writes (List[tuple]): (操作, パス, データ, オプション) の一覧
+            read_versions (Dict[str, Any], optional): トランザクションで読み取った
+                ドキュメントの更新日時（存在しない場合None）
+
+        Raises:
+            exceptions.Aborted: 読み取り後に他の書き込みで更新されていた場合
+            exceptions.NotFound: 存在しないドキュメントをupdateした場合
+            exceptions.Conflict: 既存のドキュメントをcreateした場合
+        """
+        with self._lock, self._write_transaction():
+            for path, update_time in (read_versions or {}).items():
+                current = self.get(path)
+                if (current.update_time if current else None) != update_time:
+                    raise exceptions.Aborted(
+                        f"Transaction aborted: {path} was modified concurrently"
+                    )
+
+            now = self._now()
+            pending: Dict[str, Optional[_StoredDocument]] = {}
+            for op, path, data, option in writes:
+                current = pending[path] if path in pending else self.get(path)
+                if op == "delete":
+                    pending[path] = None
+                    continue
+                if op == "update" and current is None:
+                    raise exceptions.NotFound(f"No document to update: {path}")
+                if op == "create" and current is not None:
+                    raise exceptions.Conflict(f"Document already exists: {path}")
+                base = copy.deepcopy(current.data) if current else {}
+                if op == "update":
+                    new_data = _update(base, data, now)
+                elif op == "set" and option:
+                    new_data = _merge(base, data, now)
+                else:
+                    new_data = _merge({}, data, now)
+                pending[path] = _StoredDocument(
+                    new_data, current.create_time if current else now, now
+                )
+
+            changes = []
+            for path, document in pending.items():
+                previous = self.get(path)
+                if document is None and previous is None:
+                    continue
+                self._put(path, document)
+                if document is None:
+                    changes.append((path, ChangeType.REMOVED))
+                elif previous is None:
+                    changes.append((path, ChangeType.ADDED))
+                else:
+                    changes.append((path, ChangeType.MODIFIED))
+            listeners = list(self._listeners)
+
+        self._notify(listeners, changes, now)
+        return [WriteResult(now) for _ in writes]
+
+    def _write_transaction(self):
+        """commitの読み取り・書き込みをまとめる範囲（永続化するストアで使う）"""
+        return contextlib.nullcontext()
+
+    def _put(self, path: str, document: Optional[_StoredDocument]) -> None:
+        """ドキュメントを保存する（Noneの場合は削除）"""
+        collection_path, document_id = self._split(path)
+        if document is None:
+            self._collections.get(collection_path, {}).pop(document_id, None)
+        else:
+            self._collections.setdefault(collection_path, {})[document_id] = document
+
+    def clear(self) -> None:
+        """全ドキュメントを削除する（リスナーには通知しない）"""
+        with self._lock:
+            self._collections.clear()
+
+    def add_listener(self, listener: _Listener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _remove_listener(self, listener: _Listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self, listeners: List[_Listener], changes: list, read_time) -> None:
+        for listener in listeners:
+            relevant = [
+                (path, change_type)
+                for path, change_type in changes
+                if (self._split(path)[0] if listener.is_collection else path)
+                == listener.path
+            ]
+            if not relevant:
+                continue
+            try:
+                listener.callback(*listener.snapshot_for(relevant, read_time))
+            except Exception as e:
+                logger.error("Snapshot listener error for %s: %s", listener.path, e)
+
+
+class _DocumentReference:
+    """ドキュメントの参照（同期・非同期共通部分）"""
+
+    def __init__(self, client, path: str):
+        self._client = client
+        self._path_str = path
+
+    @property
+    def id(self) -> str:
+        return self._path_str.rsplit("/", 1)[-1]
+
+    @property
+    def path(self) -> str:
+        return self._path_str
+
+    @property
+    def parent(self):
+        return self._client.collection(self._path_str.rsplit("/", 1)[0])
+
+    def collection(self, collection_id: str):
+        return self._client.collection(f"{self._path_str}/{collection_id}")
+
+    def __eq__(self, other):
+        return isinstance(other, _DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self._path_str)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self._path_str}>"
+
+    def _snapshot(self, transaction=None) -> DocumentSnapshot:
+        stored = self._client._store.get(self._path_str)
+        if transaction is not None:
+            transaction._record_read(self._path_str, stored)
+        return self._client._make_snapshot(self, stored)
+
+    def _commit(self, op: str, data=None, option=None) -> WriteResult:
+        return self._client._store.commit([(op, self._path_str, data, option)])[0]
+
+
+class DocumentReference(_DocumentReference):
+    def get(self, field_paths=None, transaction=None, **kwargs) -> DocumentSnapshot:
+        return self._snapshot(transaction)
+
+    def set(self, document_data: dict, merge: bool = False, **kwargs) -> WriteResult:
+        return self._commit("set", document_data, merge)
+
+    def create(self, document_data: dict, **kwargs) -> WriteResult:
+        return self._commit("create", document_data)
+
+    def update(self, field_updates: dict, **kwargs) -> WriteResult:
+        return self._commit("update", field_updates)
+
+    def delete(self, **kwargs):
+        return self._commit("delete").update_time
+
+    def on_snapshot(self, callback: Callable) -> _Listener:
+        """
+        ドキュメントの変更を監視する
+
+        コールバックは (スナップショットの一覧, 変更の一覧, 読み取り日時) を受け取る。
+        登録時に現在の状態で1回呼ばれる（存在しない場合は空の一覧）。
+        """
+        listener = _DocumentListener(self, callback)
+        self._client._store.add_listener(listener)
+        callback(*listener.snapshot_for([], self._client._store._now()))
+        return listener
+
+
+class AsyncDocumentReference(_DocumentReference):
+    async def get(self, field_paths=None, transaction=None, **kwargs):
+        return self._snapshot(transaction)
+
+    async def set(self, document_data: dict, merge: bool = False, **kwargs):
+        return self._commit("set", document_data, merge)
+
+    async def create(self, document_data: dict, **kwargs):
+        return self._commit("create", document_data)
+
+    async def update(self, field_updates: dict, **kwargs):
+        return self._commit("update", field_updates)
+
+    async def delete(self, **kwargs):
+        return self._commit("delete").update_time
+
+
+class _DocumentListener(_Listener):
+    def __init__(self, reference: DocumentReference, callback: Callable):
+        super().__init__(reference._client._store, reference.path, False, callback)
+        self.reference = reference
+
+    def snapshot_for(self, changes: list, read_time):
+        snapshot = self.reference._snapshot()
+        snapshots = [snapshot] if snapshot.exists else []
+        document_changes = [
+            DocumentChange(change_type, snapshot, -1, 0) for _, change_type in changes
+        ]
+        return snapshots, document_changes, read_time
+
+
+class _CollectionListener(_Listener):
+    def __init__(self, query, callback: Callable):
+        super().__init__(query._client._store, query._path, True, callback)
+        self.query = query
+
+    def snapshot_for(self, changes: list, read_time):
+        snapshots = self.query._execute()
+        by_path = {snapshot.reference.path: snapshot for snapshot in snapshots}
+        document_changes = []
+        for path, change_type in changes:
+            snapshot = by_path.get(path) or self.query._client._make_snapshot(
+                self.query._client.document(path), None
+            )
+            document_changes.append(DocumentChange(change_type, snapshot, -1, 0))
+        return snapshots, document_changes, read_time
+
+
+class _Query:
+    """コレクションに対するクエリ（同期・非同期共通部分）"""
+
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def __init__(self, client, path: str):
+        self._client = client
+        self._path = path
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._orders: List[Tuple[str, str]] = []
+        self._offset = 0
+        self._limit: Optional[int] = None
+        self._cursor: Optional[Tuple[Any, bool]] = None
+        self._projection: Optional[List[str]] = None
+
+    def _copy(self):
+        query = _Query.__new__(self._client._query_class)
+        query.__dict__.update(self.__dict__)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        return query
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = (
+                filter.field_path,
+                filter.op_string,
+                filter.value,
+            )
+        query = self._copy()
+        if field_path == DOCUMENT_ID:
+            value = _document_id_operand(value)
+        query._filters.append((field_path, op_string, _encode(value)))
+        return query
+
+    def order_by(self, field_path: str, direction: str = ASCENDING):
+        query = self._copy()
+        query._orders.append((field_path, direction))
+        return query
+
+    def limit(self, count: int):
+        query = self._copy()
+        query._limit = count
+        return query
+
+    def offset(self, num_to_skip: int):
+        query = self._copy()
+        query._offset = num_to_skip
+        return query
+
+    def start_after(self, document_fields_or_snapshot):
+        query = self._copy()
+        query._cursor = (document_fields_or_snapshot, False)
+        return query
+
+    def start_at(self, document_fields_or_snapshot):
+        query = self._copy()
+        query._cursor = (document_fields_or_snapshot, True)
+        return query
+
+    def select(self, field_paths: Iterable[str]):
+        query = self._copy()
+        query._projection = list(field_paths)
+        return query
+
+    def _effective_orders(self) -> List[Tuple[str, str]]:
+        orders = list(self._orders)
+        if not any(field == DOCUMENT_ID for field, _ in orders):
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    def _cursor_values(self, orders) -> list:
+        cursor, _ = self._cursor
+        if isinstance(cursor, DocumentSnapshot):
+            data = cursor.to_dict() or {}
+            return [_get_field(cursor.id, data, field) for field, _ in orders]
+        if isinstance(cursor, dict):
+            values = []
+            for field, _ in orders:
+                if field not in cursor:
+                    break
+                value = cursor[field]
+                values.append(
+                    _document_id_operand(value) if field == DOCUMENT_ID else value
+                )
+            return [_encode(value) for value in values]
+        return [_encode(value) for value in cursor]
+
+    def _execute(self, transaction=None) -> List[DocumentSnapshot]:
+        orders = self._effective_orders()
+        rows = []
+        for document_id, stored in self._client._store.documents(
+            self._path, self._filters
+        ):
+            if not all(
+                _matches(_get_field(document_id, stored.data, field), op, value)
+                for field, op, value in self._filters
+            ):
+                continue
+            values = [
+                _get_field(document_id, stored.data, field) for field, _ in orders
+            ]
+            # order_byのフィールドがないドキュメントは結果に含まれない
+            if any(value is _MISSING for value in values):
+                continue
+            rows.append((values, document_id, stored))
+
+        def compare(left, right, count=len(orders)):
+            for (left_value, right_value), (_, direction) in zip(
+                zip(left[:count], right[:count]), orders
+            ):
+                result = _compare_values(left_value, right_value)
+                if result:
+                    return -result if direction == DESCENDING else result
+            return 0
+
+        rows.sort(key=functools.cmp_to_key(lambda a, b: compare(a[0], b[0])))
+
+        if self._cursor is not None:
+            cursor_values = self._cursor_values(orders)
+            inclusive = self._cursor[1]
+            rows = [
+                row
+                for row in rows
+                if (result := compare(row[0], cursor_values, len(cursor_values))) > 0
+                or (inclusive and result == 0)
+            ]
+
+        rows = rows[self._offset :]
+        if self._limit is not None:
+            rows = rows[: self._limit]
+
+        snapshots = []
+        for _, document_id, stored in rows:
+            reference = self._client.document(f"{self._path}/{document_id}")
+            if transaction is not None:
+                transaction._record_read(reference.path, stored)
+            snapshots.append(
+                self._client._make_snapshot(reference, stored, self._projection)
+            )
+        return snapshots
+
+
+def _document_id_operand(value):
+    """__name__の条件・カーソルの値（参照やパスはドキュメントIDにする）"""
+    if isinstance(value, _DocumentReference):
+        return value.id
+    if isinstance(value, str):
+        return value.rsplit("/", 1)[-1]
+    if isinstance(value, (list, tuple)):
+        return [_document_id_operand(item) for item in value]
+    return value
+
+
+class Query(_Query):
+    def stream(self, transaction=None, **kwargs):
+        yield from self._execute(transaction)
+
+    def get(self, transaction=None, **kwargs) -> List[DocumentSnapshot]:
+        return self._execute(transaction)
+
+    def on_snapshot(self, callback: Callable) -> _Listener:
+        """
+        コレクションの変更を監視する（条件を指定していないコレクション全体のみ）
+
+        登録時に全ドキュメントを追加として1回呼ばれる。
+        """
+        listener = _CollectionListener(self, callback)
+        self._client._store.add_listener(listener)
+        snapshots = self._execute()
+        callback(
+            snapshots,
+            [
+                DocumentChange(ChangeType.ADDED, s, -1, i)
+                for i, s in enumerate(snapshots)
+            ],
+            self._client._store._now(),
+        )
+        return listener
+
+
+class AsyncQuery(_Query):
+    async def stream(self, transaction=None, **kwargs):
+        for snapshot in self._execute(transaction):
+            yield snapshot
+
+    async def get(self, transaction=None, **kwargs) -> List[DocumentSnapshot]:
+        return self._execute(transaction)
+
+
+class _CollectionMixin:
+    @property
+    def id(self) -> str:
+        return self._path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None):
+        return self._client.document(f"{self._path}/{document_id or _auto_id()}")
+
+
+class CollectionReference(_CollectionMixin, Query):
+    pass
+
+
+class AsyncCollectionReference(_CollectionMixin, AsyncQuery):
+    pass
+
+
+class _WriteBuffer:
+    """バッチ・トランザクションの書き込みの蓄積"""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes: List[tuple] = []
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._writes.append(("set", reference.path, document_data, merge))
+
+    def create(self, reference, document_data: dict):
+        self._writes.append(("create", reference.path, document_data, None))
+
+    def update(self, reference, field_updates: dict, **kwargs):
+        self._writes.append(("update", reference.path, field_updates, None))
+
+    def delete(self, reference, **kwargs):
+        self._writes.append(("delete", reference.path, None, None))
+
+    def __len__(self):
+        return len(self._writes)
+
+
+class WriteBatch(_WriteBuffer):
+    def commit(self, **kwargs) -> List[WriteResult]:
+        writes, self._writes = self._writes, []
+        return self._client._store.commit(writes)
+
+
+class AsyncWriteBatch(_WriteBuffer):
+    async def commit(self, **kwargs) -> List[WriteResult]:
+        writes, self._writes = self._writes, []
+        return self._client._store.commit(writes)
+
+
+class _Transaction(_WriteBuffer):
+    """
+    楽観的ロックのトランザクション
+
+    読み取ったドキュメントの更新日時を記録し、コミット時に変わっていれば
+    Abortedで失敗する。firestore.transactional / async_transactional と組み合わせて使う。
+    """
+
+    def __init__(self, client, max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id: Optional[bytes] = None
+        self._read_versions: Dict[str, Any] = {}
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def _clean_up(self) -> None:
+        self._writes = []
+        self._read_versions = {}
+        self._id = None
+
+    def _record_read(self, path: str, stored: Optional[_StoredDocument]) -> None:
+        if self._writes:
+            raise ReadAfterWriteError("Attempted read after write in a transaction.")
+        self._read_versions.setdefault(path, stored.update_time if stored else None)
+
+    def _begin_now(self, retry_id=None) -> None:
+        if self.in_progress:
+            raise ValueError("Transaction already begun")
+        self._id = uuid.uuid4().bytes
+
+    def _commit_now(self) -> List[WriteResult]:
+        if not self.in_progress:
+            raise ValueError("Transaction not in progress")
+        if self._read_only and self._writes:
+            raise ValueError("Cannot write in a read-only transaction")
+        try:
+            return self._client._store.commit(self._writes, self._read_versions)
+        finally:
+            self._clean_up()
+
+
+class Transaction(_Transaction):
+    def _begin(self, retry_id=None) -> None:
+        self._begin_now(retry_id)
+
+    def _commit(self) -> List[WriteResult]:
+        return self._commit_now()
+
+    def _rollback(self) -> None:
+        self._clean_up()
+
+    def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, _DocumentReference):
+            return iter([ref_or_query._snapshot(self)])
+        return iter(ref_or_query._execute(self))
+
+    def get_all(self, references, **kwargs):
+        return self._client.get_all(references, transaction=self)
+
+
+class AsyncTransaction(_Transaction):
+    async def _begin(self, retry_id=None) -> None:
+        self._begin_now(retry_id)
+
+    async def _commit(self) -> List[WriteResult]:
+        return self._commit_now()
+
+    async def _rollback(self) -> None:
+        self._clean_up()
+
+    async def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, _DocumentReference):
+            return self._client.get_all([ref_or_query], transaction=self)
+        return ref_or_query.stream(transaction=self)
+
+    async def get_all(self, references, **kwargs):
+        return self._client.get_all(references, transaction=self)
+
+
+class _Client:
+    """クライアント（同期・非同期共通部分）"""
+
+    _document_class = DocumentReference
+    _collection_class = CollectionReference
+    _query_class = Query
+
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def collection(self, *path: str):
+        return self._collection_class(self, "/".join(path))
+
+    def document(self, *path: str):
+        return self._document_class(self, "/".join(path))
+
+    def _make_snapshot(
+        self, reference, stored: Optional[_StoredDocument], projection=None
+    ) -> DocumentSnapshot:
+        if stored is None:
+            return DocumentSnapshot(reference, None, False, None, None, None)
+        data = stored.data
+        if projection is not None:
+            data = {}
+            for field_path in projection:
+                value = _get_field(reference.id, stored.data, field_path)
+                if value is not _MISSING:
+                    _update(data, {field_path: value}, stored.update_time)
+        snapshot = DocumentSnapshot(
+            reference,
+            None,
+            True,
+            stored.update_time,
+            stored.create_time,
+            stored.update_time,
+        )
+        # 保存済みのデータは書き換えないため、コンストラクタでの複製を省く
+        # （to_dict()・get()は従来どおり複製を返す）
+        snapshot._data = data
+        return snapshot
+
+    def _snapshots(self, references, transaction) -> List[DocumentSnapshot]:
+        seen = set()
+        snapshots = []
+        for reference in references:
+            if reference.path in seen:
+                continue
+            seen.add(reference.path)
+            snapshots.append(reference._snapshot(transaction))
+        return snapshots
+
+
+class MemoryClient(_Client):
+    """同期版のクライアント（firestore.client() の代わり）"""
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False):
+        return Transaction(self, max_attempts=max_attempts, read_only=read_only)
+
+    def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        yield from self._snapshots(references, transaction)
+
+    def collections(self, **kwargs):
+        return [self.collection(path) for path in self._store.collection_paths()]
+
+
+class AsyncMemoryClient(_Client):
+    """非同期版のクライアント（firestore_async.client() の代わり）"""
+
+    _document_class = AsyncDocumentReference
+    _collection_class = AsyncCollectionReference
+    _query_class = AsyncQuery
+
+    def batch(self) -> AsyncWriteBatch:
+        return AsyncWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False):
+        return AsyncTransaction(self, max_attempts=max_attempts, read_only=read_only)
+
+    async def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        for snapshot in self._snapshots(references, transaction):
+            yield snapshot
+
+    async def collections(self, **kwargs):
+        for path in self._store.collection_paths():
+            yield self.collection(path)
@@ -0,0 +1,244 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from fastapi import HTTPException, Request, status
+from .config import settings
+from .security import cached_token_claims
+from .token_bucket import RateLimitResult, refill
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ルート種別ごとの上限回数（settingsの属性名）
+ROUTE_CLASS_LIMITS = {
+    "reservation_create": "RATE_LIMIT_RESERVATION_CREATE",
+    "reservation_update": "RATE_LIMIT_RESERVATION_UPDATE",
+    "availability_check": "RATE_LIMIT_AVAILABILITY_CHECK",
+    "queue_display": "RATE_LIMIT_QUEUE_DISPLAY",
+    "auth": "RATE_LIMIT_AUTH",
+    "other": "RATE_LIMIT_OTHER_ENDPOINTS",
+}
+
+# 補充期間をRATE_LIMIT_WINDOW_SECONDS以外にするルート種別（settingsの属性名）
+# 待ち状況の表示は定期的に再取得し、ログインは同じ接続元IPアドレスの利用者が
+# 多いため、1時間ではなく短い期間で補充する
+ROUTE_CLASS_WINDOWS = {
+    "queue_display": "RATE_LIMIT_QUEUE_DISPLAY_WINDOW_SECONDS",
+    "auth": "RATE_LIMIT_AUTH_WINDOW_SECONDS",
+}
+
+
+class InMemoryRateLimitBackend:
+    """
+    プロセス内のトークンバケット
+
+    キーごとに残りトークン数と最終更新時刻だけを保持する。
+    全量が補充されるだけの時間使われていないバケットは新規と同じなので、
+    参照順に並べた先頭から順に破棄する。
+    """
+
+    def __init__(self, max_keys: int, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_keys (int): 保持するバケット数の上限
+            clock (Callable): 現在時刻（秒）を返す関数（テスト用に差し替え可能）
+        """
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def acquire(
+        self, key: str, capacity: int, window_seconds: float, cost: int = 1
+    ) -> RateLimitResult:
+        """
+        キーのバケットからトークンを消費する
+
+        Args:
+            key (str): バケットのキー
+            capacity (int): バケットの容量（window_seconds内の上限回数）
+            window_seconds (float): 空のバケットが満杯に戻るまでの秒数
+            cost (int): 消費するトークン数
+
+        Returns:
+            RateLimitResult: 判定結果
+        """
+        now = self._clock()
+        self._expire(now, window_seconds)
+        tokens, updated_at = self._buckets.pop(key, (capacity, now))
+        result = refill(
+            tokens, now - updated_at, capacity, capacity / window_seconds, cost
+        )
+        self._buckets[key] = (result.remaining, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return result
+
+    def _expire(self, now: float, window_seconds: float) -> None:
+        while self._buckets:
+            _, updated_at = next(iter(self._buckets.values()))
+            if now - updated_at < window_seconds:
+                break
+            self._buckets.popitem(last=False)
+
+    def clear(self) -> None:
+        """全バケットを破棄する"""
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Redis上でトークンバケットを更新するスクリプト
+# （時刻はRedisサーバーのTIMEを使い、アプリケーションサーバー間の時刻差の影響を受けない）
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry_after = (cost - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+class RedisRateLimitBackend:
+    """
+    Redis互換サーバー上のトークンバケット（複数プロセス・複数台で共有）
+
+    判定と更新は1つのスクリプトで行うため、同じキーへの同時リクエストでも
+    消費が重複しない。使われなくなったバケットは満杯に戻る時間で失効する。
+    """
+
+    def __init__(self, client, prefix: str = "rate_limit:"):
+        """
+        Args:
+            client: redis.asyncio.Redis 互換のクライアント（evalを使用）
+            prefix (str): キーの接頭辞
+        """
+        self.client = client
+        self.prefix = prefix
+
+    async def acquire(
+        self, key: str, capacity: int, window_seconds: float, cost: int = 1
+    ) -> RateLimitResult:
+        allowed, remaining, retry_after = await self.client.eval(
+            TOKEN_BUCKET_SCRIPT,
+            1,
+            self.prefix + key,
+            capacity,
+            capacity / window_seconds,
+            cost,
+        )
+        return RateLimitResult(bool(int(allowed)), float(remaining), float(retry_after))
+
+
+def create_rate_limit_backend():
+    """settings.RATE_LIMIT_BACKENDに応じたバックエンドを生成"""
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return InMemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "RATE_LIMIT_BACKEND=redis にはredisパッケージが必要です"
+            ) from e
+        return RedisRateLimitBackend(redis.from_url(settings.RATE_LIMIT_REDIS_URL))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
+
+
+class RateLimiter:
+    """ルート種別と利用者ごとのレート制限"""
+
+    def __init__(self, backend, window_seconds: float):
+        self.backend = backend
+        self.window_seconds = window_seconds
+
+    async def hit(self, route_class: str, identity: str) -> RateLimitResult:
+        """
+        1回分の利用を記録し、上限内かを判定する
+
+        Args:
+            route_class (str): ROUTE_CLASS_LIMITSのキー
+            identity (str): 利用者の識別子（"user:<uid>" または "ip:<アドレス>"）
+
+        Returns:
+            RateLimitResult: 判定結果
+        """
+        capacity = getattr(settings, ROUTE_CLASS_LIMITS[route_class])
+        window_seconds = self.window_seconds
+        if route_class in ROUTE_CLASS_WINDOWS:
+            window_seconds = getattr(settings, ROUTE_CLASS_WINDOWS[route_class])
+        return await self.backend.acquire(
+            f"{route_class}:{identity}", capacity, window_seconds
+        )
+
+
+rate_limiter = RateLimiter(
+    create_rate_limit_backend(), window_seconds=settings.RATE_LIMIT_WINDOW_SECONDS
+)
+
+
+def request_identity(request: Request) -> str:
+    """
+    レート制限の単位となる利用者の識別子
+
+    検証済みのIDトークン（token_cacheにあるもの）ならuid、それ以外は接続元IPアドレスを使う。
+    レート制限はエンドポイント側の認証より前に行うため、ここでは署名検証をしない
+    （不正なトークンを2回検証しない）。トークンの初回のリクエストはIPアドレス単位になる。
+    """
+    claims = cached_token_claims(request.headers.get("Authorization"))
+    if claims is not None:
+        return f"user:{claims['uid']}"
+    host = request.client.host if request.client else "unknown"
+    return f"ip:{host}"
+
+
+def rate_limit(route_class: str) -> Callable:
+    """
+    レート制限を行う依存関係を生成
+
+    上限を超えた場合は429とRetry-Afterヘッダーを返す。バックエンドの
+    障害時はリクエストを通す（レート制限でAPI全体を止めない）。
+
+    Args:
+        route_class (str): ROUTE_CLASS_LIMITSのキー
+
+    Returns:
+        Callable: FastAPIのDependsに渡す関数
+    """
+    if route_class not in ROUTE_CLASS_LIMITS:
+        raise ValueError(f"Unknown rate limit route class: {route_class}")
+
+    async def dependency(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        identity = request_identity(request)
+        try:
+            result = await rate_limiter.hit(route_class, identity)
+        except Exception as e:
+            logger.error("Rate limit backend error: %s", e)
+            return
+        if not result.allowed:
+            logger.info("Rate limit exceeded: %s %s", route_class, identity)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="リクエストが多すぎます。しばらくしてから再度お試しください。",
+                headers={"Retry-After": str(math.ceil(result.retry_after))},
+            )
+
+    return dependency
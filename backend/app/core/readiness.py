@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+WarmUpStep = Tuple[str, Callable[[], Awaitable[None]]]
+
+
+class Readiness:
+    """
+    起動後の準備処理（クライアントの作成・接続の確立など）をバックグラウンドで実行し、
+    すべて完了したかどうかを準備状態として公開する
+
+    起動処理（lifespan）は準備の完了を待たずにリクエストの受け付けを始め、
+    ロードバランサーは準備状態（/ready）が200になってからトラフィックを流す。
+    失敗した手順は間隔を伸ばしながら再試行する。
+    """
+
+    def __init__(
+        self,
+        steps: List[WarmUpStep],
+        max_retry_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            steps (List[WarmUpStep]): (名前, 準備処理) の一覧（順に実行する）
+            max_retry_seconds (float): 再試行の間隔の上限（秒）
+            clock (Callable): 経過時間の計測に使う関数（テスト用）
+        """
+        self.steps = steps
+        self.max_retry_seconds = max_retry_seconds
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: Optional[float] = None
+        # 手順ごとの状態（"pending" / "ok" / 最後のエラー）と完了までの秒数
+        self._states: Dict[str, str] = {name: "pending" for name, _ in steps}
+        self._durations: Dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return all(state == "ok" for state in self._states.values())
+
+    def start(self) -> None:
+        """準備処理を開始（実行中の場合は何もしない）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._started_at = self._clock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """実行中の準備処理を中止"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """準備の完了をtimeout秒まで待ち、完了したかどうかを返す"""
+        if self._task is None:
+            return self.ready
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    async def _run(self) -> None:
+        for name, step in self.steps:
+            retry_seconds = 1.0
+            while True:
+                try:
+                    await step()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._states[name] = f"error: {e}"
+                    logger.warning(
+                        "Warm-up step %s failed, retrying in %ss: %s",
+                        name,
+                        retry_seconds,
+                        e,
+                    )
+                    await asyncio.sleep(retry_seconds)
+                    retry_seconds = min(retry_seconds * 2, self.max_retry_seconds)
+                    continue
+                self._states[name] = "ok"
+                self._durations[name] = round(self._clock() - self._started_at, 3)
+                break
+        logger.info("Application ready: %s", self._durations)
+
+    def status(self) -> dict:
+        """準備状態と手順ごとの状態・完了までの秒数（起動からの経過時間）"""
+        return {
+            "ready": self.ready,
+            "steps": [
+                {
+                    "name": name,
+                    "state": self._states[name],
+                    "seconds": self._durations.get(name),
+                }
+                for name, _ in self.steps
+            ],
+        }
@@ -1,12 +1,22 @@
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from firebase_admin import auth
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from ..core.config import settings
+from ..core.cache import LRUTTLCache
+from ..core.metrics import TOKEN_VERIFICATION_DURATION
 import jwt
+import asyncio
+import hashlib
+import re
+import threading
+import time
 import requests
 import logging
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
 from fastapi.security.utils import get_authorization_scheme_param
 
 logger = logging.getLogger(__name__)
@@ -54,6 +64,267 @@ class FirebaseAuthBearer(HTTPBearer):
 firebase_auth = FirebaseAuthBearer()
 
 
+class TokenCache:
+    """
+    検証済みIDトークンのクレームを保持するキャッシュ
+
+    トークン文字列そのものは保持せず、SHA-256ハッシュをキーにする。
+    エントリはトークンのexpクレームとTOKEN_CACHE_TTL_SECONDSの早い方で失効する。
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self._cache = LRUTTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """キャッシュ済みのクレームを取得（未登録・期限切れはNone）"""
+        claims = self._cache.get(self._key(token))
+        return dict(claims) if claims is not None else None
+
+    def set(self, token: str, claims: dict, exp: Optional[float]) -> None:
+        """
+        検証済みのクレームを登録
+
+        Args:
+            token (str): IDトークン
+            claims (dict): verify_firebase_tokenが返すクレーム
+            exp (float, optional): トークンの有効期限（UNIX時刻）
+        """
+        ttl = None
+        if exp is not None:
+            ttl = exp - time.time()
+        self._cache.set(self._key(token), dict(claims), ttl_seconds=ttl)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """ヒット・ミス・追い出し件数とヒット率を取得"""
+        return self._cache.stats()
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl_seconds=settings.TOKEN_CACHE_TTL_SECONDS,
+)
+
+
+def cached_token_claims(authorization: Optional[str]) -> Optional[dict]:
+    """
+    Authorizationヘッダーのトークンが検証済み（token_cacheにある）ならクレームを返す
+
+    署名検証は行わない。レート制限・同時処理数の制御で利用者を識別するために使い、
+    未検証・不正なトークンの場合はNoneを返す（検証はエンドポイント側の認証で1回だけ行う）。
+
+    Args:
+        authorization (str, optional): Authorizationヘッダーの値
+
+    Returns:
+        Optional[dict]: verify_firebase_tokenが返したクレーム
+    """
+    scheme, token = get_authorization_scheme_param(authorization)
+    if not token or scheme.lower() != "bearer":
+        return None
+    return token_cache.get(token)
+
+
+def fetch_google_public_keys() -> Tuple[Dict[str, str], Optional[int]]:
+    """
+    Googleのsecuretoken公開鍵（X.509証明書）を取得
+
+    Returns:
+        Tuple[Dict[str, str], Optional[int]]: {kid: PEM}とCache-Controlのmax-age（秒）
+    """
+    response = requests.get(settings.GOOGLE_PUBLIC_KEYS_URL, timeout=10)
+    response.raise_for_status()
+    match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    return response.json(), int(match.group(1)) if match else None
+
+
+def load_public_key(pem: str):
+    """PEM形式の証明書または公開鍵から公開鍵オブジェクトを生成"""
+    data = pem.encode("utf-8")
+    if b"BEGIN CERTIFICATE" in data:
+        return x509.load_pem_x509_certificate(data).public_key()
+    return serialization.load_pem_public_key(data)
+
+
+class PublicKeyStore:
+    """
+    IDトークン検証用の公開鍵セットをメモリに保持する
+
+    鍵はバックグラウンドスレッドで取得し、Cache-Controlのmax-ageに従って
+    期限切れ前に更新する。リクエスト処理中に外部HTTP通信は発生しない。
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[], Tuple[Dict[str, str], Optional[int]]],
+        min_refresh_seconds: int = 60,
+    ):
+        """
+        Args:
+            fetcher (Callable): {kid: PEM}とmax-age（秒）を返す関数
+            min_refresh_seconds (int): 更新間隔の下限（秒）
+        """
+        self._fetcher = fetcher
+        self._min_refresh_seconds = min_refresh_seconds
+        self._keys: Dict[str, Any] = {}
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.last_refreshed_at: Optional[float] = None
+
+    def refresh(self) -> int:
+        """
+        公開鍵を取得して差し替える
+
+        Returns:
+            int: 次回更新までの待機秒数
+        """
+        pems, max_age = self._fetcher()
+        self._keys = {kid: load_public_key(pem) for kid, pem in pems.items()}
+        self.last_refreshed_at = time.time()
+        self._loaded.set()
+        logger.info("Loaded %s token verification keys", len(self._keys))
+        if max_age is None:
+            return self._min_refresh_seconds
+        # 期限切れ前に更新するため、max-ageの9割の時点で再取得する
+        return max(self._min_refresh_seconds, int(max_age * 0.9))
+
+    def _run(self) -> None:
+        retry_seconds = 1
+        while not self._stop.is_set():
+            try:
+                wait_seconds = self.refresh()
+                retry_seconds = 1
+            except Exception as e:
+                logger.error("Failed to refresh token verification keys: %s", e)
+                wait_seconds = retry_seconds
+                retry_seconds = min(retry_seconds * 2, self._min_refresh_seconds)
+            self._stop.wait(wait_seconds)
+
+    def start(self) -> None:
+        """バックグラウンド更新を開始（起動済みの場合は何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="public-key-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """バックグラウンド更新を停止"""
+        self._stop.set()
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> bool:
+        """初回取得の完了をtimeout秒まで待ち、取得済みかどうかを返す"""
+        return self._loaded.wait(timeout)
+
+    def get(self, kid: str, timeout: Optional[float] = None):
+        """
+        kidに対応する公開鍵を取得
+
+        初回取得が完了していない場合のみ、timeout秒まで取得完了を待機する。
+
+        Raises:
+            jwt.InvalidTokenError: 鍵が取得できない場合、またはkidが未知の場合
+        """
+        if not self._loaded.is_set():
+            self.start()
+            if not self._loaded.wait(timeout):
+                raise jwt.InvalidTokenError("公開鍵を取得できませんでした")
+        key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"未知の鍵IDです: {kid}")
+        return key
+
+
+class FirebaseTokenVerifier:
+    """
+    Firebase IDトークンをローカルで検証する
+
+    公開鍵はPublicKeyStoreのメモリ上の鍵を使い、CPU負荷の高いRS256署名検証は
+    専用のスレッドプールで実行してイベントループを塞がない。
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        key_store: PublicKeyStore,
+        max_workers: int = 2,
+        clock_skew_seconds: int = 5,
+        key_wait_timeout: float = 5.0,
+    ):
+        self.project_id = project_id
+        self.key_store = key_store
+        self._clock_skew_seconds = clock_skew_seconds
+        self._key_wait_timeout = key_wait_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="token-verify"
+        )
+
+    def verify_sync(self, token: str) -> dict:
+        """
+        IDトークンを検証し、デコード済みのクレームを返す
+
+        Raises:
+            jwt.InvalidTokenError: 検証に失敗した場合
+        """
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != "RS256":
+            raise jwt.InvalidAlgorithmError("RS256以外の署名アルゴリズムです")
+        key = self.key_store.get(header.get("kid"), timeout=self._key_wait_timeout)
+
+        decoded = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=self.project_id,
+            issuer=f"https://securetoken.google.com/{self.project_id}",
+            leeway=self._clock_skew_seconds,
+            options={"require": ["exp", "iat", "sub"]},
+        )
+
+        subject = decoded["sub"]
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise jwt.InvalidTokenError("subクレームが不正です")
+        auth_time = decoded.get("auth_time")
+        if auth_time is not None and auth_time > time.time() + self._clock_skew_seconds:
+            raise jwt.ImmatureSignatureError("auth_timeが未来の時刻です")
+
+        decoded["uid"] = subject
+        return decoded
+
+    async def verify(self, token: str) -> dict:
+        """verify_syncをスレッドプールで実行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.verify_sync, token)
+
+
+token_verifier = FirebaseTokenVerifier(
+    project_id=settings.FIREBASE_PROJECT_ID,
+    key_store=PublicKeyStore(
+        fetch_google_public_keys,
+        min_refresh_seconds=settings.PUBLIC_KEYS_MIN_REFRESH_SECONDS,
+    ),
+    max_workers=settings.TOKEN_VERIFY_WORKERS,
+    clock_skew_seconds=settings.TOKEN_CLOCK_SKEW_SECONDS,
+    key_wait_timeout=settings.PUBLIC_KEYS_WAIT_TIMEOUT_SECONDS,
+)
+
+
+def _observe_verification(result: str, started_at: float) -> None:
+    """IDトークンの検証時間を記録（result: cache_hit / verified / failed）"""
+    TOKEN_VERIFICATION_DURATION.labels(result).observe(time.perf_counter() - started_at)
+
+
 class SecurityService:
     @staticmethod
     async def set_custom_claims(uid: str, claims: dict) -> None:
@@ -73,15 +344,16 @@ class SecurityService:
             # 開発環境の場合はスキップ（エミュレータではカスタムクレーム機能は利用不可）
             if settings.ENVIRONMENT == "development":
                 logger.info(
-                    f"Development environment: Skipping custom claims setting for uid {uid}"
+                    "Development environment: Skipping custom claims setting for uid %s",
+                    uid,
                 )
                 return
 
             # 本番環境での処理
             auth.set_custom_user_claims(uid, claims)
-            logger.info(f"Custom claims set for user {uid}: {claims}")
+            logger.info("Custom claims set for user %s: %s", uid, claims)
         except Exception as e:
-            logger.error(f"Error setting custom claims for user {uid}: {str(e)}")
+            logger.error("Error setting custom claims for user %s: %s", uid, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="カスタムクレームの設定に失敗しました",
@@ -93,17 +365,25 @@ class SecurityService:
     ) -> dict:
         """
         Firebaseトークンを検証し、ユーザー情報を取得
+
+        同じトークンの再検証を避けるため、検証結果はtoken_cacheに保持する。
         """
+        started_at = time.perf_counter()
         try:
             token = credentials.credentials
 
+            cached_claims = token_cache.get(token)
+            if cached_claims is not None:
+                _observe_verification("cache_hit", started_at)
+                return cached_claims
+
             # 開発環境（エミュレータ）での処理
             if settings.ENVIRONMENT == "development":
                 try:
                     decoded_token = jwt.decode(
                         token, options={"verify_signature": False}
                     )
-                    return {
+                    claims = {
                         "uid": decoded_token.get("user_id", "test_user_id"),
                         "email": decoded_token.get("email", "test@example.com"),
                         "email_verified": decoded_token.get("email_verified", True),
@@ -112,18 +392,21 @@ class SecurityService:
                         "company_id": "test_company_id",
                         "branch_id": "test_branch_id",
                     }
+                    token_cache.set(token, claims, decoded_token.get("exp"))
+                    _observe_verification("verified", started_at)
+                    return claims
                 except Exception as e:
-                    logger.error(f"Token verification error in emulator: {str(e)}")
+                    logger.error("Token verification error in emulator: %s", e)
                     raise HTTPException(
                         status_code=status.HTTP_401_UNAUTHORIZED,
                         detail="無効なトークンです。",
                         headers={"WWW-Authenticate": "Bearer"},
                     )
 
-            # 本番環境での処理
+            # 本番環境での処理（メモリ上の公開鍵でローカルに署名を検証）
             try:
-                decoded_token = auth.verify_id_token(token)
-                return {
+                decoded_token = await token_verifier.verify(token)
+                claims = {
                     "uid": decoded_token["uid"],
                     "email": decoded_token.get("email"),
                     "email_verified": decoded_token.get("email_verified", False),
@@ -134,8 +417,11 @@ class SecurityService:
                     "company_id": decoded_token.get("company_id"),
                     "branch_id": decoded_token.get("branch_id"),
                 }
+                token_cache.set(token, claims, decoded_token.get("exp"))
+                _observe_verification("verified", started_at)
+                return claims
             except Exception as e:
-                logger.error(f"Token verification error: {str(e)}")
+                logger.error("Token verification error: %s", e)
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="無効なトークンです。",
@@ -143,9 +429,11 @@ class SecurityService:
                 )
 
         except HTTPException as e:
+            _observe_verification("failed", started_at)
             raise e
         except Exception as e:
-            logger.error(f"Unexpected authentication error: {str(e)}")
+            _observe_verification("failed", started_at)
+            logger.error("Unexpected authentication error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="認証エラーが発生しました。",
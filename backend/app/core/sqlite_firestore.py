@@ -0,0 +1,241 @@
+"""
+SQLiteに保存するFirestore互換のバックエンド（単一サーバー構成向け）
+
+MemoryStoreと同じクライアント（MemoryClient / AsyncMemoryClient）から使い、
+CRUD層のコードはFirestoreの場合と変わらない（settings.FIRESTORE_BACKEND = "sqlite"）。
+ドキュメントはコレクション・IDごとに1行のJSONとして保存し、予約の店舗・日付・
+ステータスなどよく使う条件はJSONの式インデックスで絞り込む。
+
+WALモードで開くため、書き込み中も他の接続から読み取れる。スナップショット
+リスナーへの通知は同じプロセス内の書き込みのみ。
+"""
+
+import base64
+import contextlib
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+from .memory_firestore import MemoryStore, _StoredDocument
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    create_time TEXT NOT NULL,
+    update_time TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+) WITHOUT ROWID
+"""
+
+_TIMESTAMP_KEY = "__ts__"
+_BYTES_KEY = "__bytes__"
+
+# CRUD層のクエリで使う条件に合わせた式インデックス（JSONのパス）
+# クエリ側の式と一致させるため、パスはSQLに直接埋め込む
+INDEXES = {
+    # 店舗・日付ごとの予約（待ち状況・日別のステータス変更）
+    "idx_documents_branch_reservation_at": ("$.branch_id", "$.reservation_at.__ts__"),
+    # 店舗・日付ごとの集計ドキュメント（空き状況カレンダー）
+    "idx_documents_branch_date": ("$.branch_id", "$.date"),
+    "idx_documents_status": ("$.status", "$.reservation_at.__ts__"),
+    "idx_documents_user": ("$.user_id", "$.reservation_at.__ts__"),
+    "idx_documents_company": ("$.company_id",),
+}
+_FIELD_PATH = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+_SQL_OPERATORS = {"==": "=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+def _to_json(value):
+    """保存値をJSONに変換（日時・バイト列は種別を示すキーを持つオブジェクトにする）"""
+    if isinstance(value, datetime):
+        # UTCの固定長の文字列にして、文字列の比較で範囲を絞り込めるようにする
+        return {_TIMESTAMP_KEY: value.isoformat(timespec="microseconds")}
+    if isinstance(value, bytes):
+        return {_BYTES_KEY: base64.b64encode(value).decode("ascii")}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    return value
+
+
+def _from_json(value: dict):
+    if len(value) == 1:
+        if _TIMESTAMP_KEY in value:
+            return datetime.fromisoformat(value[_TIMESTAMP_KEY])
+        if _BYTES_KEY in value:
+            return base64.b64decode(value[_BYTES_KEY])
+    return value
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(_to_json(data), ensure_ascii=False, separators=(",", ":"))
+
+
+def _loads(text: str) -> dict:
+    return json.loads(text, object_hook=_from_json)
+
+
+def _json_path(field_path: str, value) -> str:
+    path = f"$.{field_path}"
+    if isinstance(value, datetime):
+        path += f".{_TIMESTAMP_KEY}"
+    return path
+
+
+def _sql_value(value):
+    if isinstance(value, datetime):
+        return _to_json(value)[_TIMESTAMP_KEY]
+    return value
+
+
+def _pushable(value) -> bool:
+    # 真偽値はJSONでは1/0として比較されるため絞り込みに使わない
+    return isinstance(value, (str, int, float, datetime)) and not isinstance(
+        value, bool
+    )
+
+
+def filter_clauses(filters: Iterable[Tuple[str, str, Any]]) -> Tuple[str, list]:
+    """
+    クエリの条件のうちSQLで絞り込めるものをWHERE句に変換する
+
+    SQLiteは型の異なる値も比較するため、結果は条件より広くなることがあるが、
+    狭くなることはない（最終的な判定はクエリ側で行う）。
+
+    Returns:
+        Tuple[str, list]: " AND ..." で連結した条件とパラメータ
+    """
+    clauses = []
+    params = []
+    for field_path, op, value in filters:
+        if not _FIELD_PATH.match(field_path) or field_path == "__name__":
+            continue
+        if op in _SQL_OPERATORS and _pushable(value):
+            path = _json_path(field_path, value)
+            clauses.append(f"json_extract(data, '{path}') {_SQL_OPERATORS[op]} ?")
+            params.append(_sql_value(value))
+        elif (
+            op == "in"
+            and value
+            and all(_pushable(item) for item in value)
+            and len({type(item) for item in value}) == 1
+        ):
+            path = _json_path(field_path, value[0])
+            placeholders = ", ".join("?" for _ in value)
+            clauses.append(f"json_extract(data, '{path}') IN ({placeholders})")
+            params.extend(_sql_value(item) for item in value)
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+class SqliteStore(MemoryStore):
+    """
+    ドキュメントをSQLiteのファイルに保存するストア
+
+    書き込みはBEGIN IMMEDIATEで書き込みロックを取ってから、トランザクションで
+    読み取ったドキュメントの更新日時の確認と反映を行う。
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 接続は1つをロックで保護して共有する（イベントループ・リスナーのスレッドから使う）
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute(SCHEMA)
+        for name, paths in INDEXES.items():
+            columns = ", ".join(f"json_extract(data, '{path}')" for path in paths)
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON documents (collection, {columns})"
+            )
+        logger.info("SQLite store opened: %s", path)
+
+    @staticmethod
+    def _row_to_document(row) -> _StoredDocument:
+        data, create_time, update_time = row
+        return _StoredDocument(
+            _loads(data),
+            datetime.fromisoformat(create_time),
+            datetime.fromisoformat(update_time),
+        )
+
+    def get(self, path: str) -> Optional[_StoredDocument]:
+        collection_path, document_id = self._split(path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data, create_time, update_time FROM documents"
+                " WHERE collection = ? AND id = ?",
+                (collection_path, document_id),
+            ).fetchone()
+        return self._row_to_document(row) if row else None
+
+    def documents(
+        self, collection_path: str, filters: Iterable[Tuple[str, str, Any]] = ()
+    ) -> List[Tuple[str, _StoredDocument]]:
+        where, params = filter_clauses(filters)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, data, create_time, update_time FROM documents"
+                f" WHERE collection = ?{where}",
+                (collection_path, *params),
+            ).fetchall()
+        return [(row[0], self._row_to_document(row[1:])) for row in rows]
+
+    def collection_paths(self) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT collection FROM documents"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    @contextlib.contextmanager
+    def _write_transaction(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _put(self, path: str, document: Optional[_StoredDocument]) -> None:
+        collection_path, document_id = self._split(path)
+        if document is None:
+            self._connection.execute(
+                "DELETE FROM documents WHERE collection = ? AND id = ?",
+                (collection_path, document_id),
+            )
+            return
+        self._connection.execute(
+            "INSERT OR REPLACE INTO documents"
+            " (collection, id, data, create_time, update_time)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                collection_path,
+                document_id,
+                _dumps(document.data),
+                document.create_time.isoformat(timespec="microseconds"),
+                document.update_time.isoformat(timespec="microseconds"),
+            ),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM documents")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,38 @@
+"""
+トークンバケットの計算
+
+HTTPのレート制限（core.rate_limit）とログの件数制限（core.logging）で共用する。
+ログの設定からも読み込むため、標準ライブラリ以外に依存しない。
+"""
+
+from typing import NamedTuple
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    # 消費後に残っているトークン数
+    remaining: float
+    # 拒否した場合、次の1回が可能になるまでの秒数
+    retry_after: float
+
+
+def refill(
+    tokens: float, elapsed: float, capacity: float, rate: float, cost: float
+) -> RateLimitResult:
+    """
+    トークンバケットを経過時間分補充し、cost分を消費する
+
+    Args:
+        tokens (float): 前回の残りトークン数
+        elapsed (float): 前回からの経過秒数
+        capacity (float): バケットの容量
+        rate (float): 1秒あたりの補充量
+        cost (float): 今回消費するトークン数
+
+    Returns:
+        RateLimitResult: 判定結果（拒否した場合は消費しない）
+    """
+    tokens = min(capacity, tokens + max(0.0, elapsed) * rate)
+    if tokens >= cost:
+        return RateLimitResult(True, tokens - cost, 0.0)
+    return RateLimitResult(False, tokens, (cost - tokens) / rate)
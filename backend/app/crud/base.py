@@ -1,32 +1,41 @@
 from typing import Any, Dict, Generic, Optional, Type, TypeVar
-from firebase_admin import firestore
+from functools import cached_property
+from ..core.firebase import get_async_firestore
 
 ModelType = TypeVar("ModelType")
 
 class CRUDBase(Generic[ModelType]):
     def __init__(self, collection_name: str):
-        self.db = firestore.client()
-        self.collection = self.db.collection(collection_name)
+        self.collection_name = collection_name
+
+    @cached_property
+    def db(self):
+        # クライアントは初回アクセス時に作成する（インポート時には接続しない）
+        return get_async_firestore()
+
+    @cached_property
+    def collection(self):
+        return self.db.collection(self.collection_name)
 
     async def get(self, id: str) -> Optional[ModelType]:
-        doc = self.collection.document(id).get()
+        doc = await self.collection.document(id).get()
         return doc.to_dict() if doc.exists else None
 
     async def create(self, obj_in: Dict[str, Any]) -> ModelType:
         doc_ref = self.collection.document()
-        doc_ref.set(obj_in)
+        await doc_ref.set(obj_in)
         return {**obj_in, "id": doc_ref.id}
 
     async def update(self, id: str, obj_in: Dict[str, Any]) -> Optional[ModelType]:
         doc_ref = self.collection.document(id)
-        if doc_ref.get().exists:
-            doc_ref.update(obj_in)
+        if (await doc_ref.get()).exists:
+            await doc_ref.update(obj_in)
             return await self.get(id)
         return None
 
     async def delete(self, id: str) -> bool:
         doc_ref = self.collection.document(id)
-        if doc_ref.get().exists:
-            doc_ref.delete()
+        if (await doc_ref.get()).exists:
+            await doc_ref.delete()
             return True
         return False
\ No newline at end of file
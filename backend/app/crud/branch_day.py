@@ -0,0 +1,387 @@
+import bisect
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple, Union
+from ..core.config import settings
+from ..models.reservation import ReservationStatus
+from .branch_stats import ServiceTimeEstimator, elapsed_seconds
+import logging
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 店舗・日別ドキュメントのコレクション名
+BRANCH_DAYS_COLLECTION = "branch_days"
+
+# 時間枠を占有するステータス（キャンセル済みは枠を解放する）
+OCCUPYING_STATUSES = frozenset(
+    {
+        ReservationStatus.ACCEPTED.value,
+        ReservationStatus.CALLING.value,
+        ReservationStatus.CONFIRMED.value,
+        ReservationStatus.COMPLETED.value,
+    }
+)
+
+
+class SlotUnavailableError(Exception):
+    """指定された時間枠に空きがない場合の例外"""
+
+    pass
+
+
+def to_local(reservation_at: datetime) -> datetime:
+    """予約日時をsettings.TIMEZONEの時刻に変換（tzinfoなしはUTCとみなす）"""
+    if reservation_at.tzinfo is None:
+        reservation_at = reservation_at.replace(tzinfo=timezone.utc)
+    return reservation_at.astimezone(settings.get_timezone())
+
+
+def local_date(reservation_at: datetime) -> date:
+    """予約日時から業務日付を求める"""
+    return to_local(reservation_at).date()
+
+
+def branch_day_id(company_id: str, branch_id: str, day: date) -> str:
+    """
+    店舗・日別ドキュメントのIDを生成
+
+    Args:
+        company_id (str): 企業ID
+        branch_id (str): 店舗ID
+        day (date): 業務日付
+
+    Returns:
+        str: ドキュメントID（例: "company_branch_20250101"）
+    """
+    return f"{company_id}_{branch_id}_{day.strftime('%Y%m%d')}"
+
+
+def slot_grid() -> Tuple[str, int, int]:
+    """
+    営業時間設定から時間枠の構成を求める
+
+    Returns:
+        Tuple[str, int, int]: 開始時刻（HH:MM）、枠の長さ（分）、枠の数
+    """
+    start = settings.get_business_hours_start()
+    end = settings.get_business_hours_end()
+    slot_minutes = settings.TIME_SLOT_MINUTES
+    total_minutes = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+    return start.strftime("%H:%M"), slot_minutes, max(0, total_minutes // slot_minutes)
+
+
+def slot_times() -> List[str]:
+    """時間枠の開始時刻（HH:MM）の一覧"""
+    start, slot_minutes, slot_count = slot_grid()
+    current = datetime.strptime(start, "%H:%M")
+    times = []
+    for _ in range(slot_count):
+        times.append(current.strftime("%H:%M"))
+        current += timedelta(minutes=slot_minutes)
+    return times
+
+
+class BranchDay:
+    """
+    店舗・日別ドキュメント（branch_days）の内容
+
+    受付番号カウンタ・時間枠ごとの占有数（occupancy）・待ち行列の状態
+    （受付済み・呼び出し中の受付番号）を1ドキュメントに持ち、
+    予約の作成・ステータス変更・削除と同じトランザクション内で更新する。
+    """
+
+    def __init__(
+        self, company_id: str, branch_id: str, day: date, data: Optional[dict] = None
+    ):
+        data = data or {}
+        self.company_id = company_id
+        self.branch_id = branch_id
+        self.day = day
+        self.last_reception_number = data.get("last_reception_number", 0)
+        # 待ち行列（受付番号の昇順）と現在の呼び出し番号
+        self.waiting_numbers = list(data.get("waiting_numbers", []))
+        self.calling_numbers = list(data.get("calling_numbers", []))
+        self.current_number = data.get("current_number")
+        self.completed_count = data.get("completed_count", 0)
+
+        self.slot_start, self.slot_minutes, slot_count = slot_grid()
+        occupancy = data.get("occupancy")
+        if (
+            occupancy is not None
+            and data.get("slot_start") == self.slot_start
+            and data.get("slot_minutes") == self.slot_minutes
+            and len(occupancy) == slot_count
+        ):
+            self.occupancy = list(occupancy)
+        else:
+            if occupancy is not None:
+                # 営業時間設定が変わった場合は backfill_branch_days で再集計する
+                logger.warning(
+                    "Slot grid changed for branch day %s; occupancy reset", self.id
+                )
+            self.occupancy = [0] * slot_count
+
+    @classmethod
+    def from_snapshot(cls, company_id: str, branch_id: str, day: date, snapshot):
+        return cls(
+            company_id, branch_id, day, snapshot.to_dict() if snapshot.exists else None
+        )
+
+    @property
+    def id(self) -> str:
+        return branch_day_id(self.company_id, self.branch_id, self.day)
+
+    def next_reception_number(self) -> int:
+        """受付番号を1つ払い出す"""
+        self.last_reception_number += 1
+        return self.last_reception_number
+
+    def admit(
+        self, reservation_at: datetime, status: str, capacity: Union[int, float]
+    ) -> int:
+        """
+        新しい予約を受け付け、受付番号を払い出す
+
+        時間枠が満席の場合は受付番号を消費しない。
+
+        Raises:
+            SlotUnavailableError: 枠の占有数が上限に達している場合
+        """
+        reception_number = self.last_reception_number + 1
+        self.transition(reservation_at, reception_number, None, status, capacity)
+        self.last_reception_number = reception_number
+        return reception_number
+
+    def slot_index(self, reservation_at: datetime) -> Optional[int]:
+        """予約日時が属する時間枠の番号（営業時間外はNone）"""
+        local = to_local(reservation_at)
+        start_hour, start_minute = map(int, self.slot_start.split(":"))
+        minutes = (local.hour * 60 + local.minute) - (start_hour * 60 + start_minute)
+        if minutes < 0:
+            return None
+        index = minutes // self.slot_minutes
+        return index if index < len(self.occupancy) else None
+
+    def occupy(self, reservation_at: datetime, capacity: Union[int, float]) -> None:
+        """
+        時間枠を1つ占有する
+
+        Raises:
+            SlotUnavailableError: 枠の占有数が上限に達している場合、または
+                予約日時が営業時間（時間枠）の外の場合
+        """
+        index = self.slot_index(reservation_at)
+        if index is None:
+            # 枠の外の予約を許すと定員の検証を経ずに受け付けてしまう
+            raise SlotUnavailableError("指定された時間は営業時間外です")
+        if self.occupancy[index] >= capacity:
+            raise SlotUnavailableError("指定された時間枠は既に予約されています")
+        self.occupancy[index] += 1
+
+    def release(self, reservation_at: datetime) -> None:
+        """時間枠の占有を1つ解放する"""
+        index = self.slot_index(reservation_at)
+        if index is not None and self.occupancy[index] > 0:
+            self.occupancy[index] -= 1
+
+    def transition(
+        self,
+        reservation_at: datetime,
+        reception_number: Optional[int],
+        old_status: Optional[str],
+        new_status: Optional[str],
+        capacity: Union[int, float],
+    ) -> None:
+        """
+        予約のステータス変更を時間枠の占有数と待ち行列に反映する
+
+        Args:
+            reservation_at (datetime): 予約日時
+            reception_number (int, optional): 受付番号
+            old_status (str, optional): 変更前のステータス（新規作成時はNone）
+            new_status (str, optional): 変更後のステータス（削除時はNone）
+            capacity (int): 1枠あたりの定員
+
+        Raises:
+            SlotUnavailableError: 枠を占有し直す際に満席の場合
+        """
+        if old_status == new_status:
+            return
+
+        was_occupying = old_status in OCCUPYING_STATUSES
+        is_occupying = new_status in OCCUPYING_STATUSES
+        if is_occupying and not was_occupying:
+            self.occupy(reservation_at, capacity)
+        elif was_occupying and not is_occupying:
+            self.release(reservation_at)
+
+        if new_status == ReservationStatus.COMPLETED.value:
+            self.completed_count += 1
+        elif old_status == ReservationStatus.COMPLETED.value:
+            self.completed_count = max(0, self.completed_count - 1)
+
+        if reception_number is None:
+            return
+        self._queue_for(old_status, reception_number, remove=True)
+        self._queue_for(new_status, reception_number, remove=False)
+        if new_status == ReservationStatus.CALLING.value:
+            self.current_number = reception_number
+
+    def _queue_for(self, status: Optional[str], number: int, remove: bool) -> None:
+        """ステータスに対応する待ち行列に受付番号を追加・削除する"""
+        if status == ReservationStatus.ACCEPTED.value:
+            numbers = self.waiting_numbers
+        elif status == ReservationStatus.CALLING.value:
+            numbers = self.calling_numbers
+        else:
+            return
+        index = bisect.bisect_left(numbers, number)
+        present = index < len(numbers) and numbers[index] == number
+        if remove and present:
+            del numbers[index]
+        elif not remove and not present:
+            numbers.insert(index, number)
+
+    def queue_position(self, reception_number: int) -> Optional[int]:
+        """受付済みの番号の待ち行列内の位置（0が次に呼ばれる番号、待ちでなければNone）"""
+        index = bisect.bisect_left(self.waiting_numbers, reception_number)
+        if (
+            index < len(self.waiting_numbers)
+            and self.waiting_numbers[index] == reception_number
+        ):
+            return index
+        return None
+
+    def summary(self, next_count: int) -> dict:
+        """
+        待ち状況のサマリー
+
+        Args:
+            next_count (int): 次に呼ばれる受付番号の表示件数
+
+        Returns:
+            dict: current_number, calling_numbers, next_numbers,
+                latest_reception_number, waiting_count, completed_count
+        """
+        return {
+            "current_number": self.current_number,
+            "calling_numbers": list(self.calling_numbers),
+            "next_numbers": self.waiting_numbers[:next_count],
+            "latest_reception_number": self.last_reception_number,
+            "waiting_count": len(self.waiting_numbers),
+            "completed_count": self.completed_count,
+        }
+
+    def available_slots(self, capacity: int) -> List[dict]:
+        """
+        時間枠ごとの空き状況
+
+        Returns:
+            List[dict]: time, is_reserved（満席）, reserved_count, remaining_capacity
+        """
+        return [
+            {
+                "time": slot_time,
+                "is_reserved": count >= capacity,
+                "reserved_count": count,
+                "remaining_capacity": max(0, capacity - count),
+            }
+            for slot_time, count in zip(slot_times(), self.occupancy)
+        ]
+
+    def to_dict(self) -> dict:
+        """Firestoreに保存する内容"""
+        return {
+            "company_id": self.company_id,
+            "branch_id": self.branch_id,
+            "date": self.day.isoformat(),
+            "last_reception_number": self.last_reception_number,
+            "slot_start": self.slot_start,
+            "slot_minutes": self.slot_minutes,
+            "occupancy": self.occupancy,
+            "waiting_numbers": self.waiting_numbers,
+            "calling_numbers": self.calling_numbers,
+            "current_number": self.current_number,
+            "completed_count": self.completed_count,
+            "updated_at": datetime.utcnow(),
+        }
+
+
+def apply_status_change(
+    reservation: dict,
+    new_status: str,
+    changed_at: datetime,
+    branch_day: Optional[BranchDay],
+    estimator: Optional[ServiceTimeEstimator],
+) -> dict:
+    """
+    予約のステータス変更を店舗・日別ドキュメントと対応時間推定に反映する
+
+    Firestoreへの書き込みは呼び出し側がトランザクション内で行う。
+
+    Args:
+        reservation (dict): 変更前の予約情報
+        new_status (str): 変更後のステータス
+        changed_at (datetime): 変更日時
+        branch_day (BranchDay, optional): 予約の店舗・日別ドキュメント
+        estimator (ServiceTimeEstimator, optional): 予約の店舗の対応時間推定
+
+    Returns:
+        dict: fields（予約ドキュメントに追加で書き込む項目）,
+            estimator_changed（対応時間推定を更新したか）
+
+    Raises:
+        SlotUnavailableError: キャンセル済みの予約を戻す際に枠が満席の場合
+    """
+    if branch_day is not None:
+        branch_day.transition(
+            reservation["reservation_at"],
+            reservation.get("reception_number"),
+            reservation.get("status"),
+            new_status,
+            settings.MAX_CONCURRENT_RESERVATIONS,
+        )
+
+    fields = {}
+    estimator_changed = False
+    if new_status == ReservationStatus.CALLING.value:
+        fields["called_at"] = changed_at
+    elif new_status == ReservationStatus.COMPLETED.value:
+        fields["completed_at"] = changed_at
+        if estimator is not None and reservation.get("called_at"):
+            estimator_changed = estimator.observe(
+                elapsed_seconds(reservation["called_at"], changed_at)
+            )
+    return {"fields": fields, "estimator_changed": estimator_changed}
+
+
+def availability_matrix(
+    start: date, days: int, branch_days: Iterable[BranchDay], capacity: int
+) -> "np.ndarray":
+    """
+    期間内の時間枠ごとの空き数を（日数 × 時間枠数）の行列で求める
+
+    ドキュメントが存在しない日は予約なし（全枠が空き）として扱う。
+    numpyは空き状況カレンダーでのみ使うため、初回の呼び出し時に読み込む
+    （ワーカーの起動時間・メモリを増やさない）。
+
+    Args:
+        start (date): 期間の初日
+        days (int): 期間の日数
+        branch_days (Iterable[BranchDay]): 期間内の店舗・日別ドキュメント
+        capacity (int): 1枠あたりの定員
+
+    Returns:
+        np.ndarray: free[日, 枠] = 空き数（0以上）
+    """
+    import numpy as np
+
+    _, _, slot_count = slot_grid()
+    occupancy = np.zeros((days, slot_count), dtype=np.int32)
+    for branch_day in branch_days:
+        row = (branch_day.day - start).days
+        if 0 <= row < days:
+            occupancy[row] = branch_day.occupancy
+    return np.clip(capacity - occupancy, 0, capacity)
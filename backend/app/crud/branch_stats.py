@@ -0,0 +1,101 @@
+import math
+from datetime import datetime, timezone
+from typing import Optional
+from ..core.config import settings
+
+# 店舗別の統計ドキュメントのコレクション名
+BRANCH_STATS_COLLECTION = "branch_stats"
+
+
+def branch_stats_id(company_id: str, branch_id: str) -> str:
+    """店舗別統計ドキュメントのIDを生成（例: "company_branch"）"""
+    return f"{company_id}_{branch_id}"
+
+
+def elapsed_seconds(started_at: datetime, ended_at: datetime) -> float:
+    """2つの日時の差（秒）。tzinfoなしはUTCとみなす"""
+    if started_at.tzinfo is None:
+        started_at = started_at.replace(tzinfo=timezone.utc)
+    if ended_at.tzinfo is None:
+        ended_at = ended_at.replace(tzinfo=timezone.utc)
+    return (ended_at - started_at).total_seconds()
+
+
+class ServiceTimeEstimator:
+    """
+    店舗ごとの対応時間（呼び出しから完了まで）の推定
+
+    対応時間の指数移動平均（EWMA）と観測数だけを branch_stats に保持するため、
+    再起動後も過去の予約を集計し直す必要はない。観測数が少ない間は
+    単純平均と同じ重みで更新し、初期値の影響が残らないようにする。
+    """
+
+    def __init__(self, company_id: str, branch_id: str, data: Optional[dict] = None):
+        data = data or {}
+        self.company_id = company_id
+        self.branch_id = branch_id
+        self.mean_seconds: Optional[float] = data.get("service_mean_seconds")
+        self.sample_count: int = data.get("service_sample_count", 0)
+
+    @classmethod
+    def from_snapshot(cls, company_id: str, branch_id: str, snapshot):
+        return cls(
+            company_id, branch_id, snapshot.to_dict() if snapshot.exists else None
+        )
+
+    @property
+    def id(self) -> str:
+        return branch_stats_id(self.company_id, self.branch_id)
+
+    def observe(self, duration_seconds: float) -> bool:
+        """
+        対応時間を1件反映する
+
+        Args:
+            duration_seconds (float): 呼び出しから完了までの秒数
+
+        Returns:
+            bool: 反映した場合True（下限未満や上限超えの外れ値は無視する）
+        """
+        if not (
+            settings.WAIT_TIME_MIN_SERVICE_MINUTES * 60
+            <= duration_seconds
+            <= settings.WAIT_TIME_MAX_SERVICE_MINUTES * 60
+        ):
+            return False
+        self.sample_count += 1
+        if self.mean_seconds is None:
+            self.mean_seconds = float(duration_seconds)
+            return True
+        alpha = max(settings.WAIT_TIME_EWMA_ALPHA, 1 / self.sample_count)
+        self.mean_seconds += alpha * (duration_seconds - self.mean_seconds)
+        return True
+
+    def service_minutes(self) -> float:
+        """1件あたりの対応時間（分）。観測がない場合は既定値"""
+        if self.mean_seconds is None:
+            return float(settings.DEFAULT_APPOINTMENT_DURATION)
+        return self.mean_seconds / 60
+
+    def estimate_wait_minutes(self, position: int, servers: int = 1) -> int:
+        """
+        待ち行列内の位置から待ち時間を推定する
+
+        Args:
+            position (int): 待ち行列内の位置（0が次に呼ばれる番号）
+            servers (int): 同時に対応している窓口数
+
+        Returns:
+            int: 推定待ち時間（分、切り上げ）
+        """
+        return math.ceil((position + 1) * self.service_minutes() / max(1, servers))
+
+    def to_dict(self) -> dict:
+        """Firestoreに保存する内容"""
+        return {
+            "company_id": self.company_id,
+            "branch_id": self.branch_id,
+            "service_mean_seconds": self.mean_seconds,
+            "service_sample_count": self.sample_count,
+            "updated_at": datetime.utcnow(),
+        }
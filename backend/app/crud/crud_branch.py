@@ -1,19 +1,32 @@
 from typing import List, Optional
-from firebase_admin import firestore
+from functools import cached_property
 from datetime import datetime
+from firebase_admin import firestore_async
+from google.cloud.firestore_v1.field_path import FieldPath
 from ..models.branch import BranchCreate, BranchUpdate, BranchInDB
+from ..core.firebase import get_async_firestore
+from ..core.firestore_metrics import instrumented
+from .pagination import decode_cursor
+from .loader import forget_document, load_document
+from .versioning import bump_collection_version, get_collection_version
+from .master_cache import branch_cache
+from .crud_company import crud_company
 
 
+@instrumented("branch")
 class CRUDBranch:
-    def __init__(self):
-        self.db = firestore.client()
-        self.collection = self.db.collection("branches")
+    # Firestoreクライアントとコレクションは初回アクセス時に作成する
+    @cached_property
+    def db(self):
+        return get_async_firestore()
+
+    @cached_property
+    def collection(self):
+        return self.db.collection("branches")
 
     async def create(self, obj_in: BranchCreate) -> BranchInDB:
         # 企業の存在確認
-        company_ref = self.db.collection("companies").document(obj_in.company_id)
-        company_doc = company_ref.get()
-        if not company_doc.exists:
+        if await crud_company.get(obj_in.company_id) is None:
             raise ValueError("指定された企業が存在しません")
 
         doc_ref = self.collection.document()
@@ -25,61 +38,103 @@ class CRUDBranch:
                 "updated_at": datetime.utcnow(),
             }
         )
-        doc_ref.set(branch_data)
+        batch = self.db.batch()
+        batch.set(doc_ref, branch_data)
+        bump_collection_version(batch, self.db, "branches")
+        await batch.commit()
+        forget_document(doc_ref)
+        branch_cache.invalidate(doc_ref.id)
         return BranchInDB(**branch_data)
 
     async def get(self, branch_id: str) -> Optional[BranchInDB]:
-        doc = self.collection.document(branch_id).get()
-        if doc.exists:
-            return BranchInDB(**{**doc.to_dict(), "id": doc.id})
+        # キャッシュにない場合はリクエスト内でまとめて取得・メモ化
+        found, data = branch_cache.lookup(branch_id)
+        if not found:
+            generation = branch_cache.generation()
+            data = await load_document(self.collection.document(branch_id))
+            branch_cache.store(branch_id, data, generation)
+        if data is not None:
+            return BranchInDB(**{**data, "id": branch_id})
         return None
 
     async def get_multi(
-        self, company_id: Optional[str] = None, skip: int = 0, limit: int = 100
+        self,
+        company_id: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
     ) -> List[BranchInDB]:
+        """
+        店舗一覧を取得（ドキュメントID順）
+
+        cursorを指定した場合はその位置から続きを取得し、skipは無視する。
+        offsetと異なり読み飛ばしたドキュメントの読み取りが発生しない。
+        """
         query = self.collection
         if company_id:
             query = query.where("company_id", "==", company_id)
 
-        docs = query.limit(limit).offset(skip).stream()
-        return [
-            BranchInDB(
-                **{
-                    **doc.to_dict(),
-                    "id": doc.id,
-                    "company_id": doc.to_dict().get("company_id", "default_company_id"),
-                    "branch_name": doc.to_dict().get(
-                        "branch_name", "default_branch_name"
-                    ),
-                    "address": doc.to_dict().get("address", "default_address"),
-                    "phone": doc.to_dict().get("phone", "default_phone"),
-                    "business_hours": doc.to_dict().get(
-                        "business_hours", "default_hours"
-                    ),
-                }
+        document_id = FieldPath.document_id()
+        query = query.order_by(document_id)
+        if cursor:
+            _, last_id = decode_cursor(cursor)
+            query = query.start_after({document_id: last_id})
+        elif skip:
+            query = query.offset(skip)
+
+        docs = await query.limit(limit).get()
+        branches = []
+        for doc in docs:
+            # to_dict()は呼ぶたびにドキュメント全体を変換するため1回だけ呼ぶ
+            data = doc.to_dict()
+            branches.append(
+                BranchInDB(
+                    **{
+                        **data,
+                        "id": doc.id,
+                        "company_id": data.get("company_id", "default_company_id"),
+                        "branch_name": data.get("branch_name", "default_branch_name"),
+                        "address": data.get("address", "default_address"),
+                        "phone": data.get("phone", "default_phone"),
+                        "business_hours": data.get("business_hours", "default_hours"),
+                    }
+                )
             )
-            for doc in docs
-        ]
+        return branches
+
+    async def get_version(self) -> int:
+        """店舗コレクションの更新番号（一覧のETag用）"""
+        return await get_collection_version(self.db, "branches")
 
     async def update(
         self, branch_id: str, obj_in: BranchUpdate
     ) -> Optional[BranchInDB]:
         doc_ref = self.collection.document(branch_id)
-        if not doc_ref.get().exists:
+        if not (await doc_ref.get()).exists:
             return None
 
         update_data = obj_in.model_dump(exclude_unset=True)
         update_data["updated_at"] = datetime.utcnow()
 
-        doc_ref.update(update_data)
-        updated_doc = doc_ref.get()
+        batch = self.db.batch()
+        batch.update(doc_ref, update_data)
+        bump_collection_version(batch, self.db, "branches")
+        await batch.commit()
+        forget_document(doc_ref)
+        branch_cache.invalidate(doc_ref.id)
+        updated_doc = await doc_ref.get()
         return BranchInDB(**{**updated_doc.to_dict(), "id": branch_id})
 
     async def delete(self, branch_id: str) -> bool:
         doc_ref = self.collection.document(branch_id)
-        if not doc_ref.get().exists:
+        if not (await doc_ref.get()).exists:
             return False
-        doc_ref.delete()
+        batch = self.db.batch()
+        batch.delete(doc_ref)
+        bump_collection_version(batch, self.db, "branches")
+        await batch.commit()
+        forget_document(doc_ref)
+        branch_cache.invalidate(doc_ref.id)
         return True
 
 
@@ -1,14 +1,27 @@
 from typing import List, Optional
-from firebase_admin import firestore
+from functools import cached_property
 from datetime import datetime
+from firebase_admin import firestore_async
+from google.cloud.firestore_v1.field_path import FieldPath
 from ..models.company import CompanyCreate, CompanyUpdate, CompanyInDB
+from ..core.firebase import get_async_firestore
+from ..core.firestore_metrics import instrumented
+from .pagination import decode_cursor
+from .loader import forget_document, load_document
+from .versioning import bump_collection_version, get_collection_version
+from .master_cache import company_cache
 
 
+@instrumented("company")
 class CRUDCompany:
-    def __init__(self):
-        # Firestoreクライアントとコレクションの初期化
-        self.db = firestore.client()
-        self.collection = self.db.collection("companies")
+    # Firestoreクライアントとコレクションは初回アクセス時に作成する
+    @cached_property
+    def db(self):
+        return get_async_firestore()
+
+    @cached_property
+    def collection(self):
+        return self.db.collection("companies")
 
     async def create(self, obj_in: CompanyCreate) -> CompanyInDB:
         # 新しい企業ドキュメントを作成
@@ -21,42 +34,75 @@ class CRUDCompany:
                 "updated_at": datetime.utcnow(),
             }
         )
-        doc_ref.set(company_data)
+        batch = self.db.batch()
+        batch.set(doc_ref, company_data)
+        bump_collection_version(batch, self.db, "companies")
+        await batch.commit()
+        forget_document(doc_ref)
+        company_cache.invalidate(doc_ref.id)
         return CompanyInDB(**company_data)
 
     async def get(self, company_id: str) -> Optional[CompanyInDB]:
-        # 指定IDの企業情報を取得
-        doc = self.collection.document(company_id).get()
-        if doc.exists:
-            return CompanyInDB(**{**doc.to_dict(), "id": doc.id})
+        # 指定IDの企業情報を取得（キャッシュにない場合はリクエスト内でまとめて取得）
+        found, data = company_cache.lookup(company_id)
+        if not found:
+            generation = company_cache.generation()
+            data = await load_document(self.collection.document(company_id))
+            company_cache.store(company_id, data, generation)
+        if data is not None:
+            return CompanyInDB(**{**data, "id": company_id})
         return None
 
-    async def get_multi(self, skip: int = 0, limit: int = 100) -> List[CompanyInDB]:
-        # 企業一覧を取得（ページネーション対応）
-        docs = self.collection.limit(limit).offset(skip).stream()
+    async def get_multi(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[CompanyInDB]:
+        # 企業一覧を取得（ドキュメントID順、cursor指定時はskipを無視）
+        document_id = FieldPath.document_id()
+        query = self.collection.order_by(document_id)
+        if cursor:
+            _, last_id = decode_cursor(cursor)
+            query = query.start_after({document_id: last_id})
+        elif skip:
+            query = query.offset(skip)
+
+        docs = await query.limit(limit).get()
         return [CompanyInDB(**{**doc.to_dict(), "id": doc.id}) for doc in docs]
 
+    async def get_version(self) -> int:
+        """企業コレクションの更新番号（一覧のETag用）"""
+        return await get_collection_version(self.db, "companies")
+
     async def update(
         self, company_id: str, obj_in: CompanyUpdate
     ) -> Optional[CompanyInDB]:
         # 企業情報を更新
         doc_ref = self.collection.document(company_id)
-        if not doc_ref.get().exists:
+        if not (await doc_ref.get()).exists:
             return None
 
         update_data = obj_in.model_dump(exclude_unset=True)
         update_data["updated_at"] = datetime.utcnow()
 
-        doc_ref.update(update_data)
-        updated_doc = doc_ref.get()
+        batch = self.db.batch()
+        batch.update(doc_ref, update_data)
+        bump_collection_version(batch, self.db, "companies")
+        await batch.commit()
+        forget_document(doc_ref)
+        company_cache.invalidate(doc_ref.id)
+        updated_doc = await doc_ref.get()
         return CompanyInDB(**{**updated_doc.to_dict(), "id": company_id})
 
     async def delete(self, company_id: str) -> bool:
         # 企業情報を削除
         doc_ref = self.collection.document(company_id)
-        if not doc_ref.get().exists:
+        if not (await doc_ref.get()).exists:
             return False
-        doc_ref.delete()
+        batch = self.db.batch()
+        batch.delete(doc_ref)
+        bump_collection_version(batch, self.db, "companies")
+        await batch.commit()
+        forget_document(doc_ref)
+        company_cache.invalidate(doc_ref.id)
         return True
 
 
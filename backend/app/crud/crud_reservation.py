@@ -1,95 +1,144 @@
 from typing import List, Optional
-from datetime import datetime, date, timedelta, time
-from firebase_admin import firestore
-from ..models.reservation import ReservationCreate, ReservationUpdate, ReservationStatus
-from ..core.firebase import get_firestore
+from functools import cached_property
+from datetime import datetime, date, timedelta, time, timezone
+import asyncio
+from firebase_admin import firestore_async
+from google.cloud.firestore_v1.field_path import FieldPath
+from ..models.reservation import (
+    is_allowed_transition,
+    ReservationCreate,
+    ReservationUpdate,
+    ReservationStatus,
+    AvailabilityCalendar,
+)
+from ..core.firebase import get_async_firestore
+from ..core.firestore_metrics import instrumented
 from ..core.config import settings
+from .pagination import decode_cursor
+from .branch_stats import (
+    BRANCH_STATS_COLLECTION,
+    ServiceTimeEstimator,
+    branch_stats_id,
+)
+from .branch_day import (
+    BRANCH_DAYS_COLLECTION,
+    BranchDay,
+    SlotUnavailableError,
+    apply_status_change,
+    availability_matrix,
+    branch_day_id,
+    local_date,
+    slot_times,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Firestoreの1回のバッチ書き込み・トランザクションで扱える書き込み数の上限
+FIRESTORE_WRITE_LIMIT = 500
 
+
+@instrumented("reservation")
 class CRUDReservation:
-    def __init__(self):
-        """
-        予約CRUD操作用クラスの初期化
-        Firestoreのクライアントを設定
-        """
-        self.db = get_firestore()
-        self.collection = self.db.collection("reservations")
+    @cached_property
+    def db(self):
+        """Firestoreのクライアント（初回アクセス時に作成し、インポート時には接続しない）"""
+        return get_async_firestore()
+
+    @cached_property
+    def collection(self):
+        return self.db.collection("reservations")
+
+    @cached_property
+    def branch_days(self):
+        # 店舗・日別の受付番号カウンタ・時間枠占有数
+        return self.db.collection(BRANCH_DAYS_COLLECTION)
+
+    @cached_property
+    def branch_stats(self):
+        # 店舗別の対応時間の統計（待ち時間の推定用）
+        return self.db.collection(BRANCH_STATS_COLLECTION)
+
+    def _branch_stats_ref(self, company_id: str, branch_id: str):
+        """店舗別統計ドキュメントの参照を取得"""
+        return self.branch_stats.document(branch_stats_id(company_id, branch_id))
+
+    def _branch_day_ref(self, company_id: str, branch_id: str, day: date):
+        """店舗・日別ドキュメントの参照を取得"""
+        return self.branch_days.document(branch_day_id(company_id, branch_id, day))
+
+    async def _load_branch_day(
+        self, transaction, company_id: str, branch_id: str, day: date
+    ) -> BranchDay:
+        """トランザクション内で店舗・日別ドキュメントを読み取る"""
+        snapshot = await self._branch_day_ref(company_id, branch_id, day).get(
+            transaction=transaction
+        )
+        return BranchDay.from_snapshot(company_id, branch_id, day, snapshot)
 
-    async def _generate_reception_number(self, reservation_at: datetime) -> int:
+    async def _get_branch_days(self, transaction, keys: list) -> dict:
         """
-        指定された日付の受付番号を生成
+        トランザクション内で複数の店舗・日別ドキュメントを1回で読み取る
 
         Args:
-            reservation_date (date): 予約日
+            transaction: トランザクション
+            keys (list): (company_id, branch_id, 業務日付) の一覧
 
         Returns:
-            int: 生成された受付番号
+            dict: {(company_id, branch_id, 業務日付): BranchDay}
         """
-        # 指定日の開始時刻と終了時刻を設定
-        start_of_day = reservation_at.strftime("%Y-%m-%d 00:00:00")
-        end_of_day = (reservation_at + timedelta(days=1)).strftime("%Y-%m-%d 23:59:59")
-
-        # 指定日の予約を全て取得
-        query = (
-            self.collection.where("reservation_at", ">=", start_of_day)
-            .where("reservation_at", "<", end_of_day)
-            .order_by("reservation_at")
-            .order_by("reception_number", direction=firestore.Query.DESCENDING)
-            .limit(1)
-        )
-
-        docs = query.get()
-
-        # その日の最後の受付番号を取得し、+1した値を返す
-        if docs:
-            return len(docs) + 1
+        refs = [self._branch_day_ref(*key) for key in keys]
+        snapshots = {}
+        async for snapshot in self.db.get_all(refs, transaction=transaction):
+            snapshots[snapshot.id] = snapshot
+        return {
+            key: BranchDay.from_snapshot(*key, snapshots[branch_day_id(*key)])
+            for key in keys
+        }
 
-        # その日の最初の予約の場合は1を返す
-        return 1
+    def _save_branch_day(self, transaction, branch_day: BranchDay) -> None:
+        """トランザクションに店舗・日別ドキュメントの書き込みを追加"""
+        transaction.set(self.branch_days.document(branch_day.id), branch_day.to_dict())
 
     async def create(self, reservation: ReservationCreate, user_id: str) -> dict:
         """
         新規予約を作成
 
+        受付番号の採番・時間枠の占有・待ち行列への追加は、店舗・日別ドキュメントを
+        トランザクション内で1件読み取り・1件更新して行うため、
+        他店舗の予約とは競合しない。
+
         Args:
             reservation (ReservationCreate): 予約情報
             user_id (str): ユーザーID
 
         Returns:
             dict: 作成された予約情報
+
+        Raises:
+            SlotUnavailableError: 指定された時間枠に空きがない場合
         """
         current_time = datetime.utcnow()
 
         # トランザクションを使用して、受付番号の重複を防ぐ
         transaction = self.db.transaction()
 
-        @firestore.transactional
-        def create_in_transaction(transaction, reservation_data):
-            # 予約日時の年月日で予約数をカウント
-            start_of_day = reservation_data["reservation_at"].replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
-            end_of_day = start_of_day + timedelta(days=1)
-
-            # 当日の予約を取得
-            existing_query = (
-                self.collection.where("reservation_at", ">=", start_of_day)
-                .where("reservation_at", "<", end_of_day)
-                .order_by("reception_number", direction=firestore.Query.DESCENDING)
-                .limit(1)
-                .get()
+        @firestore_async.async_transactional
+        async def create_in_transaction(transaction, reservation_data):
+            branch_day = await self._load_branch_day(
+                transaction,
+                reservation_data["company_id"],
+                reservation_data["branch_id"],
+                local_date(reservation_data["reservation_at"]),
             )
 
-            # 受付番号を生成
-            new_number = 1  # デフォルト値を1に設定
-            if len(existing_query) > 0:
-                # 既存の予約がある場合は、最大の受付番号に1を加える
-                new_number = existing_query[0].to_dict().get("reception_number", 0) + 1
-
-            reservation_data["reception_number"] = new_number
+            # 次の受付番号を決定し、時間枠の占有と待ち行列に反映
+            reservation_data["reception_number"] = branch_day.admit(
+                reservation_data["reservation_at"],
+                reservation_data["status"],
+                settings.MAX_CONCURRENT_RESERVATIONS,
+            )
+            self._save_branch_day(transaction, branch_day)
 
             # ドキュメントを作成
             doc_ref = self.collection.document()
@@ -108,13 +157,17 @@ class CRUDReservation:
                 "updated_at": current_time,
             }
 
-            doc_ref, final_data = create_in_transaction(transaction, reservation_data)
+            doc_ref, final_data = await create_in_transaction(
+                transaction, reservation_data
+            )
 
             # 予約作成のログを出力
             logger.info(
-                f"New reservation created: {doc_ref.id}, Reception number: {final_data['reception_number']}"
+                "New reservation created: %s, Reception number: %s",
+                doc_ref.id,
+                final_data["reception_number"],
             )
-            logger.debug(f"Reservation details: {final_data}")
+            logger.debug("Reservation details: %s", final_data)
 
             response_data = {
                 **final_data,
@@ -123,10 +176,159 @@ class CRUDReservation:
             }
             return response_data
 
+        except SlotUnavailableError:
+            raise
         except Exception as e:
-            logger.error(f"Error creating reservation: {e}")
+            logger.error("Error creating reservation: %s", e)
             raise
 
+    async def create_bulk(
+        self, reservations: List[ReservationCreate], user_id: str
+    ) -> List[dict]:
+        """
+        複数の予約をまとめて作成
+
+        店舗・日ごとに連続した受付番号を1回のトランザクションでまとめて払い出し、
+        予約ドキュメントは500件ごとのバッチ書き込みで作成する。
+
+        Args:
+            reservations (List[ReservationCreate]): 予約情報の一覧
+            user_id (str): ユーザーID
+
+        Returns:
+            List[dict]: 入力と同じ順の結果
+                （index, status: created / rejected / failed, reservation_id,
+                reception_number, message）
+
+        Raises:
+            ValueError: 1回で扱える店舗・日の数を超える場合
+        """
+        current_time = datetime.utcnow()
+        items = [
+            {
+                "user_id": user_id,
+                "company_id": reservation.company_id,
+                "branch_id": reservation.branch_id,
+                "reservation_at": reservation.reservation_at,
+                "notes": reservation.notes,
+                "status": ReservationStatus.ACCEPTED.value,
+                "created_at": current_time,
+                "updated_at": current_time,
+            }
+            for reservation in reservations
+        ]
+        results = [{"index": index} for index in range(len(items))]
+
+        # 店舗・日ごとに入力順でまとめる
+        groups = {}
+        for index, item in enumerate(items):
+            key = (
+                item["company_id"],
+                item["branch_id"],
+                local_date(item["reservation_at"]),
+            )
+            groups.setdefault(key, []).append(index)
+        if len(groups) > FIRESTORE_WRITE_LIMIT:
+            raise ValueError(
+                f"1回で登録できる店舗・日の組み合わせは{FIRESTORE_WRITE_LIMIT}件までです"
+            )
+
+        transaction = self.db.transaction()
+
+        @firestore_async.async_transactional
+        async def allocate_in_transaction(transaction):
+            branch_days = await self._get_branch_days(transaction, list(groups))
+            allocated = {}
+            for key, indices in groups.items():
+                branch_day = branch_days[key]
+                for index in indices:
+                    try:
+                        allocated[index] = branch_day.admit(
+                            items[index]["reservation_at"],
+                            items[index]["status"],
+                            settings.MAX_CONCURRENT_RESERVATIONS,
+                        )
+                    except SlotUnavailableError as e:
+                        allocated[index] = e
+                self._save_branch_day(transaction, branch_day)
+            return allocated
+
+        allocated = await allocate_in_transaction(transaction)
+
+        created = []
+        for index, outcome in allocated.items():
+            if isinstance(outcome, SlotUnavailableError):
+                results[index].update(status="rejected", message=str(outcome))
+            else:
+                items[index]["reception_number"] = outcome
+                created.append(index)
+
+        # 予約ドキュメントを500件ずつ書き込む
+        failed = []
+        for start in range(0, len(created), FIRESTORE_WRITE_LIMIT):
+            chunk = created[start : start + FIRESTORE_WRITE_LIMIT]
+            batch = self.db.batch()
+            doc_refs = {}
+            for index in chunk:
+                doc_refs[index] = self.collection.document()
+                batch.set(doc_refs[index], items[index])
+            try:
+                await batch.commit()
+            except Exception as e:
+                logger.error("Error writing bulk reservations: %s", e)
+                failed.extend(chunk)
+                for index in chunk:
+                    results[index].update(status="failed", message=str(e))
+                continue
+            for index in chunk:
+                results[index].update(
+                    status="created",
+                    reservation_id=doc_refs[index].id,
+                    reception_number=items[index]["reception_number"],
+                )
+
+        if failed:
+            await self._release_allocations([items[index] for index in failed])
+
+        logger.info(
+            "Bulk reservations: %s created, %s rejected, %s failed",
+            len(created) - len(failed),
+            len(items) - len(created),
+            len(failed),
+        )
+        return results
+
+    async def _release_allocations(self, items: List[dict]) -> None:
+        """書き込みに失敗した予約の時間枠と待ち行列を解放する（受付番号は欠番とする）"""
+        groups = {}
+        for item in items:
+            key = (
+                item["company_id"],
+                item["branch_id"],
+                local_date(item["reservation_at"]),
+            )
+            groups.setdefault(key, []).append(item)
+
+        transaction = self.db.transaction()
+
+        @firestore_async.async_transactional
+        async def release_in_transaction(transaction):
+            # トランザクション内の読み取りは書き込みより前にまとめて行う
+            branch_days = await self._get_branch_days(transaction, list(groups))
+            for key, group in groups.items():
+                branch_day = branch_days[key]
+                for item in group:
+                    branch_day.transition(
+                        item["reservation_at"],
+                        item["reception_number"],
+                        item["status"],
+                        None,
+                        settings.MAX_CONCURRENT_RESERVATIONS,
+                    )
+                self._save_branch_day(transaction, branch_day)
+
+        await release_in_transaction(transaction)
+
     async def get(self, reservation_id: str) -> Optional[dict]:
         """
         予約IDで予約情報を取得
@@ -137,15 +339,54 @@ class CRUDReservation:
         Returns:
             Optional[dict]: 予約情報
         """
-        doc = self.collection.document(reservation_id).get()
+        data, _ = await self.get_versioned(reservation_id)
+        return data
+
+    async def get_versioned(self, reservation_id: str) -> tuple:
+        """
+        予約情報とドキュメントの最終更新日時を取得（ETagの生成用）
+
+        Args:
+            reservation_id (str): 予約ID
+
+        Returns:
+            tuple: (予約情報またはNone, update_timeまたはNone)
+        """
+        doc = await self.collection.document(reservation_id).get()
         if doc.exists:
             data = doc.to_dict()
             data["id"] = doc.id
             # datetimeからdateに変換して返す
             if "reservation_date" in data:
                 data["reservation_date"] = data["reservation_date"].date()
-            return data
-        return None
+            return data, doc.update_time
+        return None, None
+
+    @staticmethod
+    def parse_statuses(status: Optional[str]) -> List[str]:
+        """
+        カンマ区切りのステータス指定を検証してリストに変換
+
+        Args:
+            status (str, optional): 例 "accepted,calling"
+
+        Returns:
+            List[str]: 重複を除いたステータスのリスト（指定なしは空リスト）
+
+        Raises:
+            ValueError: 未定義のステータスが含まれる場合
+        """
+        if not status:
+            return []
+        statuses = []
+        for value in status.split(","):
+            value = value.strip()
+            if not value or value in statuses:
+                continue
+            if value not in ReservationStatus._value2member_map_:
+                raise ValueError(f"不正な予約ステータスです: {value}")
+            statuses.append(value)
+        return statuses
 
     async def get_multi_by_user(
         self,
@@ -156,6 +397,7 @@ class CRUDReservation:
         limit: int = 10,
         target_date: Optional[date] = None,
         status: Optional[str] = None,
+        cursor: Optional[str] = None,
     ) -> List[dict]:
         """
         ユーザーの予約一覧を取得
@@ -164,10 +406,11 @@ class CRUDReservation:
             user_id (str): ユーザーID
             company_id (str): 企業ID
             branch_id (str): 店舗ID
-            skip (int): スキップする件数
+            skip (int): スキップする件数（cursor指定時は無視）
             limit (int): 取得する件数
             target_date (date, optional): 検索日
-            status (str, optional): 予約ステータス
+            status (str, optional): 予約ステータス（カンマ区切りで複数指定可）
+            cursor (str, optional): 前ページの最終予約を示すカーソル
 
         Returns:
             List[dict]: 予約一覧
@@ -183,16 +426,34 @@ class CRUDReservation:
         if branch_id:
             query = query.where("branch_id", "==", branch_id)
 
+        # ステータスはクエリ側で絞り込み、limit件ちょうどを1回のRPCで取得する
+        statuses = self.parse_statuses(status)
+        if len(statuses) == 1:
+            query = query.where("status", "==", statuses[0])
+        elif statuses:
+            query = query.where("status", "in", statuses)
+
         if target_date:
             from_datetime = datetime.combine(target_date, time.min)
             to_datetime = datetime.combine(target_date, time.max)
             query = query.where("reservation_at", ">=", from_datetime)
             query = query.where("reservation_at", "<=", to_datetime)
 
-        # 日付でソート
-        query = query.order_by("reservation_at", direction=firestore.Query.DESCENDING)
+        # 日付でソート（同時刻の予約はドキュメントIDで順序を固定）
+        document_id = FieldPath.document_id()
+        query = query.order_by(
+            "reservation_at", direction=firestore_async.Query.DESCENDING
+        ).order_by(document_id, direction=firestore_async.Query.DESCENDING)
+
+        if cursor:
+            last_reservation_at, last_id = decode_cursor(cursor)
+            query = query.start_after(
+                {"reservation_at": last_reservation_at, document_id: last_id}
+            )
+        elif skip:
+            query = query.offset(skip)
 
-        docs = query.limit(limit).offset(skip).get()
+        docs = await query.limit(limit).get()
         reservations = []
         for doc in docs:
             data = doc.to_dict()
@@ -200,13 +461,6 @@ class CRUDReservation:
             # datetimeからdateに変換
             if "reservation_date" in data:
                 data["reservation_date"] = data["reservation_date"].date()
-            # ステータスが指定されている場合は、ステータスでフィルタリング
-            if "status" in data and status:
-                if data["status"] in status.split(","):
-                    reservations.append(data)
-                else:
-                    continue
-
             reservations.append(data)
         return reservations
 
@@ -230,7 +484,7 @@ class CRUDReservation:
             .where("status", "==", ReservationStatus.CONFIRMED.value)
         )
 
-        docs = query.get()
+        docs = await query.get()
         return len(docs)
 
     async def is_time_slot_taken(
@@ -258,36 +512,320 @@ class CRUDReservation:
             .where("status", "==", ReservationStatus.CONFIRMED.value)
         )
 
-        docs = query.get()
+        docs = await query.get()
         return len(docs) > 0
 
     async def update(
         self, reservation_id: str, reservation_update: ReservationUpdate
     ) -> Optional[dict]:
-        """予約情報を更新"""
+        """
+        予約情報を更新
+
+        ステータスが変わる場合は、時間枠の占有数と待ち行列を持つ
+        店舗・日別ドキュメントを同じトランザクション内で更新する。
+        呼び出し時刻を記録し、完了時には呼び出しからの経過時間を
+        店舗別の対応時間の推定に反映する。
+
+        Raises:
+            SlotUnavailableError: キャンセル済みの予約を戻す際に枠が満席の場合
+        """
         update_data = reservation_update.dict(exclude_unset=True)
         if "reservation_date" in update_data:
             update_data["reservation_date"] = update_data["reservation_date"].strftime(
                 "%Y-%m-%d"
             )
+        if isinstance(update_data.get("status"), ReservationStatus):
+            update_data["status"] = update_data["status"].value
 
         update_data["updated_at"] = datetime.utcnow()
+        status_changed_at = datetime.now(timezone.utc)
 
         doc_ref = self.collection.document(reservation_id)
-        if doc_ref.get().exists:
-            doc_ref.update(update_data)
+        transaction = self.db.transaction()
+
+        @firestore_async.async_transactional
+        async def update_in_transaction(transaction):
+            snapshot = await doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            current = snapshot.to_dict()
+
+            new_status = update_data.get("status", current.get("status"))
+            if new_status == current.get("status"):
+                transaction.update(doc_ref, update_data)
+                return True
+
+            # トランザクション内の読み取りは書き込みより前に行う
+            estimator = None
+            if new_status == ReservationStatus.COMPLETED.value and current.get(
+                "called_at"
+            ):
+                estimator = await self._load_estimator(transaction, current)
+            branch_day = None
+            if self._has_branch_day(current):
+                branch_day = await self._load_branch_day(
+                    transaction,
+                    current["company_id"],
+                    current["branch_id"],
+                    local_date(current["reservation_at"]),
+                )
+
+            observed = apply_status_change(
+                current, new_status, status_changed_at, branch_day, estimator
+            )
+            update_data.update(observed["fields"])
+            if branch_day is not None:
+                self._save_branch_day(transaction, branch_day)
+            if observed["estimator_changed"]:
+                transaction.set(
+                    self.branch_stats.document(estimator.id), estimator.to_dict()
+                )
+
+            transaction.update(doc_ref, update_data)
+            return True
+
+        if await update_in_transaction(transaction):
             return await self.get(reservation_id)
         return None
 
+    async def _load_estimator(
+        self, transaction, reservation: dict
+    ) -> Optional[ServiceTimeEstimator]:
+        """トランザクション内で予約の店舗の対応時間推定を読み取る"""
+        if not reservation.get("company_id") or not reservation.get("branch_id"):
+            return None
+        snapshot = await self._branch_stats_ref(
+            reservation["company_id"], reservation["branch_id"]
+        ).get(transaction=transaction)
+        return ServiceTimeEstimator.from_snapshot(
+            reservation["company_id"], reservation["branch_id"], snapshot
+        )
+
+    async def transition_batch(
+        self,
+        company_id: str,
+        branch_id: str,
+        new_status: str,
+        reservation_ids: Optional[List[str]] = None,
+        from_status: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        店舗の予約のステータスをまとめて変更
+
+        対象は予約IDの一覧、または当日の from_status の予約を受付番号順に
+        limit 件（省略時は全件）で指定する。読み取りと検証のあと、予約・
+        店舗・日別ドキュメント・対応時間推定の更新を1回のトランザクションで書き込む。
+
+        Args:
+            company_id (str): 企業ID
+            branch_id (str): 店舗ID
+            new_status (str): 変更後のステータス
+            reservation_ids (List[str], optional): 対象の予約ID
+            from_status (str, optional): 対象とする現在のステータス（ルール指定）
+            limit (int, optional): ルール指定時の最大件数
+
+        Returns:
+            List[dict]: 1件ごとの結果（reservation_id, reception_number,
+                previous_status, status, result, message）。result は
+                updated / invalid_transition / rejected / not_found
+
+        Raises:
+            ValueError: 対象がBATCH_TRANSITION_MAX_ITEMS件を超える場合
+        """
+        max_items = settings.BATCH_TRANSITION_MAX_ITEMS
+        too_many = f"一度に変更できる予約は{max_items}件までです"
+        if reservation_ids is not None:
+            # 同じ予約を重複して指定しても1回だけ変更する（指定順は保つ）
+            reservation_ids = list(dict.fromkeys(reservation_ids))
+            if len(reservation_ids) > max_items:
+                raise ValueError(too_many)
+        elif limit and limit > max_items:
+            raise ValueError(too_many)
+
+        changed_at = datetime.now(timezone.utc)
+        today = datetime.now(settings.get_timezone()).date()
+        transaction = self.db.transaction()
+
+        @firestore_async.async_transactional
+        async def transition_in_transaction(transaction):
+            # 対象の予約を読み取る
+            if reservation_ids is not None:
+                refs = [self.collection.document(i) for i in reservation_ids]
+                snapshots = {}
+                async for snapshot in self.db.get_all(refs, transaction=transaction):
+                    snapshots[snapshot.id] = snapshot
+                targets = []
+                for reservation_id in reservation_ids:
+                    snapshot = snapshots.get(reservation_id)
+                    data = snapshot.to_dict() if snapshot and snapshot.exists else None
+                    if (
+                        data is None
+                        or data.get("company_id") != company_id
+                        or data.get("branch_id") != branch_id
+                    ):
+                        targets.append((reservation_id, None))
+                    else:
+                        targets.append((reservation_id, data))
+            else:
+                # 受付番号順の先頭から必要な件数だけを読み取る（読み取りセットを小さく保つ）
+                # limit省略時は上限を1件超えて読み取り、超えた場合はエラーにする
+                start = datetime.combine(today, time.min, settings.get_timezone())
+                query = (
+                    self.collection.where("company_id", "==", company_id)
+                    .where("branch_id", "==", branch_id)
+                    .where("status", "==", from_status)
+                    .where("reservation_at", ">=", start)
+                    .where("reservation_at", "<", start + timedelta(days=1))
+                    .order_by("reception_number")
+                    .limit(limit or max_items + 1)
+                )
+                targets = [
+                    (snapshot.id, snapshot.to_dict())
+                    async for snapshot in query.stream(transaction=transaction)
+                ]
+                if len(targets) > max_items:
+                    raise ValueError(too_many)
+
+            # 店舗・日別ドキュメントと対応時間推定を読み取る（書き込みより前）
+            days = sorted(
+                {
+                    local_date(data["reservation_at"])
+                    for _, data in targets
+                    if data is not None and self._has_branch_day(data)
+                }
+            )
+            branch_days = await self._get_branch_days(
+                transaction, [(company_id, branch_id, day) for day in days]
+            )
+            estimator = None
+            if new_status == ReservationStatus.COMPLETED.value:
+                estimator = await self._load_estimator(
+                    transaction, {"company_id": company_id, "branch_id": branch_id}
+                )
+
+            results = []
+            estimator_changed = False
+            for reservation_id, data in targets:
+                result = {"reservation_id": reservation_id}
+                results.append(result)
+                if data is None:
+                    result.update(result="not_found", message="予約が見つかりません")
+                    continue
+                previous_status = data.get("status")
+                result.update(
+                    reception_number=data.get("reception_number"),
+                    previous_status=previous_status,
+                    status=previous_status,
+                )
+                if not is_allowed_transition(previous_status, new_status):
+                    result.update(
+                        result="invalid_transition",
+                        message=f"{previous_status} から {new_status} には変更できません",
+                    )
+                    continue
+
+                branch_day = None
+                if self._has_branch_day(data):
+                    branch_day = branch_days[
+                        (company_id, branch_id, local_date(data["reservation_at"]))
+                    ]
+                try:
+                    observed = apply_status_change(
+                        data, new_status, changed_at, branch_day, estimator
+                    )
+                except SlotUnavailableError as e:
+                    result.update(result="rejected", message=str(e))
+                    continue
+                estimator_changed = estimator_changed or observed["estimator_changed"]
+                transaction.update(
+                    self.collection.document(reservation_id),
+                    {
+                        "status": new_status,
+                        "updated_at": datetime.utcnow(),
+                        **observed["fields"],
+                    },
+                )
+                result.update(result="updated", status=new_status)
+
+            for branch_day in branch_days.values():
+                self._save_branch_day(transaction, branch_day)
+            if estimator_changed:
+                transaction.set(
+                    self.branch_stats.document(estimator.id), estimator.to_dict()
+                )
+            return results
+
+        return await transition_in_transaction(transaction)
+
     async def delete(self, reservation_id: str) -> bool:
-        """予約を削除"""
+        """予約を削除（時間枠の占有と待ち行列も同じトランザクションで解放）"""
         doc_ref = self.collection.document(reservation_id)
-        if doc_ref.get().exists:
-            doc_ref.delete()
+        transaction = self.db.transaction()
+
+        @firestore_async.async_transactional
+        async def delete_in_transaction(transaction):
+            snapshot = await doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            current = snapshot.to_dict()
+            if self._has_branch_day(current):
+                await self._transition_branch_day(
+                    transaction, current, current.get("status"), None
+                )
+            transaction.delete(doc_ref)
             return True
-        return False
 
-    async def get_available_slots(self, date_input):
+        return await delete_in_transaction(transaction)
+
+    async def _transition_branch_day(
+        self,
+        transaction,
+        reservation: dict,
+        old_status: Optional[str],
+        new_status: Optional[str],
+    ) -> None:
+        """予約のステータス変更を店舗・日別ドキュメントに反映する"""
+        branch_day = await self._load_branch_day(
+            transaction,
+            reservation["company_id"],
+            reservation["branch_id"],
+            local_date(reservation["reservation_at"]),
+        )
+        branch_day.transition(
+            reservation["reservation_at"],
+            reservation.get("reception_number"),
+            old_status,
+            new_status,
+            settings.MAX_CONCURRENT_RESERVATIONS,
+        )
+        self._save_branch_day(transaction, branch_day)
+
+    @staticmethod
+    def _has_branch_day(data: dict) -> bool:
+        """店舗・日別ドキュメントの集計対象となる予約かどうか"""
+        return (
+            bool(data.get("company_id"))
+            and bool(data.get("branch_id"))
+            and isinstance(data.get("reservation_at"), datetime)
+        )
+
+    async def get_available_slots(
+        self, date_input, company_id: str, branch_id: str
+    ) -> List[dict]:
+        """
+        指定店舗・指定日の時間枠ごとの空き状況を取得
+
+        店舗・日別ドキュメントの占有数を1回のポイント読み取りで参照する。
+
+        Args:
+            date_input (str | date): 対象日（"YYYY-MM-DD"またはdate）
+            company_id (str): 企業ID
+            branch_id (str): 店舗ID
+
+        Returns:
+            List[dict]: time, is_reserved（満席）, reserved_count, remaining_capacity
+        """
         if isinstance(date_input, str):
             date_obj = datetime.strptime(date_input, "%Y-%m-%d").date()
         elif isinstance(date_input, date):
@@ -295,48 +833,53 @@ class CRUDReservation:
         else:
             raise ValueError("date_input must be str or datetime.date")
 
-        # 企業コード・店舗コード（必要なら利用）
-        company_id = None
-        branch_id = None
-
-        # 営業時間・枠生成
-        business_start = settings.get_business_hours_start()
-        business_end = settings.get_business_hours_end()
-        slot_minutes = settings.TIME_SLOT_MINUTES
-
-        slots = []
-        current = datetime.combine(date_obj, business_start)
-        end = datetime.combine(date_obj, business_end)
-        while current < end:
-            slots.append(current.strftime("%H:%M"))
-            current += timedelta(minutes=slot_minutes)
-
-        # Firestoreから予約済み枠を取得
-        date_str = date_obj.strftime("%Y-%m-%d")
-        query = self.collection.where("reservation_date", "==", date_str)
-        if company_id is not None:
-            query = query.where("company_id", "==", company_id)
-        if branch_id is not None:
-            query = query.where("branch_id", "==", branch_id)
+        snapshot = await self._branch_day_ref(company_id, branch_id, date_obj).get()
+        branch_day = BranchDay.from_snapshot(company_id, branch_id, date_obj, snapshot)
+        return branch_day.available_slots(settings.MAX_CONCURRENT_RESERVATIONS)
 
-        reservations = query.get()
-        # 時間ごとにuser_idをマッピング
-        reserved_map = {
-            doc.to_dict().get("reservation_time"): doc.to_dict().get("user_id")
-            for doc in reservations
-        }
+    async def get_availability_calendar(
+        self, company_id: str, branch_id: str, start_date: date, end_date: date
+    ) -> AvailabilityCalendar:
+        """
+        指定店舗の期間内の空き状況を取得
 
-        # available_slotsリストを作成
-        available_slots = [
-            {
-                "time": slot,
-                "is_reserved": slot in reserved_map,
-                "user_id": reserved_map.get(slot) if slot in reserved_map else None,
-            }
-            for slot in slots
-        ]
+        期間内の店舗・日別ドキュメントを1回のクエリで取得し、
+        空き数を（日数 × 時間枠数）の行列としてまとめて計算する。
 
-        return available_slots
+        Args:
+            company_id (str): 企業ID
+            branch_id (str): 店舗ID
+            start_date (date): 期間の初日
+            end_date (date): 期間の最終日（含む）
+
+        Returns:
+            AvailabilityCalendar: 日ごと・時間枠ごとの空き数
+        """
+        query = (
+            self.branch_days.where("company_id", "==", company_id)
+            .where("branch_id", "==", branch_id)
+            .where("date", ">=", start_date.isoformat())
+            .where("date", "<=", end_date.isoformat())
+        )
+        branch_days = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            day = date.fromisoformat(data["date"])
+            branch_days.append(BranchDay(company_id, branch_id, day, data))
+
+        capacity = settings.MAX_CONCURRENT_RESERVATIONS
+        days = (end_date - start_date).days + 1
+        free = availability_matrix(start_date, days, branch_days, capacity)
+        return AvailabilityCalendar(
+            company_id=company_id,
+            branch_id=branch_id,
+            start_date=start_date,
+            end_date=end_date,
+            capacity=capacity,
+            slot_times=slot_times(),
+            free=free.tolist(),
+            day_free=free.sum(axis=1).tolist(),
+        )
 
     async def get_daily_summary(
         self, company_id: str, branch_id: str, date: date
@@ -344,39 +887,26 @@ class CRUDReservation:
         """
         指定日の予約状況サマリーを取得
 
+        待ち行列は予約の作成・ステータス変更・削除のたびに店舗・日別ドキュメントへ
+        反映済みのため、来店数によらず店舗・日別ドキュメントと店舗別統計の
+        2件のポイント読み取りで返す。
+
         Args:
             company_id (str): 企業ID
             branch_id (str): 店舗ID
             date (date): 対象日
 
         Returns:
-            dict: 予約状況サマリー
+            dict: 予約状況サマリー（待ち時間の推定を含む）
         """
-        # 当日の予約を取得
-        query = (
-            self.collection.where("company_id", "==", company_id)
-            .where("branch_id", "==", branch_id)
-            .where("reservation_at", ">=", datetime.combine(date, time.min))
-            .where("reservation_at", "<=", datetime.combine(date, time.max))
+        branch_day, estimator = await self._load_queue_state(
+            company_id, branch_id, date
+        )
+        summary = branch_day.summary(settings.MAX_NEXT_APPOINTMENTS_DISPLAY)
+        servers = len(branch_day.calling_numbers)
+        estimated_wait = estimator.estimate_wait_minutes(
+            summary["waiting_count"], servers
         )
-
-        docs = query.stream()
-
-        # 待機中の予約をカウント
-        waiting_count = 0
-        latest_reception_number = 0
-        current_number = None
-
-        for doc in docs:
-            data = doc.to_dict()
-            if data.get("status") == "accepted":
-                waiting_count += 1
-                reception_number = data.get("reception_number", 0)
-                latest_reception_number = max(latest_reception_number, reception_number)
-
-                # 現在の呼び出し番号を取得（statusがconfirmedの最新の予約）
-                if data.get("status") == "confirmed":
-                    current_number = reception_number
 
         return {
             "current_time": datetime.now(),
@@ -386,10 +916,65 @@ class CRUDReservation:
                 "afternoon_start": "14:00",
                 "afternoon_end": "17:00",
             },
-            "current_number": current_number,
-            "latest_reception_number": latest_reception_number,
-            "waiting_count": waiting_count,
+            **summary,
+            "next_wait_minutes": [
+                estimator.estimate_wait_minutes(position, servers)
+                for position in range(len(summary["next_numbers"]))
+            ],
+            "estimated_wait_minutes": estimated_wait,
+            "average_service_minutes": round(estimator.service_minutes(), 1),
+            "is_long_wait": estimated_wait >= settings.LONG_WAIT_TIME_THRESHOLD,
+        }
+
+    async def get_wait_time(self, reservation: dict) -> dict:
+        """
+        予約の待ち時間を推定
+
+        待ち行列内の位置と店舗別の平均対応時間から求めるため、
+        待ち人数によらず2件のポイント読み取りで返す。
+
+        Args:
+            reservation (dict): 予約情報（getの戻り値）
+
+        Returns:
+            dict: reservation_id, reception_number, status,
+                position_in_queue, estimated_wait_minutes
+        """
+        result = {
+            "reservation_id": reservation["id"],
+            "reception_number": reservation.get("reception_number"),
+            "status": reservation.get("status"),
+            "position_in_queue": None,
+            "estimated_wait_minutes": None,
         }
+        if reservation.get(
+            "status"
+        ) != ReservationStatus.ACCEPTED.value or not self._has_branch_day(reservation):
+            return result
+
+        branch_day, estimator = await self._load_queue_state(
+            reservation["company_id"],
+            reservation["branch_id"],
+            local_date(reservation["reservation_at"]),
+        )
+        position = branch_day.queue_position(reservation["reception_number"])
+        if position is not None:
+            result["position_in_queue"] = position
+            result["estimated_wait_minutes"] = estimator.estimate_wait_minutes(
+                position, len(branch_day.calling_numbers)
+            )
+        return result
+
+    async def _load_queue_state(self, company_id: str, branch_id: str, day: date):
+        """店舗・日別ドキュメントと店舗別統計を並行して読み取る"""
+        day_snapshot, stats_snapshot = await asyncio.gather(
+            self._branch_day_ref(company_id, branch_id, day).get(),
+            self._branch_stats_ref(company_id, branch_id).get(),
+        )
+        return (
+            BranchDay.from_snapshot(company_id, branch_id, day, day_snapshot),
+            ServiceTimeEstimator.from_snapshot(company_id, branch_id, stats_snapshot),
+        )
 
 
 # CRUDReservationのインスタンスを作成
@@ -1,21 +1,25 @@
 from typing import Optional
-from firebase_admin import firestore
+from functools import cached_property
 from datetime import datetime
 from ..models.user import UserCreate, UserUpdate, User
-from ..core.firebase import get_firestore
+from ..core.firebase import get_async_firestore
+from ..core.firestore_metrics import instrumented
+from .loader import forget_document, load_document
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@instrumented("user")
 class CRUDUser:
-    def __init__(self):
-        """
-        ユーザーCRUD操作用クラスの初期化
-        Firestoreのクライアントを設定
-        """
-        self.db = get_firestore()
-        self.collection = self.db.collection("users")
+    @cached_property
+    def db(self):
+        """Firestoreのクライアント（初回アクセス時に作成し、インポート時には接続しない）"""
+        return get_async_firestore()
+
+    @cached_property
+    def collection(self):
+        return self.db.collection("users")
 
     async def create(self, user: UserCreate, uid: str) -> dict:
         """
@@ -44,7 +48,8 @@ class CRUDUser:
 
             # Firestoreにユーザーデータを保存
             doc_ref = self.collection.document(uid)
-            doc_ref.set(user_data)
+            await doc_ref.set(user_data)
+            forget_document(doc_ref)
 
             return user_data
         except Exception as e:
@@ -62,17 +67,17 @@ class CRUDUser:
             Optional[dict]: ユーザー情報（存在しない場合はNone）
         """
         try:
-            logger.debug(f"Fetching user with uid: {uid}")
-            doc = self.collection.document(uid).get()
-            if doc.exists:
-                user_data = doc.to_dict()
-                user_data["id"] = doc.id
-                logger.debug(f"Found user data: {user_data}")
+            logger.debug("Fetching user with uid: %s", uid)
+            # リクエスト内ではまとめて取得・メモ化
+            user_data = await load_document(self.collection.document(uid))
+            if user_data is not None:
+                user_data["id"] = uid
+                logger.debug("Found user data: %s", user_data)
                 return user_data
-            logger.debug(f"No user found with uid: {uid}")
+            logger.debug("No user found with uid: %s", uid)
             return None
         except Exception as e:
-            logger.error(f"Error in get_by_uid: {str(e)}")
+            logger.error("Error in get_by_uid: %s", e)
             raise
 
     async def update(self, uid: str, user_update: UserUpdate) -> Optional[dict]:
@@ -89,7 +94,9 @@ class CRUDUser:
         update_data = user_update.dict(exclude_unset=True)
         update_data["updated_at"] = datetime.utcnow()
 
-        self.collection.document(uid).update(update_data)
+        doc_ref = self.collection.document(uid)
+        await doc_ref.update(update_data)
+        forget_document(doc_ref)
         return await self.get_by_uid(uid)
 
 
@@ -0,0 +1,138 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DataLoader:
+    """
+    リクエスト単位のドキュメント読み取りの集約とメモ化
+
+    同じイベントループの周回中に要求されたドキュメントを1回の get_all で
+    まとめて取得し、結果はリクエストが終わるまで保持する。
+    コレクションが異なるドキュメントも同じ get_all にまとめる。
+    """
+
+    def __init__(self, get_db: Callable[[], object]):
+        """
+        Args:
+            get_db (Callable): Firestoreクライアントを返す関数（最初の取得時に呼ぶ）
+        """
+        self._get_db = get_db
+        self._db = None
+        self._cache: Dict[str, asyncio.Future] = {}
+        self._pending: Dict[str, Tuple[object, asyncio.Future]] = {}
+        self._dispatch_task: Optional[asyncio.Task] = None
+        # 計測用（get_allの呼び出し回数と要求されたドキュメント数）
+        self.batch_count = 0
+        self.load_count = 0
+
+    @property
+    def db(self):
+        # クライアントの作成（Firebaseの初期化）はドキュメントを読む時まで行わない
+        if self._db is None:
+            self._db = self._get_db()
+        return self._db
+
+    def load(self, doc_ref) -> asyncio.Future:
+        """
+        ドキュメントの内容を取得する（存在しない場合はNone）
+
+        Args:
+            doc_ref: ドキュメントの参照
+
+        Returns:
+            asyncio.Future: ドキュメントの内容（dict）またはNone
+        """
+        self.load_count += 1
+        future = self._cache.get(doc_ref.path)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[doc_ref.path] = future
+        self._pending[doc_ref.path] = (doc_ref, future)
+        if self._dispatch_task is None:
+            # 同じ周回で実行中の他のタスクの要求を待ってからまとめて取得する
+            self._dispatch_task = loop.create_task(self._dispatch())
+        return future
+
+    def clear(self, doc_ref) -> None:
+        """書き込み後などにメモ化した内容を破棄する"""
+        self._cache.pop(doc_ref.path, None)
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._dispatch_task = None
+        self.batch_count += 1
+        try:
+            found = {}
+            async for snapshot in self.db.get_all(
+                [doc_ref for doc_ref, _ in pending.values()]
+            ):
+                found[snapshot.reference.path] = (
+                    snapshot.to_dict() if snapshot.exists else None
+                )
+        except Exception as e:
+            logger.error("Error loading documents: %s", e)
+            for path, (_, future) in pending.items():
+                if self._cache.get(path) is future:
+                    del self._cache[path]
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for path, (_, future) in pending.items():
+            if not future.done():
+                future.set_result(found.get(path))
+
+
+_current_loader: ContextVar[Optional[DataLoader]] = ContextVar(
+    "data_loader", default=None
+)
+
+
+def get_loader() -> Optional[DataLoader]:
+    """現在のリクエストのDataLoader（リクエスト外ではNone）"""
+    return _current_loader.get()
+
+
+def set_loader(loader: Optional[DataLoader]):
+    """DataLoaderを現在のコンテキストに設定し、復元用のトークンを返す"""
+    return _current_loader.set(loader)
+
+
+def reset_loader(token) -> None:
+    _current_loader.reset(token)
+
+
+async def load_document(doc_ref) -> Optional[dict]:
+    """
+    ドキュメントの内容を取得する
+
+    リクエスト中はDataLoaderを経由してまとめて取得・メモ化し、
+    リクエスト外（スクリプトなど）では直接取得する。
+
+    Args:
+        doc_ref: ドキュメントの参照
+
+    Returns:
+        Optional[dict]: ドキュメントの内容（存在しない場合はNone）
+    """
+    loader = get_loader()
+    if loader is None:
+        snapshot = await doc_ref.get()
+        return snapshot.to_dict() if snapshot.exists else None
+    data = await loader.load(doc_ref)
+    # メモ化した内容を呼び出し側が書き換えても影響しないようにコピーを返す
+    return dict(data) if data is not None else None
+
+
+def forget_document(doc_ref) -> None:
+    """書き込んだドキュメントのメモ化を破棄する（リクエスト外では何もしない）"""
+    loader = get_loader()
+    if loader is not None:
+        loader.clear(doc_ref)
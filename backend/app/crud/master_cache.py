@@ -0,0 +1,178 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from ..core.cache import LRUTTLCache
+from ..core.config import settings
+from ..core.firebase import get_firestore
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MasterDataCache:
+    """
+    企業・店舗などめったに変わらないドキュメントのプロセス内キャッシュ
+
+    存在しないIDも短いTTLでキャッシュし（ネガティブキャッシュ）、未知のIDへの
+    問い合わせが続いてもFirestoreに届かないようにする。ローカルの書き込みと
+    Firestoreのスナップショットリスナーで即時に無効化する。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._clock = clock
+        self._cache = LRUTTLCache(
+            max_size=max_size, ttl_seconds=ttl_seconds, clock=clock
+        )
+        self._lock = threading.Lock()
+        # 無効化のたびに増える世代番号（読み取り中に無効化された結果を格納しないため）
+        self._generation = 0
+        self.invalidations = 0
+        self.negative_hits = 0
+
+    def lookup(self, doc_id: str) -> Tuple[bool, Optional[dict]]:
+        """
+        キャッシュを参照する
+
+        Returns:
+            Tuple[bool, Optional[dict]]: (キャッシュにあったか, 内容（存在しないIDはNone）)
+        """
+        entry = self._cache.get(doc_id)
+        if entry is None:
+            return False, None
+        data, _ = entry
+        if data is None:
+            self.negative_hits += 1
+            return True, None
+        return True, dict(data)
+
+    def generation(self) -> int:
+        """読み取り開始前に取得し、store に渡す世代番号"""
+        return self._generation
+
+    def store(self, doc_id: str, data: Optional[dict], generation: int) -> None:
+        """
+        Firestoreから読み取った内容を格納する（存在しない場合はNone）
+
+        読み取り中に無効化が発生していた場合は、古い内容の可能性があるため格納しない。
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            ttl = self.negative_ttl_seconds if data is None else None
+            self._cache.set(
+                doc_id, (dict(data) if data else None, self._clock()), ttl_seconds=ttl
+            )
+
+    def invalidate(self, doc_id: str) -> None:
+        """1件を無効化する（書き込み時・リスナーの変更通知時）"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._cache.delete(doc_id)
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            dict: size, hit_ratio などLRUTTLCacheの統計に加え、
+                negative_entries（存在しないIDの件数）, negative_hits, invalidations,
+                max_staleness_seconds（最も古く取得したエントリの経過秒数）
+        """
+        now = self._clock()
+        entries = self._cache.values()
+        stats = self._cache.stats()
+        stats.update(
+            {
+                "name": self.name,
+                "negative_entries": sum(1 for data, _ in entries if data is None),
+                "negative_hits": self.negative_hits,
+                "invalidations": self.invalidations,
+                "max_staleness_seconds": max(
+                    (now - fetched_at for _, fetched_at in entries), default=0.0
+                ),
+            }
+        )
+        return stats
+
+
+class MasterDataListener:
+    """
+    コレクションの変更をFirestoreのスナップショットリスナーで受け取り、キャッシュを無効化する
+
+    リスナー開始時の初回スナップショット（全件）は無視し、以降の変更分のみ反映する。
+    """
+
+    def __init__(self, caches: Dict[str, MasterDataCache]):
+        self.caches = caches
+        self._watches: List = []
+
+    def start(self) -> None:
+        if self._watches:
+            return
+        db = get_firestore()
+        for collection_name, cache in self.caches.items():
+            try:
+                watch = db.collection(collection_name).on_snapshot(
+                    self.on_snapshot_callback(cache)
+                )
+            except Exception as e:
+                # リスナーが使えない場合もTTLで鮮度は保たれる
+                logger.error("Failed to start listener for %s: %s", collection_name, e)
+                continue
+            self._watches.append(watch)
+            logger.info("Master data listener started: %s", collection_name)
+
+    @staticmethod
+    def on_snapshot_callback(cache: MasterDataCache):
+        initial = [True]
+
+        def on_snapshot(snapshots, changes, read_time):
+            if initial[0]:
+                initial[0] = False
+                return
+            for change in changes:
+                cache.invalidate(change.document.id)
+
+        return on_snapshot
+
+    def stop(self) -> None:
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+
+    @property
+    def active(self) -> bool:
+        return bool(self._watches)
+
+
+company_cache = MasterDataCache(
+    "companies",
+    max_size=settings.MASTER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.MASTER_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=settings.MASTER_CACHE_NEGATIVE_TTL_SECONDS,
+)
+branch_cache = MasterDataCache(
+    "branches",
+    max_size=settings.MASTER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.MASTER_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=settings.MASTER_CACHE_NEGATIVE_TTL_SECONDS,
+)
+master_data_listener = MasterDataListener(
+    {"companies": company_cache, "branches": branch_cache}
+)
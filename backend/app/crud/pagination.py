@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+# 次ページのカーソルを返すレスポンスヘッダー
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """カーソル文字列が不正な場合の例外"""
+
+    pass
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"t": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "t" in value:
+        return datetime.fromisoformat(value["t"])
+    return value
+
+
+def encode_cursor(order_value: Any, doc_id: str) -> str:
+    """
+    ページングカーソルを生成
+
+    Args:
+        order_value: 最終ドキュメントの並び順フィールドの値（IDのみで並べる場合はNone）
+        doc_id (str): 最終ドキュメントのID
+
+    Returns:
+        str: URLセーフな不透明カーソル文字列
+    """
+    payload = json.dumps([_encode_value(order_value), doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """
+    ページングカーソルを復元
+
+    Args:
+        cursor (str): encode_cursorで生成したカーソル
+
+    Returns:
+        Tuple[Any, str]: 並び順フィールドの値とドキュメントID
+
+    Raises:
+        InvalidCursorError: カーソルが不正な場合
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        order_value, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(doc_id, str) or not doc_id:
+            raise ValueError(doc_id)
+        return _decode_value(order_value), doc_id
+    except Exception:
+        raise InvalidCursorError("カーソルが不正です")
+
+
+def next_cursor(
+    items: Sequence[Any], limit: int, order_field: Optional[str] = None
+) -> Optional[str]:
+    """
+    取得結果から次ページのカーソルを生成
+
+    Args:
+        items (Sequence): 取得結果（dictまたはモデル）
+        limit (int): 取得件数の上限
+        order_field (str, optional): 並び順フィールド名（IDのみで並べる場合はNone）
+
+    Returns:
+        Optional[str]: 次ページのカーソル（最終ページの場合はNone）
+    """
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    if isinstance(last, dict):
+        order_value = last.get(order_field) if order_field else None
+        return encode_cursor(order_value, last["id"])
+    order_value = getattr(last, order_field) if order_field else None
+    return encode_cursor(order_value, last.id)
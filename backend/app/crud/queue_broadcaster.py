@@ -0,0 +1,217 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.firebase import get_firestore
+from .branch_day import BRANCH_DAYS_COLLECTION, BranchDay, branch_day_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+# watch(ドキュメントID, 変更時コールバック) -> 監視解除関数
+WatchFunction = Callable[[str, Callable[[Optional[dict]], None]], Callable[[], None]]
+
+
+def firestore_watch(
+    doc_id: str, on_change: Callable[[Optional[dict]], None]
+) -> Callable[[], None]:
+    """
+    店舗・日別ドキュメントをFirestoreのon_snapshotで監視する
+
+    コールバックはFirestore SDKのバックグラウンドスレッドから呼ばれる。
+
+    Args:
+        doc_id (str): 店舗・日別ドキュメントのID
+        on_change (Callable): ドキュメントの内容（存在しない場合はNone）を受け取る関数
+
+    Returns:
+        Callable[[], None]: 監視を解除する関数
+    """
+    doc_ref = get_firestore().collection(BRANCH_DAYS_COLLECTION).document(doc_id)
+
+    def callback(snapshots, changes, read_time):
+        if not snapshots:
+            on_change(None)
+        for snapshot in snapshots:
+            on_change(snapshot.to_dict() if snapshot.exists else None)
+
+    watch = doc_ref.on_snapshot(callback)
+    return watch.unsubscribe
+
+
+def queue_changes(previous: Optional[dict], current: dict) -> List[dict]:
+    """
+    2つの待ち状況サマリーの差分からイベントの一覧を求める
+
+    Returns:
+        List[dict]: {"type": "reception" | "calling", "number": 受付番号}
+            または {"type": "completed", "count": 対応完了数}
+    """
+    if previous is None:
+        return []
+    changes = []
+    previous_latest = previous["latest_reception_number"] or 0
+    for number in range(previous_latest + 1, current["latest_reception_number"] + 1):
+        changes.append({"type": "reception", "number": number})
+    previous_calling = set(previous["calling_numbers"])
+    for number in current["calling_numbers"]:
+        if number not in previous_calling:
+            changes.append({"type": "calling", "number": number})
+    if current["completed_count"] > previous["completed_count"]:
+        changes.append({"type": "completed", "count": current["completed_count"]})
+    return changes
+
+
+class Subscription:
+    """
+    1購読者分のイベントキュー
+
+    キューが上限に達した場合は古いイベントから破棄する。各イベントは
+    その時点のサマリー全体を含むため、遅い購読者も最新の状態には追いつける。
+    """
+
+    def __init__(self, max_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+
+    def put(self, event: dict) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """次のイベントを待つ（timeout秒以内に届かなければNone）"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class _Channel:
+    """1店舗・1日分のリスナーと購読者"""
+
+    def __init__(self, company_id: str, branch_id: str, day: date):
+        self.company_id = company_id
+        self.branch_id = branch_id
+        self.day = day
+        self.subscribers: List[Subscription] = []
+        self.unsubscribe: Optional[Callable[[], None]] = None
+        self.last_summary: Optional[dict] = None
+        self.idle_handle: Optional[asyncio.TimerHandle] = None
+
+
+class QueueBroadcaster:
+    """
+    待ち状況の変更を購読者に配信する
+
+    店舗・日ごとに監視は1つだけ行い、変更をプロセス内の購読者全員に配る。
+    購読者がいなくなったチャネルは idle_seconds 経過後に監視を解除する。
+    """
+
+    def __init__(
+        self,
+        watch: WatchFunction,
+        idle_seconds: float,
+        buffer_size: int,
+        next_count: int,
+    ):
+        self.watch = watch
+        self.idle_seconds = idle_seconds
+        self.buffer_size = buffer_size
+        self.next_count = next_count
+        self._channels: Dict[str, _Channel] = {}
+
+    @asynccontextmanager
+    async def subscribe(self, company_id: str, branch_id: str, day: date):
+        """
+        店舗・日別の待ち状況を購読する
+
+        最新のサマリーが分かっている場合は、購読開始直後に1件目として届く。
+
+        Yields:
+            Subscription: イベント（{"summary": dict, "changes": List[dict]}）のキュー
+        """
+        key = branch_day_id(company_id, branch_id, day)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = _Channel(company_id, branch_id, day)
+            self._channels[key] = channel
+            self._start(key, channel)
+        if channel.idle_handle is not None:
+            channel.idle_handle.cancel()
+            channel.idle_handle = None
+
+        subscription = Subscription(self.buffer_size)
+        if channel.last_summary is not None:
+            subscription.put({"summary": channel.last_summary, "changes": []})
+        channel.subscribers.append(subscription)
+        try:
+            yield subscription
+        finally:
+            channel.subscribers.remove(subscription)
+            if subscription.dropped:
+                logger.info(
+                    "Queue stream subscriber for %s dropped %s events",
+                    key,
+                    subscription.dropped,
+                )
+            if not channel.subscribers and self._channels.get(key) is channel:
+                channel.idle_handle = asyncio.get_running_loop().call_later(
+                    self.idle_seconds, self._close, key
+                )
+
+    def _start(self, key: str, channel: _Channel) -> None:
+        loop = asyncio.get_running_loop()
+
+        def on_change(data: Optional[dict]) -> None:
+            # 監視コールバックは別スレッドから呼ばれるため、イベントループに渡す
+            loop.call_soon_threadsafe(self._publish, key, channel, data)
+
+        channel.unsubscribe = self.watch(key, on_change)
+        logger.info("Queue listener started: %s", key)
+
+    def _publish(self, key: str, channel: _Channel, data: Optional[dict]) -> None:
+        if self._channels.get(key) is not channel:
+            return
+        branch_day = BranchDay(channel.company_id, channel.branch_id, channel.day, data)
+        summary = branch_day.summary(self.next_count)
+        if summary == channel.last_summary:
+            return
+        event = {
+            "summary": summary,
+            "changes": queue_changes(channel.last_summary, summary),
+        }
+        channel.last_summary = summary
+        for subscription in channel.subscribers:
+            subscription.put(event)
+
+    def _close(self, key: str) -> None:
+        channel = self._channels.get(key)
+        if channel is None or channel.subscribers:
+            return
+        del self._channels[key]
+        if channel.unsubscribe is not None:
+            channel.unsubscribe()
+        logger.info("Queue listener stopped: %s", key)
+
+    def close_all(self) -> None:
+        """全チャネルの監視を解除する（シャットダウン時）"""
+        for key, channel in list(self._channels.items()):
+            if channel.idle_handle is not None:
+                channel.idle_handle.cancel()
+            channel.subscribers.clear()
+            self._close(key)
+
+    def channel_keys(self) -> Tuple[str, ...]:
+        """監視中のチャネル（店舗・日別ドキュメントID）の一覧"""
+        return tuple(self._channels)
+
+
+queue_broadcaster = QueueBroadcaster(
+    firestore_watch,
+    idle_seconds=settings.QUEUE_STREAM_IDLE_SECONDS,
+    buffer_size=settings.QUEUE_STREAM_BUFFER_SIZE,
+    next_count=settings.MAX_NEXT_APPOINTMENTS_DISPLAY,
+)
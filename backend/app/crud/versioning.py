@@ -0,0 +1,37 @@
+from datetime import datetime
+from firebase_admin import firestore_async
+
+# コレクションごとの更新番号を保持するコレクション
+COLLECTION_VERSIONS = "collection_versions"
+
+
+def bump_collection_version(batch, db, collection_name: str) -> None:
+    """
+    コレクションの更新番号を1つ進める書き込みをバッチに追加する
+
+    ドキュメントの作成・更新・削除と同じバッチでコミットすることで、
+    一覧のETagが書き込みと同時に変わる。
+
+    Args:
+        batch: 書き込みバッチ
+        db: Firestoreクライアント
+        collection_name (str): 対象のコレクション名
+    """
+    batch.set(
+        db.collection(COLLECTION_VERSIONS).document(collection_name),
+        {"version": firestore_async.Increment(1), "updated_at": datetime.utcnow()},
+        merge=True,
+    )
+
+
+async def get_collection_version(db, collection_name: str) -> int:
+    """
+    コレクションの更新番号を取得する（1回のポイント読み取り）
+
+    Returns:
+        int: 更新番号（一度も書き込みがない場合は0）
+    """
+    snapshot = await db.collection(COLLECTION_VERSIONS).document(collection_name).get()
+    if not snapshot.exists:
+        return 0
+    return snapshot.to_dict().get("version", 0)
@@ -1,21 +1,68 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings, configure_warnings
-from .core.firebase import initialize_firebase
+from .core.firebase import warm_up_firestore
+from .core.logging import setup_logging
+from .core.metrics import CONTENT_TYPE_LATEST, registry
+from .core.rate_limit import rate_limit
+from .core.readiness import Readiness
+from .core.security import token_verifier
+from .crud.pagination import NEXT_CURSOR_HEADER
+from .crud.queue_broadcaster import queue_broadcaster
+from .crud.master_cache import branch_cache, company_cache, master_data_listener
+from .middleware.admission import AdmissionControlMiddleware, admission_controller
+from .middleware.data_loader import DataLoaderMiddleware
+from .middleware.metrics import MetricsMiddleware
+from .middleware.request_cost import RequestCostMiddleware
 from .api.v1.endpoints import auth, users, reservations, companies, branches
-import logging
 
-# アプリケーション起動時に一度だけFirebaseを初期化
-initialize_firebase()
 
-
-# ロギング設定
-def setup_logging():
-    logging_level = logging.DEBUG if settings.DEBUG else logging.INFO
-    logging.basicConfig(
-        level=logging_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+async def wait_token_verification_keys() -> None:
+    # 公開鍵の取得はバックグラウンドスレッドで行い、初回の取得完了を待つ
+    token_verifier.key_store.start()
+    loaded = await asyncio.to_thread(
+        token_verifier.key_store.wait_loaded, settings.PUBLIC_KEYS_WAIT_TIMEOUT_SECONDS
     )
+    if not loaded:
+        raise RuntimeError("token verification keys are not loaded")
+
+
+async def start_master_data_listener() -> None:
+    # 企業・店舗の変更をキャッシュへ即時反映するリスナーを開始
+    await asyncio.to_thread(master_data_listener.start)
+
+
+def warm_up_steps() -> list:
+    """起動後にバックグラウンドで行う準備（完了するまで/readyは503）"""
+    steps = [("firestore", warm_up_firestore)]
+    # 本番環境ではIDトークン検証用の公開鍵を取得し、以降は定期更新する
+    if settings.ENVIRONMENT != "development":
+        steps.append(("token_keys", wait_token_verification_keys))
+    if settings.MASTER_CACHE_LISTENER_ENABLED:
+        steps.append(("master_data_listener", start_master_data_listener))
+    return steps
+
+
+readiness = Readiness(warm_up_steps())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    起動・終了処理
+
+    起動時はFirestoreへの接続などを待たずにすぐ受け付けを始め、準備は
+    バックグラウンドで行う（クライアントは最初に使われた時点でも作成される）。
+    """
+    readiness.start()
+    yield
+    await readiness.stop()
+    token_verifier.key_store.stop()
+    master_data_listener.stop()
+    # 待ち状況のリアルタイム配信で使用しているFirestoreの監視を解除
+    queue_broadcaster.close_all()
 
 
 def create_app() -> FastAPI:
@@ -31,26 +78,53 @@ def create_app() -> FastAPI:
         docs_url=f"{settings.API_V1_STR}/docs",
         redoc_url=f"{settings.API_V1_STR}/redoc",
         debug=settings.DEBUG,
+        lifespan=lifespan,
     )
 
+    # 混雑時の同時処理数の制御（503にもCORSヘッダーが付くようCORSより内側に置く）
+    app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],  # 必要に応じて制限
         allow_credentials=True,
         allow_methods=["*"],  # ここが重要
         allow_headers=["*"],  # ここが重要
+        # ページングカーソル・条件付きGET用のETag・処理時間の内訳を参照可能にする
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Server-Timing"],
     )
+    # リクエスト内の企業・店舗・ユーザーの読み取りをまとめる
+    app.add_middleware(DataLoaderMiddleware)
+    # リクエストごとのFirestoreの読み取り・書き込み数（DataLoaderの読み取りも含める）
+    app.add_middleware(RequestCostMiddleware)
+    # リクエストの件数・レイテンシの記録（待ち時間や503も含めるため最も外側に置く）
+    app.add_middleware(MetricsMiddleware)
 
     # APIルーターの設定
-    app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
+    # 予約APIはルートごとにレート制限の種別を指定している
+    other_limit = [Depends(rate_limit("other"))]
     app.include_router(
-        companies.router, prefix=f"{settings.API_V1_STR}/companies", tags=["companies"]
+        auth.router,
+        prefix=f"{settings.API_V1_STR}/auth",
+        tags=["auth"],
+        dependencies=[Depends(rate_limit("auth"))],
     )
     app.include_router(
-        branches.router, prefix=f"{settings.API_V1_STR}/branches", tags=["branches"]
+        companies.router,
+        prefix=f"{settings.API_V1_STR}/companies",
+        tags=["companies"],
+        dependencies=other_limit,
     )
     app.include_router(
-        users.router, prefix=f"{settings.API_V1_STR}/users", tags=["users"]
+        branches.router,
+        prefix=f"{settings.API_V1_STR}/branches",
+        tags=["branches"],
+        dependencies=other_limit,
+    )
+    app.include_router(
+        users.router,
+        prefix=f"{settings.API_V1_STR}/users",
+        tags=["users"],
+        dependencies=other_limit,
     )
     app.include_router(
         reservations.router,
@@ -70,6 +144,39 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def readiness_check(response: Response):
+    """
+    準備状態の確認（Firestoreへの接続・公開鍵の取得などが完了するまで503）
+
+    /healthはプロセスの生存確認、/readyはトラフィックを流してよいかの確認に使う。
+    """
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return readiness.status()
+
+
+@app.get("/health/cache")
+def cache_stats():
+    """企業・店舗マスタのキャッシュの件数・ヒット率・鮮度"""
+    return {
+        "listener_active": master_data_listener.active,
+        "caches": [company_cache.stats(), branch_cache.stats()],
+    }
+
+
+@app.get("/health/admission")
+def admission_stats():
+    """ルート種別ごとの同時処理数・待ち行列の長さ・拒否件数"""
+    return {"gates": admission_controller.stats()}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus形式のメトリクス"""
+    return Response(registry.render(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,292 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+from urllib.parse import parse_qs
+from starlette.responses import JSONResponse
+from ..core.config import settings
+from ..core.metrics import registry
+from ..core.security import cached_token_claims
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionGate:
+    """
+    1つのルート種別の同時実行数の上限と企業（テナント）ごとの待ち行列
+
+    上限に達している間のリクエストは企業ごとの待ち行列に入り、空きが出る
+    たびに待っている企業を順番に1件ずつ通す（大きな企業の大量のリクエストが
+    小さな企業のリクエストを待たせ続けないようにする）。
+
+    待ち時間が目標を超えたリクエストは503で打ち切り、その後は待ち行列が
+    空になるか目標内で通せるようになるまで、新しいリクエストを待たせずに
+    拒否する（過負荷時に待ち時間だけが伸び続けるのを防ぐ）。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        target_seconds: float,
+        max_queue: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.limit = limit
+        self.target_seconds = target_seconds
+        self.max_queue = max_queue
+        self._clock = clock
+        self.in_flight = 0
+        self.queue_depth = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._overloaded = False
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {"queue_full": 0, "timeout": 0, "overload": 0}
+
+    async def acquire(self, tenant: str) -> Optional[str]:
+        """
+        実行枠を確保する
+
+        Args:
+            tenant (str): 企業IDなど公平に扱う単位
+
+        Returns:
+            Optional[str]: 確保できた場合None、拒否した場合はその理由
+        """
+        if self.in_flight < self.limit and not self._queues:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if self.queue_depth >= self.max_queue:
+            return self._reject("queue_full")
+        if self._overloaded:
+            return self._reject("overload")
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(tenant, deque())
+        queue.append(future)
+        self.queue_depth += 1
+        self.queued += 1
+        enqueued_at = self._clock()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.target_seconds)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._dequeue(tenant, future)
+                self._overloaded = True
+                return self._reject("timeout")
+        except asyncio.CancelledError:
+            if future.done():
+                # 枠を譲り受けた直後に切断された場合は次の待ちへ渡す
+                self.release()
+            else:
+                self._dequeue(tenant, future)
+            raise
+
+        self._overloaded = self._clock() - enqueued_at > self.target_seconds
+        self.admitted += 1
+        return None
+
+    def release(self) -> None:
+        """実行枠を返し、待っている企業があれば順番に次の1件へ渡す"""
+        while self._queues:
+            tenant, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            self.queue_depth -= 1
+            if queue:
+                self._queues.move_to_end(tenant)
+            else:
+                del self._queues[tenant]
+            if not future.done():
+                # 実行数は変えずに枠をそのまま渡す
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+        self._overloaded = False
+
+    def _dequeue(self, tenant: str, future: asyncio.Future) -> None:
+        queue = self._queues.get(tenant)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self.queue_depth -= 1
+        if not queue:
+            del self._queues[tenant]
+        if not self._queues:
+            self._overloaded = False
+
+    def _reject(self, reason: str) -> str:
+        self.rejected[reason] += 1
+        return reason
+
+    def stats(self) -> dict:
+        """同時実行数・待ち行列の長さ・拒否件数"""
+        return {
+            "route_class": self.name,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "waiting_tenants": len(self._queues),
+            "overloaded": self._overloaded,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+        }
+
+
+def admission_route_class(method: str, path: str) -> Optional[str]:
+    """
+    リクエストのルート種別（同時実行数を制御しない場合はNone）
+
+    ヘルスチェックなどAPI以外のパスと、接続を保持し続けるストリーム配信は
+    対象外にする。
+    """
+    if not path.startswith(settings.API_V1_STR):
+        return None
+    if path.endswith("/stream"):
+        return None
+    reservations = f"{settings.API_V1_STR}/reservations"
+    if path.startswith(f"{reservations}/availability"):
+        return "availability"
+    if path.startswith(reservations) and method != "GET":
+        return "reservation_write"
+    return "other"
+
+
+# パスに企業IDを含むルート（/companies/{company_id}, /reservations/{company_id}/{branch_id}/...）
+_COMPANY_PATH = re.compile(
+    rf"^{re.escape(settings.API_V1_STR)}/(?:companies/(?P<company>[^/]+)"
+    rf"|reservations/(?P<reservation_company>[^/]+)/[^/]+/[^/]+)"
+)
+
+
+def admission_tenant(scope) -> str:
+    """
+    公平に扱う単位（企業ID、分からない場合はユーザーID・接続元IPアドレス）
+
+    企業IDは検証済みのIDトークン（token_cacheにあるもの）の company_id クレーム、
+    クエリパラメータのcompany_id、パスに含まれる企業IDの順に求める。
+    リクエストボディに企業IDがある書き込み（POST /reservations/ など）も、
+    ロードバランサー経由で接続元IPアドレスが同じでも企業ごとに分けられる。
+    """
+    authorization = next(
+        (
+            value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+            if name == b"authorization"
+        ),
+        None,
+    )
+    claims = cached_token_claims(authorization)
+    if claims and claims.get("company_id"):
+        return f"company:{claims['company_id']}"
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get("company_id"):
+        return f"company:{query['company_id'][0]}"
+    match = _COMPANY_PATH.match(scope["path"])
+    if match:
+        company_id = match.group("company") or match.group("reservation_company")
+        return f"company:{company_id}"
+    if claims:
+        return f"user:{claims['uid']}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class AdmissionController:
+    """ルート種別ごとのAdmissionGateの集まり"""
+
+    def __init__(self, limits: Dict[str, int], target_seconds: float, max_queue: int):
+        self.gates = {
+            name: AdmissionGate(name, limit, target_seconds, max_queue)
+            for name, limit in limits.items()
+        }
+
+    def gate_for(self, route_class: Optional[str]) -> Optional[AdmissionGate]:
+        if route_class is None:
+            return None
+        return self.gates.get(route_class) or self.gates.get("other")
+
+    def stats(self) -> list:
+        return [gate.stats() for gate in self.gates.values()]
+
+
+admission_controller = AdmissionController(
+    settings.ADMISSION_CONCURRENCY_LIMITS,
+    target_seconds=settings.ADMISSION_QUEUE_TARGET_MS / 1000,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+)
+
+registry.callback(
+    "admission_in_flight",
+    "Requests being processed by route class",
+    "gauge",
+    ("route_class",),
+    lambda: {(g.name,): g.in_flight for g in admission_controller.gates.values()},
+)
+registry.callback(
+    "admission_queue_depth",
+    "Requests waiting for admission by route class",
+    "gauge",
+    ("route_class",),
+    lambda: {(g.name,): g.queue_depth for g in admission_controller.gates.values()},
+)
+registry.callback(
+    "admission_rejected_total",
+    "Requests rejected by admission control by route class and reason",
+    "counter",
+    ("route_class", "reason"),
+    lambda: {
+        (g.name, reason): count
+        for g in admission_controller.gates.values()
+        for reason, count in g.rejected.items()
+    },
+)
+
+
+class AdmissionControlMiddleware:
+    """
+    ルート種別ごとに同時に処理するリクエスト数を制限するASGIミドルウェア
+
+    混雑時は上限を超えたリクエストを企業ごとに公平に待たせ、待ち時間が
+    目標を超える場合は503（Retry-After付き）ですぐに返す。
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_CONTROL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.controller.gate_for(
+            admission_route_class(scope["method"], scope["path"])
+        )
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejected = await gate.acquire(admission_tenant(scope))
+        if rejected:
+            logger.warning(
+                "Request rejected by admission control: %s %s", gate.name, rejected
+            )
+            response = JSONResponse(
+                status_code=503,
+                content={
+                    "detail": "現在混み合っています。しばらくしてから再度お試しください。"
+                },
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
@@ -0,0 +1,25 @@
+from ..core.firebase import get_async_firestore
+from ..crud.loader import DataLoader, reset_loader, set_loader
+
+
+class DataLoaderMiddleware:
+    """
+    HTTPリクエストごとにDataLoaderを用意するASGIミドルウェア
+
+    CRUD層の企業・店舗・ユーザーの読み取りは、同じリクエスト内で
+    まとめて取得・メモ化される。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = set_loader(DataLoader(get_async_firestore))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_loader(token)
@@ -0,0 +1,40 @@
+import time
+from ..core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+
+class MetricsMiddleware:
+    """
+    HTTPリクエストの件数とレイテンシを記録するASGIミドルウェア
+
+    ラベルにはURLそのものではなくルートのテンプレート（例:
+    /api/v1/reservations/{reservation_id}）を使い、系列の数が増え続けないようにする。
+    どのルートにも一致しなかったリクエストは "unmatched" にまとめる。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, template).observe(
+                time.perf_counter() - started_at
+            )
+            HTTP_REQUESTS.labels(method, template, status_code).inc()
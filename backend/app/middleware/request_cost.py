@@ -0,0 +1,116 @@
+import time
+from ..core.config import settings
+from ..core.firestore_metrics import end_request_cost, start_request_cost
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def server_timing(cost: dict, elapsed_seconds: float) -> str:
+    """
+    Server-Timingヘッダーの値を生成
+
+    例: firestore;dur=12.3;desc="rpcs=2 reads=15 writes=0", app;dur=40.1
+    """
+    desc = f"rpcs={cost['rpcs']} reads={cost['reads']} writes={cost['writes']}"
+    return (
+        f'firestore;dur={cost["rpc_ms"]};desc="{desc}", '
+        f"app;dur={round(elapsed_seconds * 1000, 1)}"
+    )
+
+
+class _KeyValues:
+    """ログのメッセージを組み立てる時（出力する場合）だけ "key=value ..." にする"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: dict):
+        self.values = values
+
+    def __str__(self) -> str:
+        return " ".join(f"{key}={value}" for key, value in self.values.items())
+
+
+class RequestCostMiddleware:
+    """
+    リクエストごとのFirestoreのRPC数・読み取り/書き込み数・RPC時間を集計する
+    ASGIミドルウェア
+
+    集計はレスポンスのServer-Timingヘッダーとリクエスト終了時のログに出力する。
+    REQUEST_COST_CHECKS_ENABLEDの場合は、読み取り数がREQUEST_READ_BUDGETを超えた
+    リクエストと、同じドキュメントを個別に繰り返し読み取ったリクエストを警告する。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.REQUEST_COST_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        cost, token = start_request_cost()
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # ストリーミングのレスポンスではヘッダー送信時点までの集計になる
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        server_timing(
+                            cost.to_dict(), time.perf_counter() - started_at
+                        ).encode("latin-1"),
+                    )
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request_cost(token)
+            self._report(scope, status_code, cost, time.perf_counter() - started_at)
+
+    @staticmethod
+    def _report(scope, status_code: int, cost, elapsed_seconds: float) -> None:
+        route = getattr(scope.get("route"), "path", None) or scope["path"]
+        summary = cost.to_dict()
+        summary.update(
+            {
+                "method": scope["method"],
+                "route": route,
+                "status": status_code,
+                "duration_ms": round(elapsed_seconds * 1000, 1),
+            }
+        )
+        logger.info(
+            "Request cost: %s", _KeyValues(summary), extra={"request_cost": summary}
+        )
+
+        if not settings.REQUEST_COST_CHECKS_ENABLED:
+            return
+        if cost.reads > settings.REQUEST_READ_BUDGET:
+            logger.warning(
+                "Read budget exceeded: %s %s read %s documents (budget %s)",
+                scope["method"],
+                route,
+                cost.reads,
+                settings.REQUEST_READ_BUDGET,
+            )
+        repeated = cost.repeated_reads()
+        if repeated:
+            documents = ", ".join(
+                f"{name.rsplit('/documents/', 1)[-1]} x{count}"
+                for name, count in sorted(repeated.items())
+            )
+            logger.warning(
+                "Repeated point reads (possible N+1): %s %s: %s",
+                scope["method"],
+                route,
+                documents,
+            )
@@ -1,8 +1,9 @@
 from datetime import date, time, datetime, timedelta, timezone
-from typing import Optional
+from typing import List, Literal, Optional
 from enum import Enum
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing_extensions import Annotated
+from ..core.config import settings
 
 
 class ReservationStatus(str, Enum):
@@ -15,6 +16,46 @@ class ReservationStatus(str, Enum):
     COMPLETED = "completed"
 
 
+# 許可するステータス遷移（変更前 -> 変更後の集合）
+ALLOWED_STATUS_TRANSITIONS = {
+    ReservationStatus.ACCEPTED: {
+        ReservationStatus.CALLING,
+        ReservationStatus.CANCELLED,
+    },
+    ReservationStatus.CALLING: {
+        ReservationStatus.ACCEPTED,  # 不在のため待ちに戻す
+        ReservationStatus.CONFIRMED,
+        ReservationStatus.COMPLETED,
+        ReservationStatus.CANCELLED,
+    },
+    ReservationStatus.CONFIRMED: {
+        ReservationStatus.COMPLETED,
+        ReservationStatus.CANCELLED,
+    },
+    ReservationStatus.CANCELLED: {ReservationStatus.ACCEPTED},
+    ReservationStatus.COMPLETED: set(),
+}
+
+
+def is_allowed_transition(current: Optional[str], new: str) -> bool:
+    """
+    ステータス遷移が許可されているかを判定
+
+    Args:
+        current (str, optional): 変更前のステータス
+        new (str): 変更後のステータス
+
+    Returns:
+        bool: 許可されている場合True
+    """
+    try:
+        current_status = ReservationStatus(current)
+        new_status = ReservationStatus(new)
+    except ValueError:
+        return False
+    return new_status in ALLOWED_STATUS_TRANSITIONS[current_status]
+
+
 class ReservationBase(BaseModel):
     """予約基本情報（リクエスト用の基本フィールド）"""
 
@@ -34,9 +75,14 @@ class ReservationBase(BaseModel):
             v = v.replace(tzinfo=timezone.utc)
         current_time = datetime.now(timezone.utc)
 
-        # 営業時間のチェック
-        if v.hour < 10 or v.hour >= 22:
-            raise ValueError("予約時間は10:00から22:00の間で指定してください")
+        # 営業時間のチェック（時間枠と同じく業務タイムゾーンの時刻で判定する）
+        start = settings.get_business_hours_start()
+        end = settings.get_business_hours_end()
+        local_time = v.astimezone(settings.get_timezone()).time()
+        if not start <= local_time < end:
+            raise ValueError(
+                f"予約時間は{start:%H:%M}から{end:%H:%M}の間で指定してください"
+            )
 
         return v
 
@@ -47,6 +93,33 @@ class ReservationCreate(ReservationBase):
     pass
 
 
+class ReservationBulkCreate(BaseModel):
+    """予約一括作成モデル（リクエスト用）"""
+
+    reservations: List[ReservationCreate] = Field(
+        ..., min_length=1, description="作成する予約の一覧"
+    )
+
+
+class ReservationBulkItemResult(BaseModel):
+    """一括作成の1件ごとの結果"""
+
+    index: int = Field(..., description="リクエスト内の位置")
+    status: Literal["created", "rejected", "failed"]
+    reservation_id: Optional[str] = None
+    reception_number: Optional[int] = None
+    message: Optional[str] = None
+
+
+class ReservationBulkResult(BaseModel):
+    """一括作成の結果（レスポンス用）"""
+
+    created: int = 0
+    rejected: int = 0  # 時間枠が満席のため受け付けなかった件数
+    failed: int = 0  # 書き込みに失敗した件数
+    results: List[ReservationBulkItemResult]
+
+
 class ReservationUpdate(BaseModel):
     """予約更新モデル"""
 
@@ -94,6 +167,73 @@ class TimeSlot(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class AvailabilityCalendar(BaseModel):
+    """期間指定の空き状況（free[i][j] は start_date + i 日目の slot_times[j] の空き数）"""
+
+    company_id: str = Field(..., description="会社ID")
+    branch_id: str = Field(..., description="店舗ID")
+    start_date: date = Field(..., description="期間の初日")
+    end_date: date = Field(..., description="期間の最終日")
+    capacity: int = Field(..., description="1枠あたりの定員")
+    slot_times: List[str] = Field(..., description="時間枠の開始時刻（HH:MM）")
+    free: List[List[int]] = Field(..., description="日ごと・時間枠ごとの空き数")
+    day_free: List[int] = Field(..., description="日ごとの空き数の合計")
+
+
+class ReservationTransitionRequest(BaseModel):
+    """
+    ステータス一括変更のリクエスト
+
+    reservation_ids（予約IDの一覧）か from_status（当日の対象ステータス、
+    受付番号順に limit 件・省略時は全件）のどちらか一方を指定する。
+    例: 次の3件を呼び出す {"status": "calling", "from_status": "accepted", "limit": 3}
+    """
+
+    status: ReservationStatus = Field(..., description="変更後のステータス")
+    reservation_ids: Optional[List[str]] = Field(None, min_length=1)
+    from_status: Optional[ReservationStatus] = None
+    limit: Optional[int] = Field(None, ge=1)
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        """対象の指定方法を検証"""
+        if (self.reservation_ids is None) == (self.from_status is None):
+            raise ValueError(
+                "reservation_ids と from_status のどちらか一方を指定してください"
+            )
+        if self.limit is not None and self.from_status is None:
+            raise ValueError("limit は from_status と組み合わせて指定してください")
+        return self
+
+
+class ReservationTransitionItemResult(BaseModel):
+    """ステータス一括変更の1件ごとの結果"""
+
+    reservation_id: str
+    reception_number: Optional[int] = None
+    previous_status: Optional[ReservationStatus] = None
+    status: Optional[ReservationStatus] = None
+    result: Literal["updated", "invalid_transition", "rejected", "not_found"]
+    message: Optional[str] = None
+
+
+class ReservationTransitionResult(BaseModel):
+    """ステータス一括変更の結果（レスポンス用）"""
+
+    updated: int = 0
+    results: List[ReservationTransitionItemResult]
+
+
+class WaitTimeEstimate(BaseModel):
+    """予約ごとの待ち時間の推定"""
+
+    reservation_id: str
+    reception_number: Optional[int] = None
+    status: Optional[ReservationStatus] = None
+    position_in_queue: Optional[int] = None  # 0が次に呼ばれる番号（待ちでなければNone）
+    estimated_wait_minutes: Optional[int] = None
+
+
 class BusinessHours(BaseModel):
     """営業時間モデル"""
 
@@ -109,7 +249,16 @@ class ReservationSummary(BaseModel):
     current_time: datetime
     business_hours: BusinessHours
     current_number: Optional[int] = None  # 現在の呼び出し番号
+    calling_numbers: List[int] = []  # 呼び出し中の受付番号
+    next_numbers: List[int] = []  # 次に呼ばれる受付番号
     latest_reception_number: Optional[int] = None  # 最新の受付番号
     waiting_count: int = 0  # 待機人数
+    completed_count: int = 0  # 対応完了数
+    next_wait_minutes: List[int] = []  # next_numbersそれぞれの推定待ち時間（分）
+    estimated_wait_minutes: Optional[int] = (
+        None  # 今から受付した場合の推定待ち時間（分）
+    )
+    average_service_minutes: Optional[float] = None  # 1件あたりの平均対応時間（分）
+    is_long_wait: bool = False  # 推定待ち時間がLONG_WAIT_TIME_THRESHOLD以上か
 
     model_config = {"json_encoders": {datetime: lambda v: v.isoformat()}}
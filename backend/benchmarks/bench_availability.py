@@ -0,0 +1,126 @@
+"""
+空き状況カレンダー（90日分）の取得時間を計測するベンチマーク
+
+日ごとに /reservations/availability/{date} を呼ぶ方式（90回の読み取り）と、
+期間指定の /reservations/availability（1回のクエリ＋行列計算）を比較する。
+あわせて、Firestoreを介さない空き数の計算部分のみ（Pythonループと行列計算）も比較する。
+
+使い方（backendディレクトリで、Firestoreエミュレータ起動後に実行）:
+    python -m benchmarks.bench_availability [--days 90] [--repeat 10]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from app.core.config import settings
+from app.core.firebase import get_firestore
+from app.crud.branch_day import (
+    BRANCH_DAYS_COLLECTION,
+    BranchDay,
+    availability_matrix,
+)
+from app.crud.crud_reservation import crud_reservation
+
+COMPANY_ID = "bench_company"
+BRANCH_ID = "bench_branch"
+
+
+def make_branch_days(start: date, days: int) -> list:
+    """ランダムな占有数を持つ店舗・日別データを作成"""
+    rng = random.Random(0)
+    capacity = settings.MAX_CONCURRENT_RESERVATIONS
+    branch_days = []
+    for offset in range(days):
+        branch_day = BranchDay(COMPANY_ID, BRANCH_ID, start + timedelta(days=offset))
+        branch_day.occupancy = [rng.randint(0, capacity) for _ in branch_day.occupancy]
+        branch_days.append(branch_day)
+    return branch_days
+
+
+def seed_branch_days(branch_days: list) -> None:
+    """計測用の店舗・日別ドキュメントを作成"""
+    db = get_firestore()
+    batch = db.batch()
+    for branch_day in branch_days:
+        batch.set(
+            db.collection(BRANCH_DAYS_COLLECTION).document(branch_day.id),
+            branch_day.to_dict(),
+        )
+    batch.commit()
+
+
+def loop_free(branch_days: list, capacity: int) -> list:
+    """日ごと・枠ごとにPythonで空き数を求める（従来の組み立て方）"""
+    return [
+        [slot["remaining_capacity"] for slot in branch_day.available_slots(capacity)]
+        for branch_day in branch_days
+    ]
+
+
+def timed(func, repeat: int) -> float:
+    """funcをrepeat回実行した所要時間の中央値（ミリ秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def timed_async(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def main(days: int, repeat: int) -> None:
+    start = date.today()
+    end = start + timedelta(days=days - 1)
+    capacity = settings.MAX_CONCURRENT_RESERVATIONS
+    branch_days = make_branch_days(start, days)
+
+    loop_ms = timed(lambda: loop_free(branch_days, capacity), repeat)
+    matrix_ms = timed(
+        lambda: availability_matrix(start, days, branch_days, capacity), repeat
+    )
+    print(
+        f"compute only ({days} days): loop {loop_ms:.2f} ms, numpy {matrix_ms:.2f} ms"
+    )
+
+    seed_branch_days(branch_days)
+
+    async def per_day():
+        for offset in range(days):
+            await crud_reservation.get_available_slots(
+                start + timedelta(days=offset), COMPANY_ID, BRANCH_ID
+            )
+
+    async def ranged():
+        await crud_reservation.get_availability_calendar(
+            COMPANY_ID, BRANCH_ID, start, end
+        )
+
+    # ウォームアップ（接続確立分を計測から除外）
+    await ranged()
+
+    per_day_ms = await timed_async(per_day, repeat)
+    ranged_ms = await timed_async(ranged, repeat)
+    print(f"{'method':>10} {'reads':>6} {'median ms':>10}")
+    print(f"{'per-day':>10} {days:>6} {per_day_ms:>10.1f}")
+    print(f"{'range':>10} {1:>6} {ranged_ms:>10.1f}")
+    print(f"speedup: {per_day_ms / ranged_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="空き状況カレンダーのベンチマーク")
+    parser.add_argument("--days", type=int, default=90, help="取得する日数")
+    parser.add_argument("--repeat", type=int, default=10, help="各計測の繰り返し回数")
+    args = parser.parse_args()
+    asyncio.run(main(args.days, args.repeat))
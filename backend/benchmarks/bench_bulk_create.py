@@ -0,0 +1,75 @@
+"""
+予約の一括作成（POST /reservations/bulk）と1件ずつの作成のスループットを比較するベンチマーク
+
+使い方（backendディレクトリで、Firestoreエミュレータ起動後に実行）:
+    python -m benchmarks.bench_bulk_create [--count 500]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.crud.crud_reservation import crud_reservation
+from app.models.reservation import ReservationCreate
+
+USER_ID = "bench_user"
+
+
+def make_reservations(count: int, branch_id: str) -> list:
+    """営業時間内の時間枠に均等に割り振った予約を作成（満席にならない件数）"""
+    start = datetime.now(settings.get_timezone()).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    slots = 24
+    reservations = []
+    for i in range(count):
+        # 日をまたいで割り振り、1枠あたりの件数をMAX_CONCURRENT_RESERVATIONS以下に抑える
+        day, slot = divmod(i, slots * settings.MAX_CONCURRENT_RESERVATIONS)
+        reservation_at = start + timedelta(
+            days=day, minutes=settings.TIME_SLOT_MINUTES * (slot % slots)
+        )
+        reservations.append(
+            ReservationCreate(
+                user_id=USER_ID,
+                company_id="bench_company",
+                branch_id=branch_id,
+                reservation_at=reservation_at,
+            )
+        )
+    return reservations
+
+
+async def single(reservations: list) -> None:
+    """1件ずつ作成（1件ごとにトランザクション）"""
+    for reservation in reservations:
+        await crud_reservation.create(reservation, USER_ID)
+
+
+async def bulk(reservations: list) -> None:
+    """一括作成（番号の払い出しは1トランザクション、書き込みは500件ごと）"""
+    await crud_reservation.create_bulk(reservations, USER_ID)
+
+
+async def measure(func, reservations: list) -> float:
+    started = time.perf_counter()
+    await func(reservations)
+    return len(reservations) / (time.perf_counter() - started)
+
+
+async def main(count: int) -> None:
+    suffix = datetime.now().strftime("%H%M%S")
+    single_rate = await measure(single, make_reservations(count, f"single_{suffix}"))
+    bulk_rate = await measure(bulk, make_reservations(count, f"bulk_{suffix}"))
+    print(f"{'method':>8} {'items':>6} {'items/s':>10}")
+    print(f"{'single':>8} {count:>6} {single_rate:>10.1f}")
+    print(f"{'bulk':>8} {count:>6} {bulk_rate:>10.1f}")
+    print(f"speedup: {bulk_rate / single_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="予約一括作成のベンチマーク")
+    parser.add_argument("--count", type=int, default=500, help="作成する予約の件数")
+    args = parser.parse_args()
+    asyncio.run(main(args.count))
@@ -0,0 +1,102 @@
+"""
+Firestoreデータ層の同時実行スループットを計測するベンチマーク
+
+旧実装（async def内で同期クライアントを呼ぶ＝イベントループをブロックする）と
+現行実装（CRUD層が使うAsyncClient）を、同時クライアント数 1/10/100 で比較する。
+crud_company.get は企業マスタのキャッシュ（master_cache）から返すため、
+両方ともクライアントから直接読み取り、毎回RPCが発生する条件で比較する。
+
+使い方（backendディレクトリで、Firestoreエミュレータ起動後に実行）:
+    python -m benchmarks.bench_concurrency [--requests 500]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from app.core.firebase import get_async_firestore, get_firestore
+
+COLLECTION = "companies"
+CONCURRENCY_LEVELS = (1, 10, 100)
+
+
+def seed_companies(count: int) -> list:
+    """計測用の企業ドキュメントを作成し、IDの一覧を返す"""
+    db = get_firestore()
+    batch = db.batch()
+    ids = []
+    for i in range(count):
+        doc_ref = db.collection(COLLECTION).document(f"bench_company_{i}")
+        batch.set(
+            doc_ref,
+            {
+                "id": doc_ref.id,
+                "company_name": f"bench {i}",
+                "address": "bench",
+                "phone": "000-0000-0000",
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+            },
+        )
+        ids.append(doc_ref.id)
+    batch.commit()
+    return ids
+
+
+async def blocking_get(company_id: str) -> None:
+    """旧実装相当：同期クライアントでイベントループをブロックしながら取得"""
+    get_firestore().collection(COLLECTION).document(company_id).get()
+
+
+async def async_get(company_id: str) -> None:
+    """現行実装：CRUD層と同じAsyncClientで取得（キャッシュを通さない）"""
+    await get_async_firestore().collection(COLLECTION).document(company_id).get()
+
+
+async def run(fetch, ids: list, concurrency: int, total: int) -> float:
+    """
+    指定した同時実行数でtotal件の取得を行い、スループット（req/s）を返す
+    """
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(ids[i % len(ids)])
+
+    async def worker():
+        while True:
+            try:
+                company_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await fetch(company_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+async def main(total: int) -> None:
+    ids = seed_companies(50)
+
+    # ウォームアップ（接続確立分を計測から除外）
+    await run(blocking_get, ids, 1, 10)
+    await run(async_get, ids, 1, 10)
+
+    print(f"{'clients':>8} {'blocking req/s':>16} {'async req/s':>14} {'ratio':>7}")
+    for concurrency in CONCURRENCY_LEVELS:
+        before = await run(blocking_get, ids, concurrency, total)
+        after = await run(async_get, ids, concurrency, total)
+        print(
+            f"{concurrency:>8} {before:>16.1f} {after:>14.1f} {after / before:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Firestoreデータ層の同時実行ベンチマーク"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=500, help="各計測の総リクエスト数"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,75 @@
+"""
+app.main のインポートで時間のかかっているモジュールを表示するレポート
+
+新しいPythonプロセスで `python -X importtime -c "import app.main"` を実行し、
+累積時間の長いモジュールと、トップレベルのパッケージごとの合計時間（自身の時間の和）、
+インポート後の最大RSSを表示する。
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_imports [--top 25]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import Counter
+from typing import List, Tuple
+
+# 子プロセスで実行するコード（最大RSSをKB単位で標準出力に書く）
+MEASURE = """
+import resource
+import app.main
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    -X importtime の出力を (モジュール名, 自身の時間, 累積時間) の一覧にする（マイクロ秒）
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "bench")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", MEASURE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    rows = parse_importtime(result.stderr)
+    max_rss_mb = int(result.stdout.strip().splitlines()[-1]) / 1024
+
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+    print(
+        f"modules: {len(rows)}, total: {total_ms:.1f} ms, max RSS: {max_rss_mb:.1f} MB"
+    )
+
+    print(f"\nslowest imports (cumulative, top {args.top}):")
+    for name, _, cumulative_us in sorted(rows, key=lambda row: -row[2])[: args.top]:
+        print(f"{cumulative_us / 1000:9.1f} ms  {name}")
+
+    packages = Counter()
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    print(f"\nby top-level package (self time, top {args.top}):")
+    for package, self_us in packages.most_common(args.top):
+        print(f"{self_us / 1000:9.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    main()
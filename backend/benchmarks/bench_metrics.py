@@ -0,0 +1,72 @@
+"""
+メトリクスの記録にかかる時間を計測するベンチマーク
+
+1リクエスト分の記録（HTTPの件数・レイテンシ、Firestore RPC 2回分）の平均時間と、
+MetricsMiddlewareの有無によるリクエスト処理時間の差を表示する。
+Firestoreには接続しない。
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_metrics [--iterations 100000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.metrics import (
+    FIRESTORE_RPC_DURATION,
+    FIRESTORE_RPCS,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+)
+from app.middleware.metrics import MetricsMiddleware
+
+
+def record_once() -> None:
+    """1リクエスト分の記録"""
+    HTTP_REQUEST_DURATION.labels("GET", "/bench/{id}").observe(0.012)
+    HTTP_REQUESTS.labels("GET", "/bench/{id}", 200).inc()
+    for rpc in ("batch_get_documents", "run_query"):
+        FIRESTORE_RPC_DURATION.labels("bench.get", rpc).observe(0.004)
+        FIRESTORE_RPCS.labels("bench.get", rpc, "ok").inc()
+
+
+async def plain_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def call(app, iterations: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/bench/1"}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        await app(scope, receive, send)
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    for _ in range(args.iterations):
+        record_once()
+    elapsed = time.perf_counter() - started_at
+    print(f"record per request: {elapsed / args.iterations * 1e6:.2f} us")
+
+    plain = asyncio.run(call(plain_app, args.iterations))
+    wrapped = asyncio.run(call(MetricsMiddleware(plain_app), args.iterations))
+    overhead = (wrapped - plain) / args.iterations * 1e6
+    print(f"middleware overhead per request: {overhead:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+コールドスタート（app.mainのインポートと起動処理）の時間を計測するベンチマーク
+
+新しいPythonプロセスで app.main をインポートし、lifespanの起動処理が完了して
+リクエストを受け付けられるまでの時間を計測する。準備処理（Firestoreへの接続など）は
+バックグラウンドで行われるため、この時間には含まれない。
+中央値が予算を超えた場合、またはインポート時にFirebaseが初期化された場合は
+終了コード1で終了する（CIで起動時間の劣化を検出するため）。
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_startup [--runs 5] [--import-budget-ms 2000]
+        [--startup-budget-ms 50]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 子プロセスで実行するコード（結果をJSONで標準出力に書く）
+MEASURE = """
+import asyncio, json, time
+started_at = time.perf_counter()
+import app.main
+imported_at = time.perf_counter()
+from app.core import firebase
+
+async def startup():
+    context = app.main.app.router.lifespan_context(app.main.app)
+    began = time.perf_counter()
+    await context.__aenter__()
+    elapsed = time.perf_counter() - began
+    await context.__aexit__(None, None, None)
+    return elapsed
+
+initialized_on_import = firebase._is_initialized
+startup_seconds = asyncio.run(startup())
+print(json.dumps({
+    "import_ms": (imported_at - started_at) * 1000,
+    "startup_ms": startup_seconds * 1000,
+    "initialized_on_import": initialized_on_import,
+}))
+"""
+
+
+def measure_once() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "bench")
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=2000)
+    parser.add_argument("--startup-budget-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    results = [measure_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    startup_ms = statistics.median(r["startup_ms"] for r in results)
+    initialized = any(r["initialized_on_import"] for r in results)
+
+    print(f"runs: {args.runs}")
+    print(f"import app.main: {import_ms:.1f} ms (budget {args.import_budget_ms} ms)")
+    print(f"startup: {startup_ms:.2f} ms (budget {args.startup_budget_ms} ms)")
+    print(f"firebase initialized on import: {initialized}")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append("import time over budget")
+    if startup_ms > args.startup_budget_ms:
+        failures.append("startup time over budget")
+    if initialized:
+        failures.append("firebase initialized at import time")
+    if failures:
+        print("FAILED: " + ", ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
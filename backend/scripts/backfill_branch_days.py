@@ -0,0 +1,178 @@
+"""
+既存の予約から店舗・日別ドキュメント（branch_days）を作成・補正する
+
+使い方（backendディレクトリで実行）:
+    python -m scripts.backfill_branch_days [--dry-run]
+
+予約を全件走査して対象の店舗・日を求め、1店舗・1日ごとにトランザクション内で
+その日の予約を読み直して集計する。受付番号カウンタは「既存値」と「予約から求めた
+最大受付番号」の大きい方に更新し、時間枠の占有数（occupancy）と待ち行列
+（受付済み・呼び出し中の受付番号）は集計し直した値で置き換える。
+予約の作成・ステータス変更は同じ店舗・日別ドキュメントを更新するため、
+稼働中に実行しても競合したトランザクションは再試行され、更新は失われない。
+"""
+
+import argparse
+import logging
+from datetime import date, datetime, time, timedelta
+
+from firebase_admin import firestore
+
+from app.core.config import settings
+from app.core.firebase import get_firestore
+from app.crud.branch_day import (
+    BRANCH_DAYS_COLLECTION,
+    BranchDay,
+    SlotUnavailableError,
+    branch_day_id,
+    local_date,
+)
+
+logger = logging.getLogger(__name__)
+
+# 集計に使う予約のフィールド
+RESERVATION_FIELDS = [
+    "company_id",
+    "branch_id",
+    "reservation_at",
+    "reception_number",
+    "status",
+]
+
+
+def tally(branch_day: BranchDay, doc_id: str, data: dict) -> None:
+    """予約1件を店舗・日別の最大受付番号・時間枠の占有数・待ち行列に集計する"""
+    branch_day.last_reception_number = max(
+        branch_day.last_reception_number, data.get("reception_number") or 0
+    )
+    # 既存データは上限を超えていても、そのまま集計する
+    try:
+        branch_day.transition(
+            data["reservation_at"],
+            data.get("reception_number"),
+            None,
+            data.get("status"),
+            capacity=float("inf"),
+        )
+    except SlotUnavailableError:
+        # 時間枠の外の予約（営業時間の検証がUTCだった頃のデータ）は集計しない
+        logger.warning("Reservation %s is outside the slot grid", doc_id)
+
+
+def finish(branch_day: BranchDay) -> BranchDay:
+    # 呼び出し中の番号のうち最後に呼ばれたもの（番号の最大値）を現在の番号とする
+    branch_day.current_number = max(branch_day.calling_numbers, default=None)
+    return branch_day
+
+
+def collect_branch_days(db) -> dict:
+    """
+    予約を全件走査し、店舗・日別の最大受付番号・時間枠の占有数・待ち行列を集計する
+
+    Args:
+        db: Firestoreクライアント
+
+    Returns:
+        dict: {(company_id, branch_id, 業務日付): BranchDay}
+    """
+    branch_days = {}
+    docs = db.collection("reservations").select(RESERVATION_FIELDS).stream()
+    for doc in docs:
+        data = doc.to_dict()
+        if not data.get("company_id") or not data.get("branch_id"):
+            continue
+        reservation_at = data.get("reservation_at")
+        if not isinstance(reservation_at, datetime):
+            continue
+        key = (data["company_id"], data["branch_id"], local_date(reservation_at))
+        if key not in branch_days:
+            branch_days[key] = BranchDay(*key)
+        tally(branch_days[key], doc.id, data)
+    return {key: finish(branch_day) for key, branch_day in branch_days.items()}
+
+
+def seed_branch_day(db, company_id: str, branch_id: str, day: date) -> bool:
+    """
+    1店舗・1日分のドキュメントを、その日の予約をトランザクション内で集計し直して補正する
+
+    Returns:
+        bool: ドキュメントを更新した場合True
+    """
+    doc_ref = db.collection(BRANCH_DAYS_COLLECTION).document(
+        branch_day_id(company_id, branch_id, day)
+    )
+    start = datetime.combine(day, time.min, settings.get_timezone())
+    query = (
+        db.collection("reservations")
+        .where("company_id", "==", company_id)
+        .where("branch_id", "==", branch_id)
+        .where("reservation_at", ">=", start)
+        .where("reservation_at", "<", start + timedelta(days=1))
+        .select(RESERVATION_FIELDS)
+    )
+
+    @firestore.transactional
+    def seed_in_transaction(transaction):
+        # 店舗・日別ドキュメントを読み取りに含め、並行する予約の更新と競合させる
+        snapshot = doc_ref.get(transaction=transaction)
+        current = BranchDay.from_snapshot(company_id, branch_id, day, snapshot)
+        collected = BranchDay(company_id, branch_id, day)
+        for doc in query.stream(transaction=transaction):
+            tally(collected, doc.id, doc.to_dict())
+        finish(collected)
+        if (
+            snapshot.exists
+            and current.last_reception_number >= collected.last_reception_number
+            and current.occupancy == collected.occupancy
+            and current.waiting_numbers == collected.waiting_numbers
+            and current.calling_numbers == collected.calling_numbers
+            and current.completed_count == collected.completed_count
+        ):
+            return False
+        current.last_reception_number = max(
+            current.last_reception_number, collected.last_reception_number
+        )
+        current.occupancy = list(collected.occupancy)
+        current.waiting_numbers = list(collected.waiting_numbers)
+        current.calling_numbers = list(collected.calling_numbers)
+        current.completed_count = collected.completed_count
+        if collected.current_number is not None:
+            current.current_number = collected.current_number
+        transaction.set(doc_ref, current.to_dict())
+        return True
+
+    return seed_in_transaction(db.transaction())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--dry-run", action="store_true", help="書き込みを行わず集計結果のみ表示する"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    db = get_firestore()
+
+    branch_days = collect_branch_days(db)
+    logger.info("%s branch-days found", len(branch_days))
+
+    updated = 0
+    for key, branch_day in sorted(branch_days.items()):
+        if args.dry_run:
+            logger.info(
+                "%s: last_reception_number=%s occupancy=%s waiting=%s",
+                branch_day.id,
+                branch_day.last_reception_number,
+                branch_day.occupancy,
+                len(branch_day.waiting_numbers),
+            )
+            continue
+        if seed_branch_day(db, *key):
+            updated += 1
+
+    logger.info("%s branch-days updated", updated)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,10 @@
+import os
+
+# エミュレータなしで実行できるよう、既定ではプロセス内のFirestore互換バックエンドを使う
+# （エミュレータで実行する場合は FIRESTORE_BACKEND=firestore、
+# SQLiteで実行する場合は FIRESTORE_BACKEND=sqlite SQLITE_PATH=:memory: を指定する）
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch
@@ -9,11 +16,10 @@ from fastapi.security import HTTPAuthorizationCredentials
 from fastapi import HTTPException, status
 import jwt
 from datetime import datetime
-from app.core.firebase import get_firestore
+from app.core.config import settings
+from app.core.firebase import LOCAL_BACKENDS, get_firestore, get_local_store
 
 # Firebaseエミュレータの設定
-import os
-
 os.environ["FIRESTORE_EMULATOR_HOST"] = "localhost:8080"
 os.environ["FIREBASE_AUTH_EMULATOR_HOST"] = "localhost:9099"
 
@@ -173,8 +179,14 @@ def auth_headers():
 
 
 @pytest.fixture(autouse=True)
-async def cleanup_database():
+def cleanup_database():
     """各テストケース実行前にデータベースをクリーンアップ"""
+    if settings.FIRESTORE_BACKEND in LOCAL_BACKENDS:
+        get_local_store().clear()
+        yield
+        get_local_store().clear()
+        return
+
     db = get_firestore()
 
     # クリーンアップ対象のコレクション
@@ -195,3 +207,11 @@ async def cleanup_database():
         docs = collection_ref.get()
         for doc in docs:
             doc.reference.delete()
+
+
+@pytest.fixture(autouse=True)
+def disable_rate_limit(monkeypatch):
+    """APIのテストがレート制限に掛からないようにする"""
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
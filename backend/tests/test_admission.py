@@ -0,0 +1,153 @@
+import asyncio
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware.admission import (
+    AdmissionControlMiddleware,
+    AdmissionController,
+    AdmissionGate,
+    admission_route_class,
+    admission_tenant,
+)
+from app.core.security import token_cache
+
+
+def test_waiting_tenants_are_served_in_turn():
+    """空きが出るたびに待っている企業を順番に1件ずつ通す"""
+    gate = AdmissionGate("other", limit=1, target_seconds=5, max_queue=10)
+    order = []
+
+    async def request(tenant, name):
+        assert await gate.acquire(tenant) is None
+        order.append(name)
+
+    async def scenario():
+        await gate.acquire("holder")
+        tasks = [asyncio.create_task(request("a", name)) for name in ("a1", "a2", "a3")]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("b", "b1")))
+        await asyncio.sleep(0)
+        assert gate.queue_depth == 4
+        assert gate.stats()["waiting_tenants"] == 2
+
+        for _ in range(4):
+            gate.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        gate.release()
+
+    asyncio.run(scenario())
+    assert order == ["a1", "b1", "a2", "a3"]
+    assert gate.in_flight == 0
+    assert gate.queue_depth == 0
+
+
+def test_timeout_rejects_and_fails_fast_until_recovered():
+    """待ち時間が目標を超えたら打ち切り、回復するまで新しいリクエストは待たせず拒否する"""
+    gate = AdmissionGate("other", limit=1, target_seconds=0.01, max_queue=10)
+
+    async def scenario():
+        await gate.acquire("a")
+        waiter = asyncio.create_task(gate.acquire("b"))
+        await asyncio.sleep(0)
+        # 先に待っているリクエストがいる間は過負荷とみなさない
+        assert await gate.acquire("c") == "timeout"
+        assert await waiter == "timeout"
+        assert gate.stats()["overloaded"] is True
+        assert await gate.acquire("d") == "overload"
+
+        gate.release()
+        assert gate.stats()["overloaded"] is False
+        assert await gate.acquire("e") is None
+        gate.release()
+
+    asyncio.run(scenario())
+    assert gate.rejected == {"queue_full": 0, "timeout": 2, "overload": 1}
+
+
+def test_queue_full_rejects_immediately():
+    """待ち行列が上限に達している場合はすぐに拒否する"""
+    gate = AdmissionGate("other", limit=1, target_seconds=5, max_queue=1)
+
+    async def scenario():
+        await gate.acquire("a")
+        waiter = asyncio.create_task(gate.acquire("a"))
+        await asyncio.sleep(0)
+        assert await gate.acquire("b") == "queue_full"
+        gate.release()
+        assert await waiter is None
+        gate.release()
+
+    asyncio.run(scenario())
+
+
+def test_route_class_and_tenant():
+    """パスとメソッドからルート種別、クエリ・パスから企業を求める"""
+    assert admission_route_class("GET", "/health") is None
+    assert admission_route_class("GET", "/api/v1/reservations/c1/b1/stream") is None
+    assert (
+        admission_route_class("GET", "/api/v1/reservations/availability")
+        == "availability"
+    )
+    assert admission_route_class("POST", "/api/v1/reservations/") == (
+        "reservation_write"
+    )
+    assert admission_route_class("GET", "/api/v1/reservations/r1") == "other"
+
+    def scope(path, query=b""):
+        return {"path": path, "query_string": query, "client": ("10.0.0.1", 1234)}
+
+    assert admission_tenant(scope("/api/v1/branches/", b"company_id=c1")) == (
+        "company:c1"
+    )
+    assert admission_tenant(scope("/api/v1/reservations/c2/b1/summary")) == (
+        "company:c2"
+    )
+    assert admission_tenant(scope("/api/v1/companies/c3")) == "company:c3"
+    assert admission_tenant(scope("/api/v1/reservations/r1")) == "ip:10.0.0.1"
+
+
+def test_tenant_from_verified_token_for_body_scoped_write():
+    """企業IDがボディにある書き込みは、検証済みトークンの企業IDで企業を求める"""
+    exp = time.time() + 3600
+    token_cache.set("staff", {"uid": "s1", "company_id": "c9"}, exp)
+    token_cache.set("customer", {"uid": "u1", "company_id": None}, exp)
+
+    def scope(token):
+        return {
+            "method": "POST",
+            "path": "/api/v1/reservations/",
+            "query_string": b"",
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "client": ("10.0.0.1", 1234),
+        }
+
+    try:
+        assert admission_tenant(scope("staff")) == "company:c9"
+        assert admission_tenant(scope("customer")) == "user:u1"
+        # 未検証のトークンは信用せず接続元IPアドレスで扱う
+        assert admission_tenant(scope("unverified")) == "ip:10.0.0.1"
+    finally:
+        token_cache.clear()
+
+
+def test_middleware_returns_503_with_retry_after():
+    """枠を確保できないリクエストは503とRetry-Afterを返し、拒否件数を数える"""
+    controller = AdmissionController({"other": 0}, target_seconds=0.01, max_queue=10)
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, controller=controller)
+
+    @app.get("/api/v1/items")
+    async def items():
+        return []
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    client = TestClient(app)
+    response = client.get("/api/v1/items")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/health").status_code == 200
+    assert controller.stats()[0]["rejected"]["timeout"] == 1
@@ -0,0 +1,49 @@
+from datetime import date, datetime, timezone
+from app.core.firebase import get_firestore
+from app.crud.branch_day import BRANCH_DAYS_COLLECTION, BranchDay, branch_day_id
+from scripts.backfill_branch_days import collect_branch_days, seed_branch_day
+
+DAY = date(2025, 1, 1)
+
+
+def add_reservation(db, reservation_id: str, hour: int, number: int, status: str):
+    db.collection("reservations").document(reservation_id).set(
+        {
+            "company_id": "c1",
+            "branch_id": "b1",
+            # 業務タイムゾーン（JST）の時刻
+            "reservation_at": datetime(2025, 1, 1, hour - 9, tzinfo=timezone.utc),
+            "reception_number": number,
+            "status": status,
+        }
+    )
+
+
+def test_seed_recounts_reservations_inside_transaction():
+    """走査後に作成された予約も、補正時にトランザクション内で集計し直して反映する"""
+    db = get_firestore()
+    add_reservation(db, "r1", 10, 1, "accepted")
+    add_reservation(db, "r2", 10, 2, "calling")
+    db.collection(BRANCH_DAYS_COLLECTION).document(branch_day_id("c1", "b1", DAY)).set(
+        {"last_reception_number": 5}
+    )
+
+    branch_days = collect_branch_days(db)
+    assert list(branch_days) == [("c1", "b1", DAY)]
+    # 走査の後に稼働中の予約作成があった場合
+    add_reservation(db, "r3", 11, 6, "accepted")
+
+    assert seed_branch_day(db, "c1", "b1", DAY)
+    snapshot = (
+        db.collection(BRANCH_DAYS_COLLECTION)
+        .document(branch_day_id("c1", "b1", DAY))
+        .get()
+    )
+    branch_day = BranchDay.from_snapshot("c1", "b1", DAY, snapshot)
+    assert branch_day.last_reception_number == 6
+    assert branch_day.waiting_numbers == [1, 6]
+    assert branch_day.calling_numbers == [2]
+    assert branch_day.current_number == 2
+    assert sum(branch_day.occupancy) == 3
+    # 予約と一致している場合は書き込まない
+    assert not seed_branch_day(db, "c1", "b1", DAY)
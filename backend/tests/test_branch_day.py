@@ -0,0 +1,151 @@
+from datetime import date, datetime, timezone
+import pytest
+from pydantic import ValidationError
+from app.crud.branch_day import (
+    BranchDay,
+    SlotUnavailableError,
+    availability_matrix,
+    branch_day_id,
+)
+from app.models.reservation import ReservationCreate
+
+DAY = date(2025, 1, 1)
+
+
+def at_local(hour: int, minute: int = 0) -> datetime:
+    """業務タイムゾーン（JST）の時刻をUTCのdatetimeで表す"""
+    return datetime(2025, 1, 1, hour - 9, minute, tzinfo=timezone.utc)
+
+
+def test_branch_day_id():
+    """ドキュメントIDは企業・店舗・日付から決まる"""
+    assert branch_day_id("c1", "b1", DAY) == "c1_b1_20250101"
+
+
+def test_occupy_until_capacity():
+    """上限まで占有でき、超えるとSlotUnavailableError"""
+    branch_day = BranchDay("c1", "b1", DAY)
+    branch_day.occupy(at_local(10), capacity=2)
+    branch_day.occupy(at_local(10, 15), capacity=2)  # 同じ10:00の枠
+
+    with pytest.raises(SlotUnavailableError):
+        branch_day.occupy(at_local(10), capacity=2)
+
+    slots = branch_day.available_slots(capacity=2)
+    assert slots[0] == {
+        "time": "10:00",
+        "is_reserved": True,
+        "reserved_count": 2,
+        "remaining_capacity": 0,
+    }
+    assert slots[1]["time"] == "10:30"
+    assert slots[1]["remaining_capacity"] == 2
+
+
+def test_release_frees_slot():
+    """解放すると再び占有できる"""
+    branch_day = BranchDay("c1", "b1", DAY)
+    branch_day.occupy(at_local(12), capacity=1)
+    branch_day.release(at_local(12))
+    branch_day.occupy(at_local(12), capacity=1)
+    assert branch_day.to_dict()["occupancy"][4] == 1
+
+
+def test_round_trip_keeps_counter_and_occupancy():
+    """保存内容から復元しても受付番号と占有数が引き継がれる"""
+    branch_day = BranchDay("c1", "b1", DAY)
+    branch_day.next_reception_number()
+    branch_day.occupy(at_local(21, 30), capacity=5)
+
+    restored = BranchDay("c1", "b1", DAY, branch_day.to_dict())
+    assert restored.next_reception_number() == 2
+    assert restored.occupancy == branch_day.occupancy
+    assert restored.occupancy[-1] == 1
+
+
+def test_outside_business_hours_is_rejected():
+    """営業時間外の予約は枠を占有できず、定員の検証を素通りしない"""
+    branch_day = BranchDay("c1", "b1", DAY)
+    with pytest.raises(SlotUnavailableError):
+        branch_day.occupy(at_local(9), capacity=1)
+    with pytest.raises(SlotUnavailableError):
+        branch_day.admit(at_local(22), "accepted", capacity=1)
+    assert sum(branch_day.occupancy) == 0
+    assert branch_day.last_reception_number == 0
+
+
+def test_reservation_hours_use_business_timezone():
+    """予約日時の営業時間の検証は時間枠と同じ業務タイムゾーンで行う"""
+    base = {"user_id": "u1", "company_id": "c1", "branch_id": "b1"}
+    # JST 10:00（UTC 1:00）は受け付ける
+    ReservationCreate(**base, reservation_at=at_local(10))
+    # UTC 13:00 は JST 22:00 で営業時間外（UTCで判定すると通ってしまう）
+    with pytest.raises(ValidationError):
+        ReservationCreate(
+            **base, reservation_at=datetime(2025, 1, 1, 13, tzinfo=timezone.utc)
+        )
+    with pytest.raises(ValidationError):
+        ReservationCreate(**base, reservation_at=at_local(9, 59))
+
+
+def test_availability_matrix():
+    """空き数行列はドキュメントのない日を全枠空きとして扱う"""
+    first = BranchDay("c1", "b1", DAY)
+    first.occupy(at_local(10), capacity=5)
+    third = BranchDay("c1", "b1", date(2025, 1, 3))
+    for _ in range(5):
+        third.occupy(at_local(21, 30), capacity=5)
+
+    free = availability_matrix(DAY, 3, [first, third], capacity=5)
+
+    assert free.shape == (3, 24)
+    assert free[0, 0] == 4
+    assert (free[1] == 5).all()
+    assert free[2, -1] == 0
+    assert free.sum() == 3 * 24 * 5 - 6
+
+
+def test_queue_summary_follows_transitions():
+    """ステータス変更のたびに待ち人数・呼び出し番号・次の番号が更新される"""
+    branch_day = BranchDay("c1", "b1", DAY)
+    for minute in (0, 5, 10):
+        number = branch_day.next_reception_number()
+        branch_day.transition(at_local(10, minute), number, None, "accepted", 5)
+
+    summary = branch_day.summary(next_count=2)
+    assert summary["waiting_count"] == 3
+    assert summary["next_numbers"] == [1, 2]
+    assert summary["current_number"] is None
+    assert summary["latest_reception_number"] == 3
+
+    branch_day.transition(at_local(10), 1, "accepted", "calling", 5)
+    branch_day.transition(at_local(10, 5), 2, "accepted", "cancelled", 5)
+    summary = branch_day.summary(next_count=2)
+    assert summary["current_number"] == 1
+    assert summary["calling_numbers"] == [1]
+    assert summary["next_numbers"] == [3]
+    assert summary["waiting_count"] == 1
+    assert branch_day.occupancy[0] == 2  # キャンセル分の枠は解放される
+
+    branch_day.transition(at_local(10), 1, "calling", "completed", 5)
+    branch_day.transition(at_local(10, 10), 3, "accepted", None, 5)  # 削除
+    summary = branch_day.summary(next_count=2)
+    assert summary["current_number"] == 1
+    assert summary["calling_numbers"] == []
+    assert summary["waiting_count"] == 0
+    assert branch_day.occupancy[0] == 1  # completedは枠を占有したまま
+
+
+def test_admit_allocates_contiguous_numbers():
+    """満席で受け付けなかった予約は受付番号を消費しない"""
+    branch_day = BranchDay("c1", "b1", DAY)
+    numbers = []
+    for minute in (0, 10, 20):
+        try:
+            numbers.append(branch_day.admit(at_local(10, minute), "accepted", 2))
+        except SlotUnavailableError:
+            numbers.append(None)
+    numbers.append(branch_day.admit(at_local(11), "accepted", 2))
+
+    assert numbers == [1, 2, None, 3]
+    assert branch_day.waiting_numbers == [1, 2, 3]
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.crud.loader import DataLoader, load_document, reset_loader, set_loader
+
+
+class FakeSnapshot:
+    def __init__(self, path, data):
+        self.reference = FakeDocRef(path)
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocRef:
+    def __init__(self, path):
+        self.path = path
+
+
+class FakeClient:
+    """get_allの呼び出しを記録するFirestoreクライアントの代替"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = []
+
+    async def get_all(self, refs):
+        self.calls.append([ref.path for ref in refs])
+        for ref in refs:
+            yield FakeSnapshot(ref.path, self.documents.get(ref.path))
+
+
+@pytest.fixture
+def client():
+    return FakeClient(
+        {
+            "companies/c1": {"company_name": "企業1"},
+            "branches/b1": {"branch_name": "店舗1"},
+            "users/u1": {"email": "u1@example.com"},
+        }
+    )
+
+
+@pytest.fixture
+def loader(client):
+    loader = DataLoader(lambda: client)
+    token = set_loader(loader)
+    yield loader
+    reset_loader(token)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_share_one_batch(client, loader):
+    """同時に要求したドキュメントは1回のget_allで取得する"""
+    company, branch, user, missing = await asyncio.gather(
+        load_document(FakeDocRef("companies/c1")),
+        load_document(FakeDocRef("branches/b1")),
+        load_document(FakeDocRef("users/u1")),
+        load_document(FakeDocRef("branches/unknown")),
+    )
+
+    assert company == {"company_name": "企業1"}
+    assert branch == {"branch_name": "店舗1"}
+    assert user == {"email": "u1@example.com"}
+    assert missing is None
+    assert len(client.calls) == 1
+    assert sorted(client.calls[0]) == [
+        "branches/b1",
+        "branches/unknown",
+        "companies/c1",
+        "users/u1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_repeated_loads_are_memoized(client, loader):
+    """同じリクエスト内の2回目以降の読み取りはFirestoreにアクセスしない"""
+    first = await load_document(FakeDocRef("companies/c1"))
+    first["company_name"] = "書き換え"
+    second = await load_document(FakeDocRef("companies/c1"))
+
+    assert second == {"company_name": "企業1"}
+    assert len(client.calls) == 1
+    assert loader.load_count == 2
+
+
+@pytest.mark.asyncio
+async def test_clear_forces_reload(client, loader):
+    """書き込み後にメモ化を破棄すると再取得する"""
+    await load_document(FakeDocRef("companies/c1"))
+    client.documents["companies/c1"] = {"company_name": "更新後"}
+    loader.clear(FakeDocRef("companies/c1"))
+
+    assert await load_document(FakeDocRef("companies/c1")) == {"company_name": "更新後"}
+    assert len(client.calls) == 2
@@ -0,0 +1,45 @@
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from app.core.http_cache import conditional_response, etag_matches, make_etag
+
+
+def test_make_etag_is_quoted_and_stable():
+    """同じ値からは同じETag、値が変われば別のETagを生成する"""
+    etag = make_etag("companies", 3, 0, 100, None)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("companies", 3, 0, 100, None)
+    assert etag != make_etag("companies", 4, 0, 100, None)
+
+
+def test_etag_matches_list_weak_and_wildcard():
+    """If-None-Matchの一覧・弱いETag・*を一致とみなす"""
+    etag = make_etag("reservation", "r1", "2024-01-01T00:00:00")
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+
+
+def test_conditional_response_returns_304():
+    """一致する場合は本文なしの304、そうでなければETagとCache-Controlを付けて返す"""
+    app = FastAPI()
+    etag = make_etag("companies", 1)
+
+    @app.get("/items")
+    async def items(request: Request, response: Response):
+        not_modified = conditional_response(request, response, etag, "companies")
+        if not_modified:
+            return not_modified
+        return [{"id": "c1"}]
+
+    client = TestClient(app)
+    first = client.get("/items")
+    assert first.status_code == 200
+    assert first.headers["etag"] == etag
+    assert first.headers["cache-control"] == "private, max-age=60"
+
+    second = client.get("/items", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
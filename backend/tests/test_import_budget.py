@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+# app.main のインポートにかける時間・メモリの上限（CI環境のばらつきを見込んだ値）
+IMPORT_TIME_BUDGET_SECONDS = 3.0
+IMPORT_RSS_BUDGET_MB = 120
+
+# リクエスト処理では使わないため、インポート時に読み込まれてはいけないモジュール
+DEFERRED_MODULES = (
+    "numpy",
+    "pandas",
+    "pdfplumber",
+    "app.core.memory_firestore",
+    "app.core.sqlite_firestore",
+)
+
+MEASURE = """
+import json, resource, sys, time
+started_at = time.perf_counter()
+import app.main
+print(json.dumps({
+    "seconds": time.perf_counter() - started_at,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def measure_import() -> dict:
+    # 本番と同じFirestoreバックエンドの構成で、新しいプロセスで計測する
+    env = dict(os.environ, FIRESTORE_BACKEND="firestore", SECRET_KEY="test")
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE % (DEFERRED_MODULES,)],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_app_main_within_budget():
+    """app.main のインポートが時間・RSSの上限内で、重いモジュールを読み込まない"""
+    measured = measure_import()
+    assert measured["loaded"] == []
+    assert measured["seconds"] < IMPORT_TIME_BUDGET_SECONDS
+    assert measured["max_rss_mb"] < IMPORT_RSS_BUDGET_MB
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+from app.core.logging import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+    SamplingFilter,
+)
+
+
+def make_record(name="app.test", level=logging.INFO, msg="hello %s", args=("x",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_includes_extra_fields_and_exception():
+    """JSONの1行にメッセージ・extraの項目・例外を含める"""
+    logger = logging.getLogger("app.test.json")
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("failed %s", "reservation", exc_info=True, extra={"rid": 1})
+    finally:
+        logger.removeHandler(handler)
+
+    payload = json.loads(JsonFormatter().format(records[0]))
+    assert payload["level"] == "ERROR"
+    assert payload["logger"] == "app.test.json"
+    assert payload["message"] == "failed reservation"
+    assert payload["rid"] == 1
+    assert "ValueError: boom" in payload["exc_info"]
+
+
+def test_sampling_filter_uses_longest_logger_prefix():
+    """ロガー名の最も長い前方一致の割合で間引き、WARNING以上は常に残す"""
+    sampling = SamplingFilter(
+        {"": 1.0, "app.middleware": 0.0, "app.middleware.metrics": 0.5},
+        random=lambda: 0.4,
+    )
+    assert sampling.filter(make_record("app.crud.crud_reservation"))
+    assert not sampling.filter(make_record("app.middleware.request_cost"))
+    assert sampling.filter(make_record("app.middleware.metrics"))
+    assert sampling.filter(
+        make_record("app.middleware.request_cost", level=logging.WARNING)
+    )
+
+
+def test_rate_limit_filter_counts_suppressed_records():
+    """書式ごとに件数を制限し、破棄した件数を次に出力するレコードに付ける"""
+    now = [0.0]
+    rate_limit = RateLimitFilter({"app": 1}, burst=2, clock=lambda: now[0])
+
+    # 値が違っても同じ書式のログは同じ上限で数える
+    results = [rate_limit.filter(make_record(args=(i,))) for i in range(5)]
+    assert results == [True, True, False, False, False]
+    # 別の書式・対象外のロガーは制限しない
+    assert rate_limit.filter(make_record(msg="other %s"))
+    assert rate_limit.filter(make_record("uvicorn.access"))
+
+    now[0] = 1.0
+    record = make_record()
+    assert rate_limit.filter(record)
+    assert record.suppressed == 3
+
+
+def test_queue_handler_drops_records_when_queue_is_full():
+    """キューが一杯の場合は待たずに破棄し、積んだレコードはメッセージを確定させる"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    args = ["before"]
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record(msg="value %s", args=(args,))
+        record.exc_info = sys.exc_info()
+    handler.handle(record)
+    handler.handle(make_record())
+    args.append("after")
+
+    queued = handler.queue.get_nowait()
+    assert handler.queue.empty()
+    assert queued.getMessage() == "value ['before']"
+    assert queued.exc_info is None and "ValueError: boom" in queued.exc_text
+
+
+def test_logging_does_not_import_http_modules():
+    """ログの設定はレート制限・認証のモジュール（jwt・firebase_admin）を読み込まない"""
+    modules = ("app.core.rate_limit", "app.core.security", "jwt", "firebase_admin")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json, sys, app.core.logging; "
+            f"print(json.dumps([m for m in {modules!r} if m in sys.modules]))",
+        ],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, SECRET_KEY="test"),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    )
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+from app.crud.master_cache import MasterDataCache, MasterDataListener
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(clock):
+    return MasterDataCache(
+        "companies", max_size=10, ttl_seconds=300, negative_ttl_seconds=30, clock=clock
+    )
+
+
+def test_hit_after_store():
+    """格納した内容はTTLの間キャッシュから返す"""
+    clock = FakeClock()
+    cache = make_cache(clock)
+    assert cache.lookup("c1") == (False, None)
+
+    cache.store("c1", {"company_name": "企業1"}, cache.generation())
+    clock.now = 299
+    assert cache.lookup("c1") == (True, {"company_name": "企業1"})
+
+    clock.now = 301
+    assert cache.lookup("c1") == (False, None)
+
+
+def test_missing_ids_are_cached_briefly():
+    """存在しないIDは短いTTLでキャッシュする"""
+    clock = FakeClock()
+    cache = make_cache(clock)
+    cache.store("unknown", None, cache.generation())
+
+    assert cache.lookup("unknown") == (True, None)
+    assert cache.stats()["negative_entries"] == 1
+    clock.now = 31
+    assert cache.lookup("unknown") == (False, None)
+
+
+def test_store_after_invalidation_is_skipped():
+    """読み取り中に無効化された場合は古い内容を格納しない"""
+    cache = make_cache(FakeClock())
+    generation = cache.generation()
+    cache.invalidate("c1")
+    cache.store("c1", {"company_name": "古い内容"}, generation)
+    assert cache.lookup("c1") == (False, None)
+
+
+def test_stats_report_staleness_and_hit_ratio():
+    """件数・ヒット率・最も古いエントリの経過秒数を返す"""
+    clock = FakeClock()
+    cache = make_cache(clock)
+    cache.store("c1", {"company_name": "企業1"}, cache.generation())
+    clock.now = 10
+    cache.store("c2", {"company_name": "企業2"}, cache.generation())
+    clock.now = 25
+    cache.lookup("c1")
+    cache.lookup("c3")
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["hit_ratio"] == 0.5
+    assert stats["max_staleness_seconds"] == 25
+
+
+def test_listener_invalidates_changed_documents():
+    """初回スナップショットは無視し、以降の変更でキャッシュを無効化する"""
+    cache = make_cache(FakeClock())
+    cache.store("c1", {"company_name": "企業1"}, cache.generation())
+    cache.store("c2", {"company_name": "企業2"}, cache.generation())
+    callback = MasterDataListener.on_snapshot_callback(cache)
+
+    def change(doc_id):
+        return SimpleNamespace(document=SimpleNamespace(id=doc_id))
+
+    callback([], [change("c1"), change("c2")], None)  # 初回（全件）
+    assert cache.lookup("c1")[0]
+
+    callback([], [change("c1")], None)
+    assert cache.lookup("c1") == (False, None)
+    assert cache.lookup("c2")[0]
@@ -0,0 +1,176 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from firebase_admin import firestore, firestore_async
+from google.cloud.firestore_v1._helpers import ReadAfterWriteError
+from google.cloud.firestore_v1.field_path import FieldPath
+from app.core.memory_firestore import AsyncMemoryClient, MemoryClient, MemoryStore
+from app.core.sqlite_firestore import SqliteStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """同じテストをプロセス内・SQLiteの両方のストアで実行する"""
+    if request.param == "sqlite":
+        store = SqliteStore(str(tmp_path / "store.db"))
+        yield store
+        store.close()
+    else:
+        yield MemoryStore()
+
+
+def seed(client: MemoryClient):
+    items = [("a", 3, "x"), ("b", 1, "y"), ("c", 2, "x"), ("d", 2, "y")]
+    for doc_id, rank, group in items:
+        client.collection("items").document(doc_id).set({"rank": rank, "group": group})
+
+
+def ids(snapshots) -> list:
+    return [snapshot.id for snapshot in snapshots]
+
+
+def test_document_round_trip(store):
+    """保存時にtzなしのdatetimeはUTCになり、更新日時は書き込みごとに増える"""
+    client = MemoryClient(store)
+    ref = client.collection("users").document("u1")
+    assert not ref.get().exists
+
+    ref.set({"name": "a", "created_at": datetime(2025, 1, 1, 9)})
+    first = ref.get()
+    assert first.to_dict()["created_at"] == datetime(2025, 1, 1, 9, tzinfo=timezone.utc)
+
+    ref.update({"name": "b", "profile.age": 20})
+    second = ref.get()
+    assert second.to_dict()["profile"] == {"age": 20}
+    assert second.update_time > first.update_time
+    assert second.create_time == first.create_time
+
+    ref.set({"extra": 1}, merge=True)
+    assert ref.get().to_dict()["name"] == "b"
+    ref.delete()
+    assert not ref.get().exists
+
+
+def test_transforms(store):
+    """Increment・DELETE_FIELD・ArrayUnionを反映する"""
+    client = MemoryClient(store)
+    ref = client.collection("counters").document("c")
+    ref.set({"count": 1, "tags": ["a"], "tmp": True})
+    ref.update(
+        {
+            "count": firestore.Increment(2),
+            "tags": firestore.ArrayUnion(["a", "b"]),
+            "tmp": firestore.DELETE_FIELD,
+        }
+    )
+    assert ref.get().to_dict() == {"count": 3, "tags": ["a", "b"]}
+
+
+def test_query_filters_order_and_cursor(store):
+    """条件・並び順（同値はドキュメントID順）・カーソル・offset/limit"""
+    client = MemoryClient(store)
+    seed(client)
+    items = client.collection("items")
+
+    assert ids(items.where("group", "==", "x").get()) == ["a", "c"]
+    assert ids(items.where("rank", "in", [1, 3]).get()) == ["a", "b"]
+    ordered = items.order_by("rank").order_by(FieldPath.document_id())
+    assert ids(ordered.get()) == ["b", "c", "d", "a"]
+    assert ids(ordered.start_after({"rank": 2, "__name__": "c"}).get()) == ["d", "a"]
+    assert ids(ordered.offset(1).limit(2).get()) == ["c", "d"]
+
+    descending = items.order_by("rank", direction=firestore.Query.DESCENDING)
+    assert ids(descending.get()) == ["a", "d", "c", "b"]
+    assert ids(items.where("rank", ">=", 2).where("rank", "<", 3).get()) == ["c", "d"]
+    # 並び順に使うフィールドがないドキュメントは含まれない
+    items.document("e").set({"group": "x"})
+    assert "e" not in ids(items.order_by("rank").get())
+
+
+def test_batch_is_atomic(store):
+    """存在しないドキュメントのupdateを含むバッチは何も書き込まない"""
+    client = MemoryClient(store)
+    batch = client.batch()
+    batch.set(client.collection("items").document("a"), {"rank": 1})
+    batch.update(client.collection("items").document("missing"), {"rank": 2})
+    with pytest.raises(Exception):
+        batch.commit()
+    assert not client.collection("items").document("a").get().exists
+
+
+def test_async_transaction_retries_on_conflict(store):
+    """読み取り後に他から更新された場合、async_transactionalが再実行する"""
+    client = AsyncMemoryClient(store)
+    ref = client.collection("counters").document("c")
+    attempts = []
+
+    @firestore_async.async_transactional
+    async def increment(transaction):
+        snapshot = await ref.get(transaction=transaction)
+        attempts.append(snapshot.get("count"))
+        if len(attempts) == 1:
+            # 別のリクエストによる更新
+            await ref.update({"count": 10})
+        transaction.update(ref, {"count": snapshot.get("count") + 1})
+
+    async def scenario():
+        await ref.set({"count": 0})
+        await increment(client.transaction())
+        return (await ref.get()).to_dict()
+
+    assert asyncio.run(scenario()) == {"count": 11}
+    assert attempts == [0, 10]
+
+
+def test_transaction_read_after_write(store):
+    """トランザクション内で書き込み後に読み取るとエラー"""
+    client = AsyncMemoryClient(store)
+    ref = client.collection("items").document("a")
+
+    @firestore_async.async_transactional
+    async def write_then_read(transaction):
+        transaction.set(ref, {"rank": 1})
+        await ref.get(transaction=transaction)
+
+    with pytest.raises(ReadAfterWriteError):
+        asyncio.run(write_then_read(client.transaction()))
+
+
+def test_async_get_all_and_stream(store):
+    """get_allは重複を除いて返し、存在しないドキュメントはexists=False"""
+    seed(MemoryClient(store))
+    client = AsyncMemoryClient(store)
+    refs = [client.collection("items").document(doc_id) for doc_id in "aax"]
+
+    async def scenario():
+        snapshots = [snapshot async for snapshot in client.get_all(refs)]
+        streamed = [
+            snapshot
+            async for snapshot in client.collection("items")
+            .where("group", "==", "y")
+            .stream()
+        ]
+        return snapshots, streamed
+
+    snapshots, streamed = asyncio.run(scenario())
+    assert [(s.id, s.exists) for s in snapshots] == [("a", True), ("x", False)]
+    assert ids(streamed) == ["b", "d"]
+
+
+def test_on_snapshot(store):
+    """登録時に現在の状態、以降は書き込みのたびに変更が通知される"""
+    client = MemoryClient(store)
+    events = []
+    watch = client.collection("items").on_snapshot(
+        lambda snapshots, changes, read_time: events.append(
+            [(change.type.name, change.document.id) for change in changes]
+        )
+    )
+    client.collection("items").document("a").set({"rank": 1})
+    client.collection("items").document("a").update({"rank": 2})
+    client.collection("other").document("z").set({})
+    client.collection("items").document("a").delete()
+    watch.unsubscribe()
+    client.collection("items").document("b").set({"rank": 1})
+
+    assert events == [[], [("ADDED", "a")], [("MODIFIED", "a")], [("REMOVED", "a")]]
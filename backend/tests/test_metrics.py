@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from google.auth.credentials import AnonymousCredentials
+from google.cloud.firestore import AsyncClient
+from google.cloud.firestore_v1.types import common, document, firestore
+from app.core.firestore_metrics import (
+    InstrumentedFirestoreApi,
+    instrument_client,
+    instrumented,
+)
+from app.core.metrics import (
+    FIRESTORE_DOCUMENTS_READ,
+    FIRESTORE_DOCUMENTS_WRITTEN,
+    FIRESTORE_RPCS,
+    FIRESTORE_TRANSACTION_RETRIES,
+    HTTP_REQUESTS,
+    MetricsRegistry,
+)
+from app.middleware.metrics import MetricsMiddleware
+
+
+def test_render_counter_and_histogram():
+    """カウンタとヒストグラム（累積バケット・sum・count）をテキスト形式で出力する"""
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs", ("kind",))
+    histogram = registry.histogram("job_seconds", "Job time", ("kind",), (0.1, 1.0))
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    histogram.labels("a").observe(0.1)
+    histogram.labels("a").observe(0.5)
+    histogram.labels("a").observe(3)
+
+    text = registry.render()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{kind="a"} 3' in text
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{kind="a",le="1.0"} 2' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 3' in text
+    assert 'job_seconds_sum{kind="a"} 3.6' in text
+    assert 'job_seconds_count{kind="a"} 3' in text
+
+
+def test_label_values_are_escaped():
+    """ラベルの値の引用符・改行はエスケープする"""
+    registry = MetricsRegistry()
+    registry.counter("x_total", "X", ("path",)).labels('a"b\nc').inc()
+    assert 'x_total{path="a\\"b\\nc"} 1' in registry.render()
+
+
+def test_http_requests_are_labelled_by_route_template():
+    """ルートのテンプレートとステータスでリクエストを数える"""
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    before = HTTP_REQUESTS.labels("GET", "/items/{item_id}", 200).value
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    assert HTTP_REQUESTS.labels("GET", "/items/{item_id}", 200).value == before + 2
+    assert HTTP_REQUESTS.labels("GET", "unmatched", 404).value >= 1
+
+
+class FakeFirestoreApi:
+    """テスト用のGAPICクライアントの代わり"""
+
+    async def commit(self, request=None, **kwargs):
+        return "committed"
+
+    async def begin_transaction(self, request=None, **kwargs):
+        return "began"
+
+    async def batch_get_documents(self, request=None, **kwargs):
+        async def responses():
+            yield firestore.BatchGetDocumentsResponse(found=document.Document(name="a"))
+            yield firestore.BatchGetDocumentsResponse(missing="b")
+
+        return responses()
+
+
+@instrumented("sample")
+class SampleCRUD:
+    def __init__(self, api):
+        self.api = api
+
+    async def get_two(self):
+        responses = await self.api.batch_get_documents(request={})
+        return [response async for response in responses]
+
+    async def save(self, retry: bool):
+        options = common.TransactionOptions(
+            read_write=common.TransactionOptions.ReadWrite(
+                retry_transaction=b"tx" if retry else b""
+            )
+        )
+        await self.api.begin_transaction(request={"options": options})
+        await self.api.commit(request={"writes": [1, 2, 3]})
+
+
+def test_firestore_rpcs_are_attributed_to_crud_method():
+    """RPCの件数・読み取り/書き込み数・再試行をCRUDメソッドごとに数える"""
+    crud = SampleCRUD(InstrumentedFirestoreApi(FakeFirestoreApi()))
+
+    async def scenario():
+        assert len(await crud.get_two()) == 2
+        await crud.save(retry=False)
+        await crud.save(retry=True)
+
+    asyncio.run(scenario())
+    assert FIRESTORE_RPCS.labels("sample.get_two", "batch_get_documents", "ok").value
+    assert FIRESTORE_DOCUMENTS_READ.labels("sample.get_two").value == 1
+    assert FIRESTORE_DOCUMENTS_WRITTEN.labels("sample.save").value == 6
+    assert FIRESTORE_TRANSACTION_RETRIES.labels("sample.save").value == 1
+    assert FIRESTORE_RPCS.labels("sample.save", "commit", "ok").value == 2
+
+
+def test_instrument_client_replaces_firestore_api():
+    """固定したバージョンのAsyncClientでは低レベルAPIを計測付きに差し替える"""
+
+    async def scenario():
+        # gRPCの非同期チャネルはイベントループ内で作成する
+        client = AsyncClient(project="test", credentials=AnonymousCredentials())
+        assert instrument_client(client) is client
+        # 2回呼んでも二重に包まない
+        instrument_client(client)
+        return client._firestore_api
+
+    api = asyncio.run(scenario())
+    assert isinstance(api, InstrumentedFirestoreApi)
+    assert not isinstance(api._api, InstrumentedFirestoreApi)
+
+
+def test_instrument_client_skips_unknown_client(caplog):
+    """非公開属性がないクライアントは警告を出し、計測せずにそのまま返す"""
+
+    class UnknownClient:
+        _firestore_api = FakeFirestoreApi()
+
+    client = UnknownClient()
+    with caplog.at_level(logging.WARNING, logger="app.core.firestore_metrics"):
+        assert instrument_client(client) is client
+    assert isinstance(client._firestore_api, FakeFirestoreApi)
+    assert not hasattr(client, "_firestore_api_internal")
+    assert "RPC metrics are disabled" in caplog.text
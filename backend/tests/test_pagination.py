@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+import pytest
+from app.crud.pagination import (
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+    next_cursor,
+)
+
+
+def test_cursor_round_trip():
+    """カーソルは並び順の値とドキュメントIDを復元できる"""
+    reservation_at = datetime(2025, 4, 1, 10, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor(reservation_at, "reservation_1")
+    assert decode_cursor(cursor) == (reservation_at, "reservation_1")
+    assert decode_cursor(encode_cursor(None, "branch_1")) == (None, "branch_1")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(None, "")])
+def test_invalid_cursor(cursor):
+    """不正なカーソルはInvalidCursorError"""
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_next_cursor_only_when_page_is_full():
+    """取得件数がlimitに満たない場合は最終ページ"""
+    items = [{"id": "a"}, {"id": "b"}]
+    assert next_cursor(items, limit=3) is None
+    assert decode_cursor(next_cursor(items, limit=2)) == (None, "b")
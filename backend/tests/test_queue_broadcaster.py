@@ -0,0 +1,124 @@
+import asyncio
+from datetime import date
+import pytest
+from app.crud.queue_broadcaster import QueueBroadcaster, queue_changes
+
+DAY = date(2025, 1, 1)
+DOC_ID = "c1_b1_20250101"
+
+
+class InMemoryWatch:
+    """Firestoreのon_snapshotの代替（監視の開始・解除を記録する）"""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.started = 0
+        self.stopped = 0
+
+    def __call__(self, doc_id, on_change):
+        self.started += 1
+        self.callbacks[doc_id] = on_change
+
+        def unsubscribe():
+            self.stopped += 1
+            del self.callbacks[doc_id]
+
+        return unsubscribe
+
+    async def emit(self, doc_id, data):
+        self.callbacks[doc_id](data)
+        await asyncio.sleep(0)  # call_soon_threadsafeで渡されたイベントを処理
+
+
+def make_broadcaster(watch, idle_seconds=60, buffer_size=16):
+    return QueueBroadcaster(
+        watch, idle_seconds=idle_seconds, buffer_size=buffer_size, next_count=3
+    )
+
+
+@pytest.mark.asyncio
+async def test_one_listener_fans_out_to_all_subscribers():
+    """購読者が複数でも監視は1つで、全員に同じイベントが届く"""
+    watch = InMemoryWatch()
+    broadcaster = make_broadcaster(watch)
+
+    async with broadcaster.subscribe("c1", "b1", DAY) as first:
+        async with broadcaster.subscribe("c1", "b1", DAY) as second:
+            await watch.emit(
+                DOC_ID, {"last_reception_number": 2, "waiting_numbers": [1, 2]}
+            )
+            for subscription in (first, second):
+                event = await subscription.get(timeout=1)
+                assert event["summary"]["waiting_count"] == 2
+                assert event["summary"]["next_numbers"] == [1, 2]
+
+    assert watch.started == 1
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_receives_latest_summary():
+    """途中から購読しても最新のサマリーが最初に届く"""
+    watch = InMemoryWatch()
+    broadcaster = make_broadcaster(watch)
+
+    async with broadcaster.subscribe("c1", "b1", DAY):
+        await watch.emit(DOC_ID, {"last_reception_number": 5, "current_number": 4})
+        async with broadcaster.subscribe("c1", "b1", DAY) as late:
+            event = await late.get(timeout=1)
+            assert event["summary"]["current_number"] == 4
+            assert event["changes"] == []
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_keeps_latest_events():
+    """キューが溢れた場合は古いイベントを破棄する"""
+    watch = InMemoryWatch()
+    broadcaster = make_broadcaster(watch, buffer_size=2)
+
+    async with broadcaster.subscribe("c1", "b1", DAY) as subscription:
+        for number in range(1, 6):
+            await watch.emit(DOC_ID, {"last_reception_number": number})
+        received = [await subscription.get(timeout=1) for _ in range(2)]
+        assert [e["summary"]["latest_reception_number"] for e in received] == [4, 5]
+        assert subscription.dropped == 3
+        assert await subscription.get(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_idle_listener_is_torn_down():
+    """購読者がいなくなると一定時間後に監視を解除し、再購読で再開する"""
+    watch = InMemoryWatch()
+    broadcaster = make_broadcaster(watch, idle_seconds=0.01)
+
+    async with broadcaster.subscribe("c1", "b1", DAY):
+        pass
+    assert broadcaster.channel_keys() == (DOC_ID,)
+
+    await asyncio.sleep(0.05)
+    assert broadcaster.channel_keys() == ()
+    assert watch.stopped == 1
+
+    async with broadcaster.subscribe("c1", "b1", DAY):
+        assert watch.started == 2
+    broadcaster.close_all()
+    assert watch.stopped == 2
+
+
+def test_queue_changes():
+    """サマリーの差分から受付・呼び出し・完了のイベントを求める"""
+    previous = {
+        "latest_reception_number": 3,
+        "calling_numbers": [1],
+        "completed_count": 0,
+    }
+    current = {
+        "latest_reception_number": 4,
+        "calling_numbers": [1, 2],
+        "completed_count": 1,
+    }
+    assert queue_changes(previous, current) == [
+        {"type": "reception", "number": 4},
+        {"type": "calling", "number": 2},
+        {"type": "completed", "count": 1},
+    ]
+    assert queue_changes(None, current) == []
@@ -0,0 +1,239 @@
+import asyncio
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+import jwt
+import time
+from unittest.mock import patch
+from app.core import rate_limit as rate_limit_module
+from app.core.config import settings
+from app.core.security import SecurityService, token_cache
+from app.core.rate_limit import (
+    InMemoryRateLimitBackend,
+    RateLimiter,
+    RedisRateLimitBackend,
+    TOKEN_BUCKET_SCRIPT,
+    rate_limit,
+)
+from app.core.token_bucket import refill
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LocalRedis:
+    """
+    テスト用のRedis互換サーバーの代わり
+
+    TOKEN_BUCKET_SCRIPTの処理（HMGET・HSET・PEXPIRE）をプロセス内で再現する。
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.hashes = {}
+        self.expires_at = {}
+
+    async def eval(self, script, numkeys, *keys_and_args):
+        assert script == TOKEN_BUCKET_SCRIPT
+        assert numkeys == 1
+        key, capacity, rate, cost = keys_and_args
+        now = self.clock()
+        if self.expires_at.get(key, float("inf")) <= now:
+            self.hashes.pop(key, None)
+        bucket = self.hashes.get(key, {})
+        tokens = float(bucket.get("tokens", capacity))
+        updated_at = float(bucket.get("updated_at", now))
+        result = refill(tokens, now - updated_at, capacity, rate, cost)
+        self.hashes[key] = {"tokens": str(result.remaining), "updated_at": str(now)}
+        self.expires_at[key] = now + capacity / rate
+        # Redisは数値以外を文字列（bytes）で返す
+        return [
+            int(result.allowed),
+            str(result.remaining).encode(),
+            str(result.retry_after).encode(),
+        ]
+
+
+def test_refill_caps_at_capacity():
+    """補充は容量まで、足りない場合は必要な待ち秒数を返す"""
+    assert refill(0, 10_000, capacity=10, rate=1, cost=1) == (True, 9, 0)
+    allowed, remaining, retry_after = refill(0.5, 0, capacity=10, rate=0.25, cost=1)
+    assert not allowed
+    assert remaining == 0.5
+    assert retry_after == 2
+
+
+@pytest.mark.parametrize("backend_name", ["memory", "redis"])
+def test_bucket_limits_and_refills(backend_name):
+    """容量分は連続で通り、以降は補充された分だけ通る"""
+    clock = FakeClock()
+    if backend_name == "memory":
+        backend = InMemoryRateLimitBackend(max_keys=100, clock=clock)
+    else:
+        backend = RedisRateLimitBackend(LocalRedis(clock))
+
+    async def scenario():
+        results = [await backend.acquire("k", 3, 60) for _ in range(4)]
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert results[3].retry_after == pytest.approx(20)
+
+        clock.now = 20
+        assert (await backend.acquire("k", 3, 60)).allowed
+        assert not (await backend.acquire("k", 3, 60)).allowed
+        # 別のキーは影響を受けない
+        assert (await backend.acquire("other", 3, 60)).allowed
+
+    asyncio.run(scenario())
+
+
+def test_idle_buckets_expire():
+    """満杯に戻るだけの時間使われていないバケットは破棄する"""
+    clock = FakeClock()
+    backend = InMemoryRateLimitBackend(max_keys=100, clock=clock)
+
+    async def scenario():
+        await backend.acquire("a", 3, 60)
+        clock.now = 30
+        await backend.acquire("b", 3, 60)
+        assert len(backend) == 2
+        clock.now = 61
+        await backend.acquire("b", 3, 60)
+        assert len(backend) == 1
+
+    asyncio.run(scenario())
+
+
+def test_max_keys_evicts_oldest():
+    """バケット数の上限を超えた場合は最も古いものから破棄する"""
+    backend = InMemoryRateLimitBackend(max_keys=2, clock=FakeClock())
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await backend.acquire(key, 3, 60)
+        assert len(backend) == 2
+
+    asyncio.run(scenario())
+
+
+def test_dependency_returns_429_with_retry_after(monkeypatch):
+    """上限を超えたリクエストは429とRetry-Afterを返す（未認証はIP単位）"""
+    clock = FakeClock()
+    limiter = RateLimiter(InMemoryRateLimitBackend(100, clock), window_seconds=3600)
+    monkeypatch.setattr(rate_limit_module, "rate_limiter", limiter)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_AVAILABILITY_CHECK", 2)
+
+    app = FastAPI()
+
+    @app.get("/slots", dependencies=[Depends(rate_limit("availability_check"))])
+    async def slots():
+        return []
+
+    client = TestClient(app)
+    assert client.get("/slots").status_code == 200
+    assert client.get("/slots").status_code == 200
+    response = client.get("/slots")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1800"
+
+
+def test_dependency_fails_open_on_backend_error(monkeypatch):
+    """バックエンドの障害時はリクエストを通す"""
+
+    class BrokenBackend:
+        async def acquire(self, *args, **kwargs):
+            raise ConnectionError("unavailable")
+
+    monkeypatch.setattr(
+        rate_limit_module, "rate_limiter", RateLimiter(BrokenBackend(), 3600)
+    )
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+
+    app = FastAPI()
+
+    @app.get("/items", dependencies=[Depends(rate_limit("other"))])
+    async def items():
+        return []
+
+    assert TestClient(app).get("/items").status_code == 200
+
+
+def test_invalid_token_is_verified_once(monkeypatch):
+    """レート制限は検証済みトークンのキャッシュだけを参照し、不正なトークンを再検証しない"""
+    limiter = RateLimiter(InMemoryRateLimitBackend(100), window_seconds=3600)
+    monkeypatch.setattr(rate_limit_module, "rate_limiter", limiter)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+    identities = []
+    request_identity = rate_limit_module.request_identity
+    monkeypatch.setattr(
+        rate_limit_module,
+        "request_identity",
+        lambda request: identities.append(request_identity(request)) or identities[-1],
+    )
+
+    app = FastAPI()
+
+    @app.get("/me", dependencies=[Depends(rate_limit("other"))])
+    async def me(claims: dict = Depends(SecurityService.verify_firebase_token)):
+        return claims
+
+    client = TestClient(app)
+    with patch(
+        "app.core.security.token_verifier.verify_sync",
+        side_effect=jwt.InvalidTokenError("bad"),
+    ) as verify:
+        response = client.get("/me", headers={"Authorization": "Bearer bad"})
+    assert response.status_code == 401
+    assert verify.call_count == 1
+
+    token_cache.set("good", {"uid": "u1"}, time.time() + 3600)
+    try:
+        response = client.get("/me", headers={"Authorization": "Bearer good"})
+    finally:
+        token_cache.clear()
+    assert response.status_code == 200
+    assert identities[0].startswith("ip:")
+    assert identities[1] == "user:u1"
+
+
+def test_queue_display_polling_and_login_are_not_limited_hourly(
+    monkeypatch, auth_headers
+):
+    """表示画面の定期的な再取得と同じIPアドレスからのログインは1時間単位の上限に掛からない"""
+    from app.main import app
+
+    clock = FakeClock()
+    limiter = RateLimiter(
+        InMemoryRateLimitBackend(1000, clock),
+        window_seconds=settings.RATE_LIMIT_WINDOW_SECONDS,
+    )
+    monkeypatch.setattr(rate_limit_module, "rate_limiter", limiter)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    client = TestClient(app)
+
+    # WAIT_TIME_UPDATE_INTERVAL秒ごとに1時間再取得する
+    summary = "/api/v1/reservations/test_company_id/test_branch_id/summary"
+    for _ in range(3600 // settings.WAIT_TIME_UPDATE_INTERVAL):
+        response = client.get(summary, headers=auth_headers)
+        assert response.status_code != 429
+        clock.now += settings.WAIT_TIME_UPDATE_INTERVAL
+
+    # 同じ接続元から数秒おきにログインが続いても拒否しない（本文の検証エラーは422）
+    for _ in range(settings.RATE_LIMIT_OTHER_ENDPOINTS + 1):
+        assert client.post("/api/v1/auth/login", json={}).status_code == 422
+        clock.now += 3
+
+    # その他の種別は従来どおり1時間あたりの上限で制限する
+    statuses = [
+        client.get("/api/v1/reservations/", headers=auth_headers).status_code
+        for _ in range(settings.RATE_LIMIT_OTHER_ENDPOINTS + 1)
+    ]
+    assert statuses[-1] == 429
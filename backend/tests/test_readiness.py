@@ -0,0 +1,122 @@
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response, status
+from fastapi.testclient import TestClient
+from app.core.readiness import Readiness
+
+
+def test_steps_run_in_order_and_failed_steps_are_retried(monkeypatch):
+    """失敗した手順は再試行し、すべて完了すると準備完了になる"""
+    calls = []
+
+    async def flaky():
+        calls.append("firestore")
+        if calls.count("firestore") < 3:
+            raise ConnectionError("unavailable")
+
+    async def keys():
+        calls.append("keys")
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr("app.core.readiness.asyncio.sleep", no_sleep)
+    readiness = Readiness([("firestore", flaky), ("keys", keys)])
+
+    async def scenario():
+        assert not readiness.ready
+        readiness.start()
+        return await readiness.wait(timeout=1)
+
+    assert asyncio.run(scenario())
+    assert calls == ["firestore", "firestore", "firestore", "keys"]
+    assert [step["state"] for step in readiness.status()["steps"]] == ["ok", "ok"]
+
+
+def test_stop_cancels_pending_step():
+    """終了時は完了していない準備処理を中止する"""
+    started = []
+
+    async def hang():
+        started.append(True)
+        await asyncio.Event().wait()
+
+    readiness = Readiness([("firestore", hang)])
+
+    async def scenario():
+        readiness.start()
+        assert not await readiness.wait(timeout=0.01)
+        await readiness.stop()
+
+    asyncio.run(scenario())
+    assert started == [True]
+    assert readiness.status() == {
+        "ready": False,
+        "steps": [{"name": "firestore", "state": "pending", "seconds": None}],
+    }
+
+
+def test_startup_does_not_wait_for_warm_up():
+    """起動処理は準備の完了を待たず、準備状態は完了するまで503"""
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+
+    readiness = Readiness([("firestore", slow)])
+
+    @asynccontextmanager
+    async def lifespan(app):
+        readiness.start()
+        yield
+        await readiness.stop()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/ready")
+    def ready(response: Response):
+        if not readiness.ready:
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return readiness.status()
+
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["steps"][0]["state"] == "pending"
+
+
+def test_app_becomes_ready():
+    """アプリの準備処理（Firestoreへの接続・リスナーの開始）が完了すると/readyは200"""
+    from app.main import app, readiness
+
+    with TestClient(app) as client:
+        assert client.portal.call(readiness.wait, 5)
+        response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+
+def test_health_and_ready_do_not_need_firebase(monkeypatch):
+    """Firebaseの初期化に失敗しても/healthは200、/readyは503を返す"""
+    import app.core.firebase as firebase
+    import app.main
+
+    def fail():
+        raise FileNotFoundError("credentials not found")
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(firebase.settings, "FIRESTORE_BACKEND", "firestore")
+    monkeypatch.setattr(firebase, "initialize_firebase", fail)
+    monkeypatch.setattr(firebase, "_is_initialized", False)
+    monkeypatch.setattr(firebase, "_async_firestore_client", None)
+    monkeypatch.setattr("app.core.readiness.asyncio.sleep", no_sleep)
+    monkeypatch.setattr(app.main, "readiness", Readiness(app.main.warm_up_steps()))
+
+    with TestClient(app.main.app) as client:
+        assert client.get("/health").status_code == 200
+        response = client.get("/ready")
+        assert client.get("/metrics").status_code == 200
+    assert response.status_code == 503
+    assert response.json()["steps"][0]["state"] == "error: credentials not found"
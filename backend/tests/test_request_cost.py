@@ -0,0 +1,86 @@
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from google.cloud.firestore_v1.types import document, firestore
+from app.core.config import settings
+from app.core.firestore_metrics import InstrumentedFirestoreApi
+from app.middleware.request_cost import RequestCostMiddleware, server_timing
+
+DOCUMENT = "projects/p/databases/(default)/documents/companies/c1"
+
+
+class FakeFirestoreApi:
+    """テスト用のGAPICクライアントの代わり（要求されたドキュメントをすべて返す）"""
+
+    async def batch_get_documents(self, request=None, **kwargs):
+        async def responses():
+            for name in request["documents"]:
+                yield firestore.BatchGetDocumentsResponse(
+                    found=document.Document(name=name)
+                )
+
+        return responses()
+
+    async def commit(self, request=None, **kwargs):
+        return None
+
+
+def make_app(point_reads: int) -> FastAPI:
+    api = InstrumentedFirestoreApi(FakeFirestoreApi())
+    app = FastAPI()
+    app.add_middleware(RequestCostMiddleware)
+
+    @app.get("/companies/{company_id}")
+    async def read_company(company_id: str):
+        for _ in range(point_reads):
+            responses = await api.batch_get_documents(request={"documents": [DOCUMENT]})
+            async for _ in responses:
+                pass
+        await api.commit(request={"writes": [1]})
+        return {"id": company_id}
+
+    return app
+
+
+def test_server_timing_format():
+    """Firestoreの集計とリクエスト全体の時間をServer-Timingの形式で出力する"""
+    cost = {"rpcs": 2, "reads": 15, "writes": 0, "rpc_ms": 12.3}
+    assert server_timing(cost, 0.0401) == (
+        'firestore;dur=12.3;desc="rpcs=2 reads=15 writes=0", app;dur=40.1'
+    )
+
+
+def test_response_has_server_timing_and_cost_log(caplog):
+    """レスポンスにServer-Timingを付け、ルートのテンプレートと集計をログに出す"""
+    client = TestClient(make_app(point_reads=1))
+    with caplog.at_level(logging.INFO, logger="app.middleware.request_cost"):
+        response = client.get("/companies/c1")
+
+    assert 'desc="rpcs=2 reads=1 writes=1"' in response.headers["server-timing"]
+    record = next(r for r in caplog.records if hasattr(r, "request_cost"))
+    assert record.request_cost["route"] == "/companies/{company_id}"
+    assert record.request_cost["reads"] == 1
+    assert record.request_cost["status"] == 200
+
+
+def test_checks_flag_budget_and_repeated_reads(caplog, monkeypatch):
+    """確認を有効にした場合、読み取り数の上限超過と同じドキュメントの繰り返し読み取りを警告する"""
+    monkeypatch.setattr(settings, "REQUEST_COST_CHECKS_ENABLED", True)
+    monkeypatch.setattr(settings, "REQUEST_READ_BUDGET", 2)
+    client = TestClient(make_app(point_reads=3))
+    with caplog.at_level(logging.WARNING, logger="app.middleware.request_cost"):
+        client.get("/companies/c1")
+
+    messages = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert any(
+        "Read budget exceeded" in m and "read 3 documents" in m for m in messages
+    )
+    assert any("companies/c1 x3" in m for m in messages)
+
+
+def test_checks_disabled_by_default(caplog):
+    """既定では警告しない"""
+    client = TestClient(make_app(point_reads=3))
+    with caplog.at_level(logging.WARNING, logger="app.middleware.request_cost"):
+        client.get("/companies/c1")
+    assert not [r for r in caplog.records if r.levelno == logging.WARNING]
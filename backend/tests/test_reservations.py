@@ -2,7 +2,9 @@ from datetime import datetime, timedelta, date
 import pytest
 from fastapi import status
 from app.models.reservation import ReservationStatus
+from app.core.config import settings
 from app.core.firebase import get_firestore
+from app.crud.branch_day import BRANCH_DAYS_COLLECTION, BranchDay, branch_day_id
 
 
 @pytest.fixture
@@ -94,3 +96,66 @@ async def test_duplicate_reservation(client, sample_reservation_data, auth_heade
     print(error_detail)
     assert "message" in error_detail["detail"]
     assert "指定された時間枠は既に予約されています" in error_detail["detail"]["message"]
+
+
+def seed_owned_reservation(status: str = "accepted") -> datetime:
+    """test_user_id の予約と店舗・日別ドキュメントを登録し、予約日時を返す"""
+    reservation_at = (
+        datetime.now(settings.get_timezone()) + timedelta(days=1)
+    ).replace(hour=14, minute=0, second=0, microsecond=0)
+    branch_day = BranchDay("c1", "b1", reservation_at.date())
+    number = branch_day.admit(reservation_at, status, capacity=5)
+    db = get_firestore()
+    db.collection("reservations").document("r1").set(
+        {
+            "user_id": "test_user_id",
+            "company_id": "c1",
+            "branch_id": "b1",
+            "reservation_at": reservation_at,
+            "reception_number": number,
+            "status": status,
+        }
+    )
+    db.collection(BRANCH_DAYS_COLLECTION).document(branch_day.id).set(
+        branch_day.to_dict()
+    )
+    return reservation_at
+
+
+def load_branch_day(reservation_at: datetime) -> BranchDay:
+    day = reservation_at.date()
+    snapshot = (
+        get_firestore()
+        .collection(BRANCH_DAYS_COLLECTION)
+        .document(branch_day_id("c1", "b1", day))
+        .get()
+    )
+    return BranchDay.from_snapshot("c1", "b1", day, snapshot)
+
+
+def test_update_reservation_status_releases_slot(client, auth_headers):
+    """PUTでのキャンセルは時間枠と待ち行列を同じトランザクションで解放する"""
+    reservation_at = seed_owned_reservation()
+
+    response = client.put(
+        "/api/v1/reservations/r1", json={"status": "cancelled"}, headers=auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "cancelled"
+    branch_day = load_branch_day(reservation_at)
+    assert sum(branch_day.occupancy) == 0
+    assert branch_day.waiting_numbers == []
+
+
+def test_delete_reservation_releases_slot(client, auth_headers):
+    """DELETEは予約を削除し、時間枠と待ち行列を解放する"""
+    reservation_at = seed_owned_reservation()
+
+    response = client.delete("/api/v1/reservations/r1", headers=auth_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not get_firestore().collection("reservations").document("r1").get().exists
+    branch_day = load_branch_day(reservation_at)
+    assert sum(branch_day.occupancy) == 0
+    assert branch_day.waiting_numbers == []
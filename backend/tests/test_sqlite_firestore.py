@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from app.core.memory_firestore import MemoryClient
+from app.core.sqlite_firestore import SqliteStore, filter_clauses
+
+AT = datetime(2025, 1, 1, 1, tzinfo=timezone.utc)
+
+
+def test_documents_persist_across_reopen(tmp_path):
+    """閉じて開き直しても日時・数値の型と更新日時が保たれる"""
+    path = str(tmp_path / "store.db")
+    store = SqliteStore(path)
+    MemoryClient(store).collection("reservations").document("r1").set(
+        {"reservation_at": AT, "count": 1, "ratio": 1.0, "raw": b"\x00"}
+    )
+    saved = MemoryClient(store).collection("reservations").document("r1").get()
+    store.close()
+
+    reopened = SqliteStore(path)
+    snapshot = MemoryClient(reopened).collection("reservations").document("r1").get()
+    assert snapshot.to_dict() == {
+        "reservation_at": AT,
+        "count": 1,
+        "ratio": 1.0,
+        "raw": b"\x00",
+    }
+    assert isinstance(snapshot.get("count"), int)
+    assert snapshot.update_time == saved.update_time
+    reopened.close()
+
+
+def test_day_query_uses_index(tmp_path):
+    """店舗・日付の絞り込みは式インデックスを使う"""
+    store = SqliteStore(str(tmp_path / "store.db"))
+    where, params = filter_clauses(
+        [
+            ("branch_id", "==", "b1"),
+            ("reservation_at", ">=", AT),
+            ("reservation_at", "<", AT + timedelta(days=1)),
+        ]
+    )
+    plan = store._connection.execute(
+        f"EXPLAIN QUERY PLAN SELECT id FROM documents WHERE collection = ?{where}",
+        ("reservations", *params),
+    ).fetchall()
+    assert "idx_documents_branch_reservation_at" in plan[0][-1]
+    store.close()
+
+
+def test_pushdown_does_not_drop_matches(tmp_path):
+    """SQLでの絞り込み後もFirestoreと同じ型ごとの比較で判定する"""
+    store = SqliteStore(str(tmp_path / "store.db"))
+    items = MemoryClient(store).collection("items")
+    items.document("int").set({"value": 1, "flag": True})
+    items.document("str").set({"value": "1", "flag": 1})
+    items.document("none").set({"flag": False})
+
+    assert [s.id for s in items.where("value", "==", 1).get()] == ["int"]
+    assert [s.id for s in items.where("value", "in", ["1", "2"]).get()] == ["str"]
+    assert [s.id for s in items.where("flag", "==", True).get()] == ["int"]
+    assert [s.id for s in items.where("value", ">", 0).get()] == ["int"]
+    store.close()
@@ -0,0 +1,91 @@
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.cache import LRUTTLCache
+from app.core.security import SecurityService, token_cache
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def test_lru_eviction():
+    """上限を超えると最も古く参照されたエントリが追い出される"""
+    cache = LRUTTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # aを最近参照済みにする
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entry_expires_at_shorter_ttl():
+    """エントリは指定TTLと最大TTLの早い方で失効する"""
+    clock = FakeClock()
+    cache = LRUTTLCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.set("short", 1, ttl_seconds=10)
+    cache.set("long", 2, ttl_seconds=3600)
+
+    clock.now = 11
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+    clock.now = 61
+    assert cache.get("long") is None
+    assert cache.stats()["expirations"] == 2
+
+
+def test_expired_token_is_not_cached():
+    """期限切れのトークンは登録しない"""
+    token_cache.set("expired", {"uid": "u"}, exp=time.time() - 1)
+    assert token_cache.get("expired") is None
+
+
+@pytest.mark.asyncio
+async def test_verify_firebase_token_uses_cache():
+    """同じトークンの2回目以降は署名検証を行わない"""
+    decoded = {
+        "uid": "cached_uid",
+        "email": "cached@example.com",
+        "role": "staff",
+        "company_id": "company_1",
+        "branch_id": "branch_1",
+        "exp": time.time() + 3600,
+    }
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="tok")
+    before = token_cache.stats()
+
+    with patch("app.core.security.settings.ENVIRONMENT", "production"), patch(
+        "app.core.security.token_verifier.verify_sync", return_value=decoded
+    ) as verify:
+        first = await SecurityService.verify_firebase_token(credentials)
+        second = await SecurityService.verify_firebase_token(credentials)
+
+    assert verify.call_count == 1
+    assert first == second
+    assert second["uid"] == "cached_uid"
+    assert second["role"] == "staff"
+    assert second["company_id"] == "company_1"
+    assert second["branch_id"] == "branch_1"
+
+    after = token_cache.stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
@@ -0,0 +1,134 @@
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from app.core.security import FirebaseTokenVerifier, PublicKeyStore
+
+PROJECT_ID = "test-project"
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    """テスト用のRSA秘密鍵（Googleの署名鍵の代替）"""
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def key_fetcher(signing_key):
+    """公開鍵エンドポイントの代替（取得回数を記録する）"""
+    public_pem = (
+        signing_key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode("utf-8")
+    )
+
+    def fetch():
+        fetch.calls += 1
+        return {"test-kid": public_pem}, 3600
+
+    fetch.calls = 0
+    return fetch
+
+
+@pytest.fixture
+def verifier(key_fetcher):
+    store = PublicKeyStore(key_fetcher, min_refresh_seconds=60)
+    store.refresh()
+    return FirebaseTokenVerifier(PROJECT_ID, store, max_workers=1)
+
+
+def make_token(signing_key, kid="test-kid", **overrides):
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "sub": "user_123",
+        "iat": now,
+        "exp": now + 3600,
+        "auth_time": now,
+        "role": "staff",
+    }
+    payload.update(overrides)
+    return jwt.encode(payload, signing_key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.mark.asyncio
+async def test_verify_valid_token(verifier, signing_key):
+    """正しいトークンはuidを付与して返す"""
+    decoded = await verifier.verify(make_token(signing_key))
+    assert decoded["uid"] == "user_123"
+    assert decoded["role"] == "staff"
+
+
+@pytest.mark.asyncio
+async def test_verify_does_not_fetch_keys_per_request(
+    verifier, signing_key, key_fetcher
+):
+    """検証ごとに公開鍵を取得しない"""
+    for _ in range(5):
+        await verifier.verify(make_token(signing_key))
+    assert key_fetcher.calls == 1
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"aud": "other-project"},
+        {"iss": "https://securetoken.google.com/other-project"},
+        {"exp": int(time.time()) - 3600},
+        {"sub": ""},
+    ],
+)
+def test_reject_invalid_claims(verifier, signing_key, overrides):
+    """aud・iss・exp・subが不正なトークンは拒否する"""
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify_sync(make_token(signing_key, **overrides))
+
+
+def test_reject_unknown_kid(verifier, signing_key):
+    """未知の鍵IDで署名されたトークンは拒否する"""
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify_sync(make_token(signing_key, kid="unknown"))
+
+
+def test_reject_other_signing_key(verifier):
+    """別の鍵で署名されたトークンは拒否する"""
+    other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify_sync(make_token(other_key))
+
+
+def test_refresh_interval_follows_max_age(key_fetcher):
+    """更新間隔はmax-ageの9割（下限あり）"""
+    assert PublicKeyStore(key_fetcher, min_refresh_seconds=60).refresh() == 3240
+
+    short_lived = PublicKeyStore(lambda: ({}, 30), min_refresh_seconds=60)
+    assert short_lived.refresh() == 60
+
+
+def test_admin_sdk_uses_configured_project(monkeypatch):
+    """Admin SDKの初期化もトークン検証と同じFIREBASE_PROJECT_IDを使う"""
+    import app.core.firebase as firebase
+
+    initialized = {}
+    monkeypatch.setattr(firebase.settings, "FIRESTORE_BACKEND", "firestore")
+    monkeypatch.setattr(firebase.settings, "ENVIRONMENT", "production")
+    monkeypatch.setattr(firebase.settings, "FIREBASE_PROJECT_ID", "clinic-prod")
+    monkeypatch.setattr(firebase, "_is_initialized", False)
+    monkeypatch.setattr(firebase, "_firestore_client", None)
+    monkeypatch.setattr(firebase.firebase_admin, "_apps", {})
+    monkeypatch.setattr(firebase.credentials, "Certificate", lambda data: "cred")
+    monkeypatch.setattr(
+        firebase.firebase_admin,
+        "initialize_app",
+        lambda cred, options: initialized.update(options),
+    )
+    monkeypatch.setattr(firebase.firestore, "client", lambda: object())
+    monkeypatch.setattr(type(firebase.settings), "firebase_credentials", {})
+
+    firebase.initialize_firebase()
+    assert initialized == {"projectId": "clinic-prod"}
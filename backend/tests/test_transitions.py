@@ -0,0 +1,179 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from pydantic import ValidationError
+from app.crud.branch_day import BranchDay, apply_status_change
+from app.crud.branch_stats import ServiceTimeEstimator
+from app.crud.crud_reservation import crud_reservation
+from app.core.config import settings
+from app.models.reservation import ReservationTransitionRequest, is_allowed_transition
+
+CALLED_AT = datetime(2025, 1, 1, 1, 0, tzinfo=timezone.utc)  # JST 10:00
+
+
+@pytest.mark.parametrize(
+    "current, new, allowed",
+    [
+        ("accepted", "calling", True),
+        ("calling", "completed", True),
+        ("calling", "accepted", True),
+        ("cancelled", "accepted", True),
+        ("accepted", "completed", False),
+        ("completed", "calling", False),
+        ("completed", "cancelled", False),
+        (None, "calling", False),
+    ],
+)
+def test_allowed_transitions(current, new, allowed):
+    """許可されたステータス遷移のみ受け付ける"""
+    assert is_allowed_transition(current, new) is allowed
+
+
+def test_transition_request_requires_one_target():
+    """予約IDの一覧とルール指定のどちらか一方が必要"""
+    ReservationTransitionRequest(status="calling", from_status="accepted", limit=3)
+    ReservationTransitionRequest(status="completed", reservation_ids=["r1", "r2"])
+    with pytest.raises(ValidationError):
+        ReservationTransitionRequest(status="calling")
+    with pytest.raises(ValidationError):
+        ReservationTransitionRequest(
+            status="calling", reservation_ids=["r1"], from_status="accepted"
+        )
+    with pytest.raises(ValidationError):
+        ReservationTransitionRequest(status="calling", reservation_ids=["r1"], limit=1)
+
+
+def test_apply_status_change_updates_queue_and_estimator():
+    """呼び出し・完了で待ち行列・呼び出し時刻・対応時間推定を更新する"""
+    branch_day = BranchDay("c1", "b1", date(2025, 1, 1))
+    number = branch_day.admit(CALLED_AT, "accepted", capacity=5)
+    reservation = {
+        "company_id": "c1",
+        "branch_id": "b1",
+        "reservation_at": CALLED_AT,
+        "reception_number": number,
+        "status": "accepted",
+    }
+
+    called = apply_status_change(reservation, "calling", CALLED_AT, branch_day, None)
+    assert called["fields"] == {"called_at": CALLED_AT}
+    assert branch_day.calling_numbers == [number]
+
+    reservation.update(status="calling", called_at=CALLED_AT)
+    estimator = ServiceTimeEstimator("c1", "b1")
+    completed_at = CALLED_AT + timedelta(minutes=12)
+    completed = apply_status_change(
+        reservation, "completed", completed_at, branch_day, estimator
+    )
+    assert completed["fields"] == {"completed_at": completed_at}
+    assert completed["estimator_changed"]
+    assert estimator.service_minutes() == pytest.approx(12)
+    assert branch_day.calling_numbers == []
+    assert branch_day.completed_count == 1
+
+
+def seed_branch_day(statuses: dict) -> datetime:
+    """
+    当日の予約と店舗・日別ドキュメントを登録する
+
+    Args:
+        statuses (dict): {予約ID: ステータス}（登録順に受付番号を払い出す）
+    """
+    reservation_at = datetime.now(settings.get_timezone()).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    )
+    branch_day = BranchDay("c1", "b1", reservation_at.date())
+    called_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+
+    async def seed():
+        for reservation_id, status in statuses.items():
+            number = branch_day.admit(reservation_at, status, capacity=100)
+            await crud_reservation.collection.document(reservation_id).set(
+                {
+                    "company_id": "c1",
+                    "branch_id": "b1",
+                    "user_id": "u1",
+                    "reservation_at": reservation_at,
+                    "reception_number": number,
+                    "status": status,
+                    "called_at": called_at,
+                }
+            )
+        await crud_reservation._branch_day_ref("c1", "b1", branch_day.day).set(
+            branch_day.to_dict()
+        )
+
+    asyncio.run(seed())
+    return reservation_at
+
+
+def test_transition_batch_ignores_duplicate_ids():
+    """同じ予約IDを重複して指定しても1回だけ変更し、集計も1件分にする"""
+    reservation_at = seed_branch_day({"r1": "calling", "r2": "calling"})
+
+    async def scenario():
+        results = await crud_reservation.transition_batch(
+            "c1", "b1", "completed", reservation_ids=["r1", "r2", "r1"]
+        )
+        day = await crud_reservation._branch_day_ref(
+            "c1", "b1", reservation_at.date()
+        ).get()
+        stats = await crud_reservation._branch_stats_ref("c1", "b1").get()
+        return results, day.to_dict(), stats.to_dict()
+
+    results, day, stats = asyncio.run(scenario())
+    assert [r["reservation_id"] for r in results] == ["r1", "r2"]
+    assert day["completed_count"] == 2
+    assert stats["service_sample_count"] == 2
+
+
+def test_transition_batch_calls_next_in_reception_order(monkeypatch):
+    """ルール指定は受付番号順の先頭から limit 件を変更し、件数の上限は読み取り前に検証する"""
+    seed_branch_day({"r3": "accepted", "r1": "accepted", "r2": "accepted"})
+
+    results = asyncio.run(
+        crud_reservation.transition_batch(
+            "c1", "b1", "calling", from_status="accepted", limit=2
+        )
+    )
+    assert [(r["reservation_id"], r["result"]) for r in results] == [
+        ("r3", "updated"),
+        ("r1", "updated"),
+    ]
+
+    monkeypatch.setattr(settings, "BATCH_TRANSITION_MAX_ITEMS", 1)
+    with pytest.raises(ValueError):
+        asyncio.run(
+            crud_reservation.transition_batch(
+                "c1", "b1", "calling", from_status="accepted", limit=2
+            )
+        )
+    # limit省略時は上限を超える件数が対象の場合にエラー
+    seed_branch_day({"r4": "accepted"})
+    with pytest.raises(ValueError):
+        asyncio.run(
+            crud_reservation.transition_batch(
+                "c1", "b1", "calling", from_status="accepted"
+            )
+        )
+
+
+def test_batch_call_then_complete_keeps_default_service_time():
+    """呼び出しと完了をまとめて操作した数秒の対応時間は推定に反映しない"""
+    seed_branch_day({"r1": "accepted", "r2": "accepted"})
+
+    async def scenario():
+        await crud_reservation.transition_batch(
+            "c1", "b1", "calling", from_status="accepted"
+        )
+        results = await crud_reservation.transition_batch(
+            "c1", "b1", "completed", from_status="calling"
+        )
+        stats = await crud_reservation._branch_stats_ref("c1", "b1").get()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+    assert [r["result"] for r in results] == ["updated", "updated"]
+    estimator = ServiceTimeEstimator.from_snapshot("c1", "b1", stats)
+    assert estimator.sample_count == 0
+    assert estimator.service_minutes() == settings.DEFAULT_APPOINTMENT_DURATION
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.core.config import settings
+from app.crud.branch_stats import ServiceTimeEstimator, elapsed_seconds
+
+
+def test_default_duration_without_samples():
+    """実績がない店舗はDEFAULT_APPOINTMENT_DURATIONで推定する"""
+    estimator = ServiceTimeEstimator("c1", "b1")
+    assert estimator.service_minutes() == settings.DEFAULT_APPOINTMENT_DURATION
+    assert estimator.estimate_wait_minutes(0) == settings.DEFAULT_APPOINTMENT_DURATION
+
+
+def test_ewma_tracks_recent_durations():
+    """観測が少ない間は平均、以降は直近の対応時間に追従する"""
+    estimator = ServiceTimeEstimator("c1", "b1")
+    estimator.observe(600)
+    estimator.observe(1200)
+    assert estimator.mean_seconds == pytest.approx(900)
+
+    for _ in range(50):
+        estimator.observe(300)
+    assert estimator.service_minutes() == pytest.approx(5, abs=0.1)
+
+
+def test_outliers_are_ignored():
+    """下限未満や上限を超える対応時間は反映しない"""
+    estimator = ServiceTimeEstimator("c1", "b1")
+    assert not estimator.observe(0)
+    assert not estimator.observe(settings.WAIT_TIME_MIN_SERVICE_MINUTES * 60 - 1)
+    assert not estimator.observe(settings.WAIT_TIME_MAX_SERVICE_MINUTES * 60 + 1)
+    assert estimator.sample_count == 0
+
+
+def test_state_round_trip():
+    """保存内容から復元すると同じ推定値になる"""
+    estimator = ServiceTimeEstimator("c1", "b1")
+    for seconds in (300, 420, 360):
+        estimator.observe(seconds)
+    restored = ServiceTimeEstimator("c1", "b1", estimator.to_dict())
+    assert restored.sample_count == 3
+    assert restored.service_minutes() == estimator.service_minutes()
+
+
+def test_estimate_by_position_and_servers():
+    """待ち時間は待ち位置に比例し、対応中の窓口数で割る"""
+    estimator = ServiceTimeEstimator("c1", "b1", {"service_mean_seconds": 600})
+    assert estimator.estimate_wait_minutes(0) == 10
+    assert estimator.estimate_wait_minutes(2) == 30
+    assert estimator.estimate_wait_minutes(2, servers=2) == 15
+
+
+def test_elapsed_seconds_mixes_naive_and_aware():
+    """tzinfoなしの日時はUTCとして差を求める"""
+    called_at = datetime(2025, 1, 1, 1, 0)
+    completed_at = datetime(2025, 1, 1, 1, 7, tzinfo=timezone.utc)
+    assert elapsed_seconds(called_at, completed_at) == timedelta(minutes=7).seconds